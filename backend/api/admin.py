@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Subscriber, User, Category, Post, Comment, PostLike, CommentLike, Event
+from .models import Subscriber, User, Category, Post, Comment, PostLike, CommentLike, PollVote, PollOptionTally, Event
+from .response_cache import PINNED_POSTS, bump_version
 
 # Admin personalizado para Subscriber
 @admin.register(Subscriber)
@@ -35,7 +36,7 @@ class CustomUserAdmin(UserAdmin):
     
     fieldsets = UserAdmin.fieldsets + (
         ('Perfil de Comunidad', {
-            'fields': ('avatar_url', 'get_avatar_preview', 'bio', 'level', 'points', 'website', 'position', 'is_premium', 'created_at', 'updated_at')
+            'fields': ('avatar_url', 'get_avatar_preview', 'bio', 'level', 'points', 'website', 'is_premium', 'created_at', 'updated_at')
         }),
     )
     
@@ -100,10 +101,13 @@ class PostAdmin(admin.ModelAdmin):
     
     def pin_posts(self, request, queryset):
         queryset.update(is_pinned=True)
+        # update() no envía señales: invalidar la caché de posts fijados aquí
+        bump_version(PINNED_POSTS)
     pin_posts.short_description = "Fijar posts seleccionados"
     
     def unpin_posts(self, request, queryset):
         queryset.update(is_pinned=False)
+        bump_version(PINNED_POSTS)
     unpin_posts.short_description = "Desfijar posts seleccionados"
 
 
@@ -176,6 +180,24 @@ class CommentLikeAdmin(admin.ModelAdmin):
     comment_link.short_description = 'Comentario'
 
 
+# Admin personalizado para PollVote
+@admin.register(PollVote)
+class PollVoteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'post', 'option_id', 'updated_at')
+    list_filter = ('updated_at',)
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'post')
+    list_select_related = ('user', 'post')
+
+
+# Admin personalizado para PollOptionTally
+@admin.register(PollOptionTally)
+class PollOptionTallyAdmin(admin.ModelAdmin):
+    list_display = ('id', 'post', 'option_id', 'votes')
+    raw_id_fields = ('post',)
+    list_select_related = ('post',)
+
+
 # Admin personalizado para Event
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Registrar las señales de gamificación
+        from api.gamification import signals  # noqa: F401
+        # Registrar las señales que invalidan la caché de respuestas
+        from api import signals as api_signals  # noqa: F401
@@ -0,0 +1,32 @@
+"""
+Autenticación JWT de la API.
+
+PremiumContentMiddleware necesita al usuario antes de llegar a la vista y
+DRF lo vuelve a autenticar dentro de ella. RequestCachedJWTAuthentication
+guarda el resultado en la petición de Django para que el token se decodifique
+y el usuario se lea de la base de datos una sola vez por petición, la haga
+quien la haga primero.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# Atributo de la petición de Django donde se guarda (usuario, token)
+CACHED_AUTH_ATTR = '_cached_jwt_auth'
+
+
+class RequestCachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que reutiliza la autenticación ya hecha en la misma
+    petición (por el middleware premium o por la vista).
+    """
+
+    def authenticate(self, request):
+        # DRF pasa su Request, que envuelve la petición de Django en _request
+        django_request = getattr(request, '_request', request)
+        cached = getattr(django_request, CACHED_AUTH_ATTR, None)
+        if cached is not None:
+            return cached
+
+        result = super().authenticate(request)
+        if result is not None:
+            setattr(django_request, CACHED_AUTH_ATTR, result)
+        return result
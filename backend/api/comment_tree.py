@@ -0,0 +1,66 @@
+"""
+Construcción en memoria del árbol de comentarios de un post.
+"""
+from collections import defaultdict
+
+from .models import Comment, CommentLike
+
+# Profundidad máxima de anidamiento que se serializa (0 = comentarios raíz)
+MAX_COMMENT_DEPTH = 5
+
+
+class CommentTree:
+    """
+    Carga todos los comentarios de un post (con sus autores y usuarios
+    mencionados) en una sola consulta, junto con los likes del usuario que
+    consulta en otra, y permite recorrer la jerarquía sin tocar la base de datos.
+    """
+
+    def __init__(self, post, user=None, comments=None):
+        if comments is None:
+            comments = Comment.objects.filter(post=post).select_related(
+                'author', 'mentioned_user'
+            ).order_by('created_at')
+
+        # Agrupar los comentarios por su padre (None para los comentarios raíz)
+        self.children = defaultdict(list)
+        for comment in comments:
+            self.children[comment.parent_id].append(comment)
+
+        self.liked_ids = set()
+        if user is not None and user.is_authenticated and self.children:
+            self.liked_ids = set(CommentLike.objects.filter(
+                user=user,
+                comment__post=post
+            ).values_list('comment_id', flat=True))
+
+    @classmethod
+    def from_roots(cls, post, roots, user=None):
+        """
+        Árbol limitado a unos comentarios raíz (p. ej. una página) y sus
+        respuestas hasta la profundidad que se serializa, con una consulta por nivel.
+        """
+        comments = list(roots)
+        parent_ids = [comment.id for comment in comments]
+        for _ in range(MAX_COMMENT_DEPTH + 1):
+            if not parent_ids:
+                break
+            level = list(Comment.objects.filter(parent_id__in=parent_ids).select_related(
+                'author', 'mentioned_user'
+            ).order_by('created_at'))
+            comments.extend(level)
+            parent_ids = [comment.id for comment in level]
+        return cls(post, user, comments)
+
+    @property
+    def roots(self):
+        """Comentarios de primer nivel (sin padre)."""
+        return self.children.get(None, [])
+
+    def replies_to(self, comment):
+        """Respuestas directas a un comentario, en orden de creación."""
+        return self.children.get(comment.id, [])
+
+    def is_liked(self, comment):
+        """Indica si el usuario que consulta ha dado like al comentario."""
+        return comment.id in self.liked_ids
@@ -0,0 +1,277 @@
+"""
+Progreso de los usuarios en los cursos.
+
+UserCourseProgress guarda cuántas lecciones del curso ha completado el
+usuario (completed_lessons_count) y cuántas tiene el curso
+(total_lessons_count). Al marcar o desmarcar una lección se aplica un +1 o -1
+al contador en la misma transacción, con la fila de progreso bloqueada, en
+lugar de volver a contar las lecciones del curso y las completadas.
+
+Las señales de Lesson mantienen total_lessons_count al añadir o eliminar
+lecciones y el comando rebuild_course_progress corrige cualquier desfase.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateTimeField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import Lesson, UserCourseProgress, UserLessonProgress
+
+
+def compute_percentage(completed, total):
+    """Porcentaje de progreso a partir de los contadores."""
+    if total <= 0:
+        return 0
+    return (completed / total) * 100
+
+
+def count_course_progress(user, course_id):
+    """
+    Cuenta desde cero las lecciones del curso y las completadas por el usuario.
+
+    Returns:
+        dict: completed_lessons_count y total_lessons_count
+    """
+    return {
+        'completed_lessons_count': UserLessonProgress.objects.filter(
+            user=user, lesson__course_id=course_id, completed=True
+        ).count(),
+        'total_lessons_count': Lesson.objects.filter(course_id=course_id).count(),
+    }
+
+
+def _locked_course_progress(user, course_id):
+    """
+    Progreso del curso bloqueado para actualizar (debe llamarse dentro de una
+    transacción). Si no existe se crea con los contadores calculados desde cero.
+
+    Returns:
+        tuple: (UserCourseProgress, True si se acaba de crear)
+    """
+    progress = UserCourseProgress.objects.select_for_update().filter(user=user, course_id=course_id).first()
+    if progress is not None:
+        return progress, False
+
+    counters = count_course_progress(user, course_id)
+    try:
+        with transaction.atomic():
+            progress = UserCourseProgress.objects.create(
+                user=user,
+                course_id=course_id,
+                progress_percentage=compute_percentage(
+                    counters['completed_lessons_count'], counters['total_lessons_count']
+                ),
+                last_accessed_at=timezone.now(),
+                **counters
+            )
+        return progress, True
+    except IntegrityError:
+        # Otra petición del mismo usuario ha creado el progreso entre medias
+        return UserCourseProgress.objects.select_for_update().get(user=user, course_id=course_id), False
+
+
+def apply_completion_delta(user, course_id, delta):
+    """
+    Aplica un cambio en el número de lecciones completadas de un curso.
+
+    Debe llamarse en la misma transacción que el cambio de la lección y
+    después de guardarlo: si el progreso del curso no existía se cuenta desde
+    cero (incluyendo ya ese cambio) y no se aplica el delta.
+
+    Args:
+        user: Usuario
+        course_id: ID del curso
+        delta: +1 (lección completada), -1 (desmarcada) o 0 (solo acceso)
+
+    Returns:
+        UserCourseProgress: Progreso actualizado
+    """
+    progress, created = _locked_course_progress(user, course_id)
+    if created:
+        return progress
+
+    progress.completed_lessons_count = max(progress.completed_lessons_count + delta, 0)
+    progress.progress_percentage = compute_percentage(
+        progress.completed_lessons_count, progress.total_lessons_count
+    )
+    progress.last_accessed_at = timezone.now()
+    # save() recalcula también completed_at a partir del porcentaje
+    progress.save()
+    return progress
+
+
+def completion_delta(was_completed, is_completed):
+    """+1, -1 o 0 según cómo cambia el estado de una lección."""
+    return int(bool(is_completed)) - int(bool(was_completed))
+
+
+def set_lesson_completed(user, lesson, completed):
+    """
+    Marca o desmarca una lección como completada y actualiza el progreso del curso.
+
+    Returns:
+        tuple: (UserLessonProgress, UserCourseProgress)
+    """
+    with transaction.atomic():
+        lesson_progress = UserLessonProgress.objects.select_for_update().filter(user=user, lesson=lesson).first()
+        was_completed = lesson_progress is not None and lesson_progress.completed
+
+        if lesson_progress is None:
+            lesson_progress = UserLessonProgress(user=user, lesson=lesson)
+        lesson_progress.completed = completed
+        lesson_progress.completion_date = timezone.now() if completed else None
+        lesson_progress.save()
+
+        course_progress = apply_completion_delta(
+            user, lesson.course_id, completion_delta(was_completed, completed)
+        )
+    return lesson_progress, course_progress
+
+
+def delete_lesson_progress(lesson_progress):
+    """Elimina el progreso de una lección descontándolo del progreso del curso."""
+    with transaction.atomic():
+        was_completed = UserLessonProgress.objects.select_for_update().filter(
+            pk=lesson_progress.pk
+        ).values_list('completed', flat=True).first()
+        course_id = lesson_progress.lesson.course_id
+        lesson_progress.delete()
+        if was_completed:
+            apply_completion_delta(lesson_progress.user, course_id, -1)
+
+
+def refresh_progress_percentage(queryset):
+    """
+    Recalcula en la base de datos progress_percentage y completed_at de un
+    queryset de UserCourseProgress a partir de sus contadores.
+    """
+    total = F('total_lessons_count')
+    is_complete = Q(total_lessons_count__gt=0, completed_lessons_count__gte=total)
+    return queryset.update(
+        progress_percentage=Case(
+            When(total_lessons_count__gt=0, then=Cast('completed_lessons_count', FloatField()) * 100 / total),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        completed_at=Case(
+            When(is_complete, then=Coalesce(F('completed_at'), Value(timezone.now()))),
+            default=Value(None),
+            output_field=DateTimeField(),
+        ),
+    )
+
+
+def add_lesson_to_course_progress(course_id):
+    """Suma una lección nueva al total de todos los progresos del curso."""
+    queryset = UserCourseProgress.objects.filter(course_id=course_id)
+    queryset.update(total_lessons_count=F('total_lessons_count') + 1)
+    refresh_progress_percentage(queryset)
+
+
+def counter_subqueries():
+    """
+    Subconsultas correlacionadas con los valores reales de los contadores de
+    un UserCourseProgress: (completadas, total).
+    """
+    completed = UserLessonProgress.objects.filter(
+        user=OuterRef('user'), lesson__course=OuterRef('course'), completed=True
+    ).order_by().values('user').annotate(total=Count('pk')).values('total')
+    total = Lesson.objects.filter(
+        course=OuterRef('course')
+    ).order_by().values('course').annotate(total=Count('pk')).values('total')
+    return (
+        Coalesce(Subquery(completed, output_field=IntegerField()), 0),
+        Coalesce(Subquery(total, output_field=IntegerField()), 0),
+    )
+
+
+def recalculate_course_progress(queryset):
+    """
+    Recalcula desde cero los contadores y el porcentaje de un queryset de
+    UserCourseProgress (p. ej. los de un curso al eliminar una lección).
+    """
+    completed, total = counter_subqueries()
+    queryset.update(completed_lessons_count=completed, total_lessons_count=total)
+    return refresh_progress_percentage(queryset)
+
+
+def sync_lesson_progress(user, updates):
+    """
+    Aplica de una vez muchas actualizaciones de progreso de lecciones.
+
+    Las actualizaciones de una misma lección se combinan (se suman los
+    segundos y prevalece el último estado de completado). Primero se insertan
+    vacías las filas que faltan (ignorando las que otra petición cree entre
+    medias), después se bloquean todas y se actualizan con bulk_update a
+    partir de su valor real, de modo que los segundos de peticiones
+    simultáneas se suman y el progreso de cada curso afectado se actualiza
+    una sola vez con la suma real de sus cambios.
+
+    Args:
+        user: Usuario
+        updates: Lista de dicts con lesson (ID), completed (opcional) y
+                 time_spent_seconds (segundos a sumar, opcional)
+
+    Returns:
+        tuple: (progresos de las lecciones, progresos de los cursos afectados)
+
+    Raises:
+        Lesson.DoesNotExist: Si alguna lección no existe
+    """
+    merged = {}
+    for update in updates:
+        entry = merged.setdefault(update['lesson'], {'completed': None, 'time_spent_seconds': 0})
+        if update.get('completed') is not None:
+            entry['completed'] = update['completed']
+        entry['time_spent_seconds'] += update.get('time_spent_seconds') or 0
+
+    course_ids = dict(Lesson.objects.filter(pk__in=merged).values_list('pk', 'course_id'))
+    missing = [str(lesson_id) for lesson_id in merged if lesson_id not in course_ids]
+    if missing:
+        raise Lesson.DoesNotExist(f"Lecciones no encontradas: {', '.join(missing)}")
+
+    now = timezone.now()
+    course_deltas = {}
+
+    with transaction.atomic():
+        existing_ids = set(
+            UserLessonProgress.objects.filter(user=user, lesson_id__in=merged).values_list('lesson_id', flat=True)
+        )
+        new_ids = [lesson_id for lesson_id in merged if lesson_id not in existing_ids]
+        if new_ids:
+            # Filas vacías para las lecciones nuevas; si otra petición crea alguna
+            # entre medias se conserva la suya y se actualiza abajo como las demás
+            UserLessonProgress.objects.bulk_create([
+                UserLessonProgress(user=user, lesson_id=lesson_id, created_at=now, updated_at=now)
+                for lesson_id in new_ids
+            ], ignore_conflicts=True)
+
+        lesson_progress = list(
+            UserLessonProgress.objects.select_for_update().filter(user=user, lesson_id__in=merged)
+        )
+        for progress in lesson_progress:
+            entry = merged[progress.lesson_id]
+            was_completed = progress.completed
+            is_completed = was_completed if entry['completed'] is None else entry['completed']
+
+            progress.time_spent_seconds += entry['time_spent_seconds']
+            progress.completed = is_completed
+            # bulk_update no pasa por save(): mantener completion_date aquí
+            if is_completed and not progress.completion_date:
+                progress.completion_date = now
+            elif not is_completed:
+                progress.completion_date = None
+            progress.updated_at = now
+
+            course_id = course_ids[progress.lesson_id]
+            course_deltas[course_id] = course_deltas.get(course_id, 0) + completion_delta(was_completed, is_completed)
+
+        UserLessonProgress.objects.bulk_update(
+            lesson_progress, ['completed', 'completion_date', 'time_spent_seconds', 'updated_at']
+        )
+
+        course_progress = [
+            apply_completion_delta(user, course_id, delta) for course_id, delta in course_deltas.items()
+        ]
+
+    return lesson_progress, course_progress
@@ -8,6 +8,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .debug_utils import instrumentation_enabled
 from .models import Post, Category
 from .serializers import PostSerializer
 
@@ -18,7 +19,13 @@ logger = logging.getLogger(__name__)
 def debug_posts(request):
     """
     Endpoint para diagnosticar problemas con los posts.
+
+    Solo disponible con DEBUG_INSTRUMENTATION: ejecuta varios recuentos y
+    crea un post de prueba.
     """
+    if not instrumentation_enabled():
+        return Response({'error': 'No encontrado'}, status=404)
+
     try:
         # 1. Contar posts totales
         total_posts = Post.objects.all().count()
@@ -9,6 +9,32 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+def instrumentation_enabled():
+    """
+    Indica si están activos los diagnósticos de depuración (DEBUG_INSTRUMENTATION).
+
+    Los diagnósticos que ejecutan consultas o tocan el sistema de archivos solo
+    para escribir en los logs deben comprobarlo antes, de modo que con la
+    opción desactivada no cuesten nada.
+    """
+    return getattr(settings, 'DEBUG_INSTRUMENTATION', False)
+
+def log_feed_diagnostics(queryset, category=None):
+    """
+    Registra recuentos del feed de posts para diagnóstico.
+
+    Ejecuta varias consultas extra: solo debe llamarse con
+    instrumentation_enabled().
+    """
+    total = queryset.model.objects.count()
+    logger.info(f"Total de posts en la base de datos: {total}")
+    if total > 0:
+        latest_post = queryset.model.objects.select_related('author').latest('created_at')
+        logger.info(f"Post más reciente: ID={latest_post.id}, autor={latest_post.author.username}, título={latest_post.title}")
+    if category:
+        logger.info(f"Filtrando por categoría: {category}, posts resultantes: {queryset.count()}")
+    logger.info(f"Devolviendo {queryset.count()} posts")
+
 def log_request_details(request, prefix="DEBUG"):
     """
     Registra detalles de la solicitud para diagnóstico.
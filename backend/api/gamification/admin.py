@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserLevel, UserAction, UserActionLog, UserAchievement, UserAchievementUnlock
+from .models import UserLevel, UserAction, UserActionLog, UserAchievement, UserAchievementUnlock, UserDailyPoints, UserStats
 from django.utils.html import format_html
 
 @admin.register(UserLevel)
@@ -49,3 +49,17 @@ class UserAchievementUnlockAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'achievement__name')
     date_hierarchy = 'unlocked_at'
     raw_id_fields = ('user', 'achievement')
+
+@admin.register(UserDailyPoints)
+class UserDailyPointsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'points')
+    list_filter = ('date',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('user',)
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'comments_count', 'post_likes_received', 'comment_likes_received', 'current_streak', 'last_active_date')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
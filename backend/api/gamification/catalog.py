@@ -0,0 +1,94 @@
+"""
+Catálogo en memoria de acciones (UserAction), niveles (UserLevel) y logros
+(UserAchievement).
+
+Son tablas pequeñas que casi nunca cambian pero se consultan en cada
+award_points. El catálogo se carga con tres consultas, se invalida mediante
+señales cuando se editan desde el admin (o desde cualquier otro sitio) y se
+recarga como máximo cada GAMIFICATION_CATALOG_TTL segundos para recoger los
+cambios hechos en otros procesos.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import UserAchievement, UserAction, UserLevel
+
+
+class GamificationCatalog:
+    """
+    Caché por proceso de las acciones, niveles y logros de gamificación.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._actions = {}          # action_type -> primera UserAction de ese tipo
+        self._active_actions = {}   # action_type -> UserAction activa
+        self._levels = []           # UserLevel ordenados por nivel
+        self._achievements = {}     # achievement_type -> UserAchievement ordenados por required_value
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        ttl = getattr(settings, 'GAMIFICATION_CATALOG_TTL', 300)
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= ttl:
+                return
+
+            actions = {}
+            active_actions = {}
+            for action in UserAction.objects.order_by('id'):
+                actions.setdefault(action.action_type, action)
+                if action.is_active:
+                    active_actions.setdefault(action.action_type, action)
+
+            self._actions = actions
+            self._active_actions = active_actions
+            self._levels = list(UserLevel.objects.order_by('level'))
+
+            achievements = {}
+            for achievement in UserAchievement.objects.order_by('achievement_type', 'required_value', 'id'):
+                achievements.setdefault(achievement.achievement_type, []).append(achievement)
+            self._achievements = achievements
+
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Descarta el catálogo para que se recargue en el siguiente acceso."""
+        with self._lock:
+            self._loaded_at = None
+
+    def get_action(self, action_type, active_only=True):
+        """Devuelve la UserAction de un tipo (o None si no está configurada)."""
+        self._ensure_loaded()
+        actions = self._active_actions if active_only else self._actions
+        return actions.get(action_type)
+
+    def get_levels(self):
+        """Todos los niveles ordenados de menor a mayor."""
+        self._ensure_loaded()
+        return self._levels
+
+    def get_level_for_points(self, points):
+        """Nivel más alto cuyo requisito de puntos se cumple (o None)."""
+        reached = None
+        for level in self.get_levels():
+            if level.points_required <= points and (reached is None or level.level > reached.level):
+                reached = level
+        return reached
+
+    def get_achievements_by_type(self):
+        """Logros agrupados por tipo, cada grupo ordenado por required_value."""
+        self._ensure_loaded()
+        return self._achievements
+
+    def get_next_level(self, current_level):
+        """Primer nivel por encima del actual (o None si es el máximo)."""
+        for level in self.get_levels():
+            if level.level > current_level:
+                return level
+        return None
+
+
+# Catálogo compartido por todo el proceso
+catalog = GamificationCatalog()
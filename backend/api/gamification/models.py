@@ -120,3 +120,78 @@ class UserActionLog(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.action.get_action_type_display()} - {self.points_earned} puntos"
+
+
+class UserDailyPoints(models.Model):
+    """
+    Puntos ganados por cada usuario en cada día.
+    Agregado diario de UserActionLog que permite calcular los rankings
+    semanales y mensuales sumando como máximo 31 filas por usuario.
+    """
+    user = models.ForeignKey('api.User', on_delete=models.CASCADE, related_name='daily_points')
+    date = models.DateField()
+    points = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('user', 'date')
+        indexes = [models.Index(fields=['date'])]
+        ordering = ['-date']
+        verbose_name = 'Puntos Diarios'
+        verbose_name_plural = 'Puntos Diarios'
+        app_label = 'api'  # Indicamos explícitamente que pertenece a la app 'api'
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date} - {self.points} puntos"
+
+
+class RankBucket(models.Model):
+    """
+    Ranking materializado por puntuación.
+    Una fila por cada puntuación alcanzada por algún usuario, con cuántos
+    usuarios la tienen y cuántos tienen más puntos, de modo que la posición de
+    cualquier usuario es una búsqueda por clave primaria (users_above + 1).
+    award_points y las señales de User lo mantienen al cambiar los puntos.
+    """
+    points = models.PositiveIntegerField(primary_key=True)
+    users = models.PositiveIntegerField(default=0)  # Usuarios con exactamente estos puntos
+    users_above = models.PositiveIntegerField(default=0)  # Usuarios con más puntos
+    
+    class Meta:
+        ordering = ['-points']
+        verbose_name = 'Tramo del Ranking'
+        verbose_name_plural = 'Tramos del Ranking'
+        app_label = 'api'  # Indicamos explícitamente que pertenece a la app 'api'
+    
+    def __str__(self):
+        return f"{self.points} puntos - {self.users} usuarios - posición {self.users_above + 1}"
+
+
+class UserStats(models.Model):
+    """
+    Contadores de actividad de cada usuario.
+    Se mantienen mediante señales al crear o borrar posts, comentarios y likes,
+    de modo que los logros se evalúan sin volver a contar las tablas de contenido.
+    """
+    user = models.OneToOneField('api.User', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    post_likes_received = models.PositiveIntegerField(default=0)
+    comment_likes_received = models.PositiveIntegerField(default=0)
+    current_streak = models.PositiveIntegerField(default=0)  # Días consecutivos con actividad
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_active_date = models.DateField(blank=True, null=True)
+    # Calendario de actividad: el bit i indica actividad i días antes de last_active_date
+    activity_bitmap = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Estadísticas de Usuario'
+        verbose_name_plural = 'Estadísticas de Usuarios'
+        app_label = 'api'  # Indicamos explícitamente que pertenece a la app 'api'
+    
+    @property
+    def likes_received(self):
+        return self.post_likes_received + self.comment_likes_received
+    
+    def __str__(self):
+        return f"Estadísticas de {self.user.username}"
@@ -0,0 +1,161 @@
+"""
+Ranking de usuarios por puntos.
+
+La posición de un usuario es el número de usuarios con más puntos + 1. Se
+lee de RankBucket, un ranking materializado con una fila por puntuación que
+guarda cuántos usuarios la tienen (users) y cuántos tienen más puntos
+(users_above): la posición es una búsqueda por clave primaria, sin contar
+usuarios.
+
+Cuando un usuario pasa de A a B puntos, las puntuaciones entre A y B ganan
+(o pierden) un usuario por encima, así que mover a un usuario es un UPDATE
+sobre ese rango de tramos, que en la práctica son pocos porque cada acción
+suma pocos puntos. award_points lo hace una vez por transacción y las
+señales de User cubren altas, bajas y cambios de puntos desde el admin. El
+comando rebuild_rank_buckets recalcula la tabla desde User.points y detecta
+desfases con --check.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+
+from api.models import User
+from .models import RankBucket
+
+
+def compute_rank_buckets(points_values=()):
+    """
+    Calcula el ranking materializado a partir de User.points.
+
+    Args:
+        points_values: Puntuaciones sin usuarios que también se quieren calcular
+
+    Returns:
+        dict: puntos -> (usuarios con esos puntos, usuarios con más puntos)
+    """
+    users_by_points = dict(
+        User.objects.values_list('points').annotate(total=Count('pk')).order_by()
+    )
+    buckets = {}
+    users_above = 0
+    for points in sorted(set(users_by_points) | set(points_values), reverse=True):
+        users = users_by_points.get(points, 0)
+        buckets[points] = (users, users_above)
+        users_above += users
+    return buckets
+
+
+def lock_rank_buckets():
+    """
+    Bloquea la tabla de tramos frente a cualquier otra escritura hasta el
+    final de la transacción (las lecturas del ranking siguen sin bloquearse).
+    En SQLite las escrituras ya están serializadas.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {connection.ops.quote_name(RankBucket._meta.db_table)} IN EXCLUSIVE MODE'
+            )
+
+
+def _ensure_bucket(points):
+    """Crea el tramo de una puntuación que todavía no tiene ningún usuario."""
+    if RankBucket.objects.filter(points=points).exists():
+        return
+    # Con la tabla bloqueada ningún otro usuario se mueve mientras se calcula
+    # cuántos usuarios quedan por encima del tramo nuevo
+    lock_rank_buckets()
+    above = RankBucket.objects.filter(points__gt=points).order_by('points').first()
+    RankBucket.objects.get_or_create(
+        points=points,
+        defaults={'users_above': above.users_above + above.users if above else 0}
+    )
+
+
+def move_in_ranking(old_points, new_points):
+    """
+    Mueve a un usuario en el ranking materializado.
+
+    Debe ejecutarse en la misma transacción que cambia los puntos y, como
+    mucho, una vez por transacción: crear un tramo bloquea la tabla, y dos
+    transacciones que ya hubieran movido a un usuario se bloquearían entre sí.
+
+    Args:
+        old_points: Puntos anteriores del usuario (None si es un usuario nuevo)
+        new_points: Puntos actuales del usuario (None si se ha borrado)
+    """
+    if old_points == new_points:
+        return
+
+    with transaction.atomic():
+        if new_points is not None:
+            _ensure_bucket(new_points)
+
+        # Tramos cuyo número de usuarios por encima cambia: entre la puntuación
+        # antigua (incluida) y la nueva (excluida); un alta o una baja afecta
+        # a todos los tramos por debajo de su puntuación
+        if old_points is None:
+            between, delta = {'points__lt': new_points}, 1
+        elif new_points is None:
+            between, delta = {'points__lt': old_points}, -1
+        elif new_points > old_points:
+            between, delta = {'points__gte': old_points, 'points__lt': new_points}, 1
+        else:
+            between, delta = {'points__gte': new_points, 'points__lt': old_points}, -1
+
+        # Bloquear en orden ascendente todos los tramos que se van a modificar
+        # para que dos movimientos simultáneos no se bloqueen entre sí
+        if old_points is None or new_points is None:
+            lowest, highest = 0, old_points if new_points is None else new_points
+        else:
+            lowest, highest = min(old_points, new_points), max(old_points, new_points)
+        list(RankBucket.objects.select_for_update().filter(
+            points__gte=lowest, points__lte=highest
+        ).order_by('points').values_list('points', flat=True))
+
+        if old_points is not None:
+            RankBucket.objects.filter(points=old_points).update(users=F('users') - 1)
+        if new_points is not None:
+            RankBucket.objects.filter(points=new_points).update(users=F('users') + 1)
+        RankBucket.objects.filter(**between).update(users_above=F('users_above') + delta)
+
+
+def position_for_points(points):
+    """
+    Posición en el ranking correspondiente a una puntuación:
+    número de usuarios con más puntos + 1.
+    """
+    # El primer tramo con al menos esos puntos: si es el de la puntuación,
+    # sus usuarios por encima; si es uno mayor, también los suyos
+    bucket = RankBucket.objects.filter(points__gte=points).order_by('points').first()
+    if bucket is None:
+        return 1
+    if bucket.points == points:
+        return bucket.users_above + 1
+    return bucket.users_above + bucket.users + 1
+
+
+def position_of(user):
+    """
+    Posición en el ranking de un usuario. Usa la posición anotada con
+    with_positions si el usuario viene de un queryset anotado.
+    """
+    position = getattr(user, 'rank_position', None)
+    if position is not None:
+        return position
+    return position_for_points(user.points)
+
+
+def with_positions(queryset):
+    """
+    Anota en cada usuario su posición en el ranking (rank_position) leyendo
+    su tramo por clave primaria en la misma consulta.
+    """
+    users_above = RankBucket.objects.filter(points=OuterRef('points')).values('users_above')[:1]
+    return queryset.annotate(
+        rank_position=Subquery(users_above, output_field=IntegerField()) + 1
+    )
+
+
+def top_users(limit=10):
+    """Los `limit` usuarios con más puntos, en orden (desempate por id)."""
+    return list(User.objects.order_by('-points', 'id')[:limit])
@@ -1,7 +1,11 @@
-from django.db.models import F, Count, Q
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
 from django.utils import timezone
 from datetime import timedelta
-from .models import UserLevel, UserAction, UserActionLog, UserAchievement, UserAchievementUnlock
+from .models import UserActionLog, UserAchievementUnlock, UserDailyPoints
+from .catalog import catalog
+from .ranking import move_in_ranking
+from .stats import get_achievement_values, get_user_stats, record_activity
 import logging
 
 # Configurar logger
@@ -11,6 +15,21 @@ def award_points(user, action_type, reference_id=None):
     """
     Otorga puntos a un usuario por una acción específica.
     
+    Todo el proceso (registro de la acción, suma de puntos, agregado diario,
+    racha de actividad, subida de nivel y logros) se ejecuta en una única
+    transacción. Las acciones, niveles y logros se leen del catálogo en
+    memoria, así que el coste habitual es:
+    
+        - INSERT del UserActionLog
+        - UPDATE ... RETURNING de los puntos del usuario
+        - UPDATE del agregado diario (más un INSERT la primera vez del día)
+        - SELECT de UserStats (más un UPDATE de la racha la primera vez del día)
+        - SELECT de los logros ya desbloqueados, solo si el usuario alcanza alguno
+        - UPDATE de los tramos del ranking entre la puntuación anterior y la nueva
+    
+    Una subida de nivel añade un UPDATE del nivel y la misma secuencia de
+    INSERT + UPDATE ... RETURNING + agregado diario para la bonificación.
+    
     Args:
         user: Instancia del modelo User
         action_type: Tipo de acción (create_post, create_comment, etc.)
@@ -21,32 +40,36 @@ def award_points(user, action_type, reference_id=None):
     """
     try:
         # Buscar la acción correspondiente y sus puntos asociados
-        try:
-            action = UserAction.objects.get(action_type=action_type, is_active=True)
-        except UserAction.DoesNotExist:
+        action = catalog.get_action(action_type)
+        if action is None:
             # Si la acción no está configurada, no hacemos nada
             logger.warning(f"Acción {action_type} no configurada en el sistema")
             return {'success': False, 'message': f'Acción {action_type} no configurada en el sistema'}
         
-        # Registrar la acción en el log y otorgar puntos
-        action_log = UserActionLog.objects.create(
-            user=user,
-            action=action,
-            points_earned=action.points,
-            reference_id=reference_id
-        )
-        
-        # Actualizar los puntos del usuario
-        old_points = user.points
-        user.points = F('points') + action.points
-        user.save(update_fields=['points'])
-        user.refresh_from_db()  # Recargar para tener el valor actualizado
-        
-        # Comprobar si el usuario ha subido de nivel
-        level_up_info = check_level_up(user, old_points)
-        
-        # Comprobar si ha desbloqueado logros
-        check_achievements(user)
+        with transaction.atomic():
+            # Registrar la acción en el log y otorgar puntos
+            UserActionLog.objects.create(
+                user=user,
+                action=action,
+                points_earned=action.points,
+                reference_id=reference_id
+            )
+            
+            # Actualizar los puntos del usuario (los anteriores, tal y como estaban en la base de datos)
+            old_points = add_points(user, action.points) - action.points
+            
+            # Registrar la actividad del día en la racha del usuario
+            stats = get_user_stats(user)
+            record_activity(stats)
+            
+            # Comprobar si el usuario ha subido de nivel
+            level_up_info = check_level_up(user, old_points)
+            
+            # Comprobar si ha desbloqueado logros
+            check_achievements(user, stats)
+            
+            # Mover al usuario en el ranking una sola vez con todos los puntos ganados
+            move_in_ranking(old_points, user.points)
         
         return {
             'success': True, 
@@ -59,6 +82,80 @@ def award_points(user, action_type, reference_id=None):
         logger.error(f"Error al otorgar puntos: {str(e)}")
         return {'success': False, 'message': str(e)}
 
+def add_points(user, points):
+    """
+    Suma puntos a un usuario con un único UPDATE ... RETURNING, actualiza el
+    valor en memoria de la instancia y el agregado diario de puntos.
+    
+    No mueve al usuario en el ranking materializado: quien llama lo hace una
+    vez por transacción con move_in_ranking (ver award_points).
+    
+    Args:
+        user: Instancia del modelo User
+        points: Puntos a sumar
+        
+    Returns:
+        int: Puntos totales del usuario tras la suma
+    """
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {quote_name(user._meta.db_table)} SET {quote_name('points')} = {quote_name('points')} + %s "
+            f"WHERE {quote_name('id')} = %s RETURNING {quote_name('points')}",
+            [points, user.pk]
+        )
+        user.points = cursor.fetchone()[0]
+    
+    record_daily_points(user, points)
+    return user.points
+
+def record_daily_points(user, points):
+    """
+    Suma puntos al agregado diario del usuario (UserDailyPoints).
+    
+    Args:
+        user: Instancia del modelo User
+        points: Puntos ganados
+    """
+    if not points:
+        return
+    
+    today = timezone.localdate()
+    updated = UserDailyPoints.objects.filter(user=user, date=today).update(points=F('points') + points)
+    if updated:
+        return
+    
+    try:
+        with transaction.atomic():
+            UserDailyPoints.objects.create(user=user, date=today, points=points)
+    except IntegrityError:
+        # Otra petición ha creado la fila del día entre medias
+        UserDailyPoints.objects.filter(user=user, date=today).update(points=F('points') + points)
+
+def get_period_leaderboard(days, limit=10):
+    """
+    Obtiene el ranking de los usuarios que más puntos han ganado en los últimos días.
+    
+    Args:
+        days: Tamaño de la ventana en días (incluyendo hoy)
+        limit: Número máximo de usuarios a devolver
+        
+    Returns:
+        list: Usuarios anotados con period_points (puntos del período),
+        ordenados de mayor a menor y leídos en una sola consulta
+    """
+    from api.models import User
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    
+    users = User.objects.filter(
+        daily_points__date__gte=since
+    ).annotate(
+        period_points=Sum('daily_points__points')
+    ).order_by('-period_points', 'id')[:limit]
+    
+    return list(users)
+
 def check_level_up(user, old_points):
     """
     Comprueba si el usuario ha subido de nivel con los puntos ganados.
@@ -71,15 +168,12 @@ def check_level_up(user, old_points):
         dict: Información sobre la subida de nivel (si ocurrió)
     """
     try:
-        # Obtener todos los niveles que requieren menos puntos que los que tiene el usuario
-        possible_levels = UserLevel.objects.filter(points_required__lte=user.points).order_by('-level')
+        # El nivel más alto que el usuario puede tener según el catálogo de niveles
+        highest_possible_level = catalog.get_level_for_points(user.points)
         
-        if not possible_levels.exists():
+        if highest_possible_level is None:
             return {'level_up': False}
         
-        # El nivel más alto que el usuario puede tener
-        highest_possible_level = possible_levels.first()
-        
         # Si el usuario ya tiene este nivel o mayor, no hay subida
         if user.level >= highest_possible_level.level:
             return {'level_up': False}
@@ -92,7 +186,7 @@ def check_level_up(user, old_points):
         user.save(update_fields=['level'])
         
         # Crear registro de acción por subir de nivel
-        level_up_action = UserAction.objects.filter(action_type='achievement_unlock').first()
+        level_up_action = catalog.get_action('achievement_unlock', active_only=False)
         if level_up_action:
             UserActionLog.objects.create(
                 user=user,
@@ -101,9 +195,7 @@ def check_level_up(user, old_points):
                 reference_id=f"level_up_{highest_possible_level.level}"
             )
             # Actualizar puntos por el logro de subir de nivel
-            user.points = F('points') + level_up_action.points
-            user.save(update_fields=['points'])
-            user.refresh_from_db()
+            add_points(user, level_up_action.points)
         
         return {
             'level_up': True,
@@ -120,143 +212,81 @@ def check_level_up(user, old_points):
         logger.error(f"Error al comprobar subida de nivel: {str(e)}")
         return {'level_up': False, 'error': str(e)}
 
-def check_achievements(user):
+def check_achievements(user, stats=None):
     """
     Verifica si el usuario ha conseguido nuevos logros.
     
+    Los logros se evalúan en memoria contra los contadores de UserStats,
+    agrupados por tipo: como cada grupo está ordenado por required_value, se
+    recorre solo hasta el primer logro que el usuario todavía no alcanza.
+    
     Args:
         user: Instancia del modelo User
+        stats: Instancia de UserStats del usuario (se carga si no se pasa)
         
     Returns:
         list: Lista de nuevos logros desbloqueados
     """
     try:
-        # Logros ya desbloqueados por el usuario
+        if stats is None:
+            stats = get_user_stats(user)
+        values = get_achievement_values(user, stats)
+        
+        # Logros cuyos requisitos cumple el usuario según sus contadores
+        reached = []
+        for achievement_type, achievements in catalog.get_achievements_by_type().items():
+            value = values.get(achievement_type)
+            if value is None:
+                # Los logros especiales se otorgan de forma personalizada
+                continue
+            for achievement in achievements:
+                if achievement.required_value > value:
+                    break
+                reached.append(achievement)
+        
+        if not reached:
+            return []
+        
+        # Logros ya desbloqueados por el usuario entre los alcanzados
         unlocked_achievements = set(UserAchievementUnlock.objects.filter(
-            user=user
+            user=user,
+            achievement_id__in=[achievement.id for achievement in reached]
         ).values_list('achievement_id', flat=True))
         
-        # Todos los logros disponibles que el usuario no ha desbloqueado aún
-        available_achievements = UserAchievement.objects.exclude(
-            id__in=unlocked_achievements
-        )
-        
         newly_unlocked = []
-        
-        for achievement in available_achievements:
-            if has_completed_achievement(user, achievement):
-                # Desbloquear el logro
-                UserAchievementUnlock.objects.create(
-                    user=user,
-                    achievement=achievement
-                )
-                
-                # Otorgar puntos por el logro
-                if achievement.points_reward > 0:
-                    user.points = F('points') + achievement.points_reward
-                    user.save(update_fields=['points'])
-                    user.refresh_from_db()
-                
-                newly_unlocked.append({
-                    'id': achievement.id,
-                    'name': achievement.name,
-                    'description': achievement.description,
-                    'icon': achievement.icon,
-                    'badge_color': achievement.badge_color,
-                    'points_reward': achievement.points_reward
-                })
+        points_reward = 0
+        
+        for achievement in reached:
+            if achievement.id in unlocked_achievements:
+                continue
+            
+            # Desbloquear el logro; si otra petición simultánea ya lo ha hecho, no se premia dos veces
+            _, created = UserAchievementUnlock.objects.get_or_create(
+                user=user,
+                achievement=achievement
+            )
+            if not created:
+                continue
+            
+            points_reward += achievement.points_reward
+            newly_unlocked.append({
+                'id': achievement.id,
+                'name': achievement.name,
+                'description': achievement.description,
+                'icon': achievement.icon,
+                'badge_color': achievement.badge_color,
+                'points_reward': achievement.points_reward
+            })
+        
+        # Otorgar los puntos de todos los logros con una sola actualización
+        if points_reward > 0:
+            add_points(user, points_reward)
         
         return newly_unlocked
     except Exception as e:
         logger.error(f"Error al comprobar logros: {str(e)}")
         return []
 
-def has_completed_achievement(user, achievement):
-    """
-    Verifica si un usuario ha cumplido los requisitos para un logro específico.
-    
-    Args:
-        user: Instancia del modelo User
-        achievement: Instancia del modelo UserAchievement
-        
-    Returns:
-        bool: True si el usuario ha cumplido los requisitos, False en caso contrario
-    """
-    from api.models import Post, Comment, PostLike, CommentLike
-    
-    # Verificar según el tipo de logro
-    if achievement.achievement_type == 'post_count':
-        post_count = Post.objects.filter(author=user).count()
-        return post_count >= achievement.required_value
-        
-    elif achievement.achievement_type == 'comment_count':
-        comment_count = Comment.objects.filter(author=user).count()
-        return comment_count >= achievement.required_value
-        
-    elif achievement.achievement_type == 'like_received':
-        # Contar likes recibidos en posts y comentarios
-        post_likes = Post.objects.filter(author=user).aggregate(
-            total_likes=Count('user_likes')
-        )['total_likes'] or 0
-        
-        comment_likes = Comment.objects.filter(author=user).aggregate(
-            total_likes=Count('user_likes')
-        )['total_likes'] or 0
-        
-        total_likes = post_likes + comment_likes
-        return total_likes >= achievement.required_value
-        
-    elif achievement.achievement_type == 'level_up':
-        # Verificar si el usuario ha alcanzado cierto nivel
-        return user.level >= achievement.required_value
-        
-    elif achievement.achievement_type == 'consecutive_days':
-        # Este requeriría un sistema adicional para rastrear días consecutivos
-        # Como aproximación, podemos ver si tiene actividad en los últimos N días
-        # No es exactamente días consecutivos, pero es una aproximación
-        days_required = achievement.required_value
-        activity_dates = set()
-        
-        # Revisar actividad en los últimos X días (X siendo más que los días requeridos)
-        check_period = days_required * 2  # Verificamos el doble de días para flexibilidad
-        
-        # Obtener fechas de actividad reciente (posts, comentarios)
-        from django.db.models import DateField
-        from django.db.models.functions import TruncDate
-        
-        # Fechas de posts
-        post_dates = Post.objects.filter(
-            author=user, 
-            created_at__gte=timezone.now() - timedelta(days=check_period)
-        ).annotate(
-            date=TruncDate('created_at')
-        ).values_list('date', flat=True)
-        
-        # Fechas de comentarios
-        comment_dates = Comment.objects.filter(
-            author=user,
-            created_at__gte=timezone.now() - timedelta(days=check_period)
-        ).annotate(
-            date=TruncDate('created_at')
-        ).values_list('date', flat=True)
-        
-        # Fechas de likes dados
-        like_dates = PostLike.objects.filter(
-            user=user,
-            created_at__gte=timezone.now() - timedelta(days=check_period)
-        ).annotate(
-            date=TruncDate('created_at')
-        ).values_list('date', flat=True)
-        
-        # Combinar todas las fechas
-        all_dates = set(list(post_dates) + list(comment_dates) + list(like_dates))
-        
-        # Verificar si hay suficientes fechas únicas
-        return len(all_dates) >= achievement.required_value
-        
-    # Para logros especiales, se manejarían de forma personalizada
-    return False
-
 def get_points_to_next_level(user):
     """
     Obtiene la cantidad de puntos que necesita el usuario para subir al siguiente nivel.
@@ -268,9 +298,7 @@ def get_points_to_next_level(user):
         dict: Información sobre el siguiente nivel y puntos necesarios
     """
     # Obtener el siguiente nivel
-    next_level = UserLevel.objects.filter(
-        level__gt=user.level
-    ).order_by('level').first()
+    next_level = catalog.get_next_level(user.level)
     
     if not next_level:
         return {
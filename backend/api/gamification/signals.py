@@ -0,0 +1,141 @@
+"""
+Señales que mantienen sincronizadas las estructuras derivadas de gamificación.
+"""
+from django.db.models import Count, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from api.models import User, Post, Comment, PostLike, CommentLike
+from .catalog import catalog
+from .models import UserAchievement, UserAction, UserLevel
+from .ranking import move_in_ranking
+from .stats import increment_counter
+
+
+@receiver(pre_save, sender=User)
+def remember_points_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Puntos guardados antes de este save (p. ej. al editarlos desde el admin),
+    # solo si el save puede cambiarlos; award_points mueve el ranking por su cuenta
+    instance._points_before_save = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'points' not in update_fields:
+        return
+    instance._points_before_save = User.objects.filter(
+        pk=instance.pk
+    ).values_list('points', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def update_ranking_on_user_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        move_in_ranking(None, instance.points)
+        return
+    old_points = getattr(instance, '_points_before_save', None)
+    if old_points is None:
+        return
+    new_points = instance.points
+    if not isinstance(new_points, int):
+        # Guardado con una expresión F(): leer el valor resultante
+        new_points = User.objects.filter(pk=instance.pk).values_list('points', flat=True).get()
+    move_in_ranking(old_points, new_points)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_from_ranking(sender, instance, **kwargs):
+    move_in_ranking(instance.points, None)
+
+
+@receiver([post_save, post_delete], sender=UserAction)
+@receiver([post_save, post_delete], sender=UserLevel)
+@receiver([post_save, post_delete], sender=UserAchievement)
+def invalidate_gamification_catalog(sender, **kwargs):
+    # Cualquier cambio en acciones, niveles o logros (p. ej. desde el admin) recarga el catálogo
+    catalog.invalidate()
+
+
+def _author_id(instance, field, model):
+    # Usar el objeto relacionado si ya está en memoria; si no, leer solo su autor
+    descriptor = getattr(type(instance), field)
+    if descriptor.is_cached(instance):
+        return getattr(instance, field).author_id
+    return model.objects.filter(
+        pk=getattr(instance, f'{field}_id')
+    ).values_list('author_id', flat=True).first()
+
+
+def _deleting_posts(origin):
+    # Borrado de uno o varios posts, que se llevan en cascada sus comentarios y likes
+    return isinstance(origin, Post) or (isinstance(origin, QuerySet) and origin.model is Post)
+
+
+@receiver(pre_delete, sender=Post)
+def discount_post_activity(sender, instance, origin=None, **kwargs):
+    # En lugar de descontar cada like y comentario borrado en cascada (un
+    # SELECT del autor y un UPDATE por fila), se descuentan todos de una vez
+    # con un UPDATE por autor; las señales de cada fila no hacen nada
+    if not _deleting_posts(origin):
+        return
+    increment_counter(
+        instance.author_id, 'post_likes_received', -PostLike.objects.filter(post=instance).count()
+    )
+    comments = Comment.objects.filter(post=instance).values_list('author_id').annotate(total=Count('pk')).order_by()
+    for author_id, total in comments:
+        increment_counter(author_id, 'comments_count', -total)
+    comment_likes = CommentLike.objects.filter(comment__post=instance).values_list(
+        'comment__author_id'
+    ).annotate(total=Count('pk')).order_by()
+    for author_id, total in comment_likes:
+        increment_counter(author_id, 'comment_likes_received', -total)
+
+
+@receiver(post_save, sender=Post)
+def increment_posts_count(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(instance.author_id, 'posts_count')
+
+
+@receiver(post_delete, sender=Post)
+def decrement_posts_count(sender, instance, **kwargs):
+    increment_counter(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(instance.author_id, 'comments_count')
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, origin=None, **kwargs):
+    if _deleting_posts(origin):
+        return
+    increment_counter(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=PostLike)
+def increment_post_likes_received(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(_author_id(instance, 'post', Post), 'post_likes_received')
+
+
+@receiver(post_delete, sender=PostLike)
+def decrement_post_likes_received(sender, instance, origin=None, **kwargs):
+    if _deleting_posts(origin):
+        return
+    increment_counter(_author_id(instance, 'post', Post), 'post_likes_received', -1)
+
+
+@receiver(post_save, sender=CommentLike)
+def increment_comment_likes_received(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(_author_id(instance, 'comment', Comment), 'comment_likes_received')
+
+
+@receiver(post_delete, sender=CommentLike)
+def decrement_comment_likes_received(sender, instance, origin=None, **kwargs):
+    if _deleting_posts(origin):
+        return
+    increment_counter(_author_id(instance, 'comment', Comment), 'comment_likes_received', -1)
@@ -0,0 +1,270 @@
+"""
+Contadores de actividad por usuario (UserStats).
+
+Las señales de posts, comentarios y likes aplican incrementos atómicos con
+F() sobre la fila del usuario, así que award_points y la evaluación de logros
+leen una única fila en lugar de contar las tablas de contenido.
+
+La racha se mantiene con un calendario de actividad compacto: un entero de
+ACTIVITY_WINDOW_DAYS bits en el que el bit i indica actividad i días antes
+de last_active_date. Registrar un día nuevo es un desplazamiento de bits y
+un UPDATE, así que comprobar rachas nunca recorre las tablas de contenido.
+
+Si un usuario todavía no tiene fila (usuarios anteriores a la migración o
+filas borradas a mano) se calcula desde cero la primera vez que se necesita.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import UserStats
+
+# Contadores mantenidos por las señales
+COUNTER_FIELDS = ('posts_count', 'comments_count', 'post_likes_received', 'comment_likes_received')
+
+# Días que abarca el calendario de actividad (cabe en un BigIntegerField con signo)
+ACTIVITY_WINDOW_DAYS = 63
+ACTIVITY_MASK = (1 << ACTIVITY_WINDOW_DAYS) - 1
+
+
+def compute_user_counters(user_id):
+    """
+    Calcula los contadores de un usuario contando las tablas de contenido.
+
+    Args:
+        user_id: ID del usuario
+
+    Returns:
+        dict: Valor de cada campo de COUNTER_FIELDS
+    """
+    from api.models import Post, Comment, PostLike, CommentLike
+
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'comments_count': Comment.objects.filter(author_id=user_id).count(),
+        'post_likes_received': PostLike.objects.filter(post__author_id=user_id).count(),
+        'comment_likes_received': CommentLike.objects.filter(comment__author_id=user_id).count(),
+    }
+
+
+def compute_all_user_counters():
+    """
+    Calcula los contadores de todos los usuarios con una consulta agrupada por tabla.
+
+    Returns:
+        dict: user_id -> dict con el valor de cada campo de COUNTER_FIELDS
+              (solo usuarios con algún contador distinto de cero)
+    """
+    from django.db.models import Count
+    from api.models import Post, Comment, PostLike, CommentLike
+
+    sources = {
+        'posts_count': (Post.objects.all(), 'author_id'),
+        'comments_count': (Comment.objects.all(), 'author_id'),
+        'post_likes_received': (PostLike.objects.all(), 'post__author_id'),
+        'comment_likes_received': (CommentLike.objects.all(), 'comment__author_id'),
+    }
+
+    counters = {}
+    for field, (queryset, user_field) in sources.items():
+        rows = queryset.values_list(user_field).annotate(total=Count('pk')).order_by()
+        for user_id, total in rows:
+            counters.setdefault(user_id, dict.fromkeys(COUNTER_FIELDS, 0))[field] = total
+    return counters
+
+
+def get_user_stats(user):
+    """
+    Obtiene la fila de estadísticas del usuario, creándola si no existe.
+
+    Args:
+        user: Instancia del modelo User
+
+    Returns:
+        UserStats: Estadísticas del usuario
+    """
+    try:
+        return UserStats.objects.get(user_id=user.pk)
+    except UserStats.DoesNotExist:
+        pass
+
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(user_id=user.pk, **compute_user_counters(user.pk))
+    except IntegrityError:
+        # Otra petición ha creado la fila entre medias
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def increment_counter(user_id, field, delta=1):
+    """
+    Suma (o resta) un valor a uno de los contadores con un UPDATE atómico.
+
+    Si el usuario no tiene fila y el cambio es positivo, la fila se crea
+    contando desde cero (lo que ya incluye el objeto recién creado). Los
+    decrementos sobre filas inexistentes se ignoran: puede tratarse de un
+    usuario que se está borrando en cascada.
+
+    Args:
+        user_id: ID del usuario
+        field: Nombre del contador (uno de COUNTER_FIELDS)
+        delta: Cantidad a sumar, negativa para restar
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Contador desconocido: {field}")
+    if not delta or user_id is None:
+        return
+
+    queryset = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        # Nunca bajar de cero (campos PositiveIntegerField)
+        queryset.update(**{field: Greatest(F(field) + delta, 0)})
+        return
+
+    if queryset.update(**{field: F(field) + delta}):
+        return
+
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(user_id=user_id, **compute_user_counters(user_id))
+    except IntegrityError:
+        queryset.update(**{field: F(field) + delta})
+
+
+def record_activity(stats, day=None):
+    """
+    Registra actividad del usuario en un día y actualiza su racha y su
+    calendario de actividad en O(1).
+
+    La actualización es condicional sobre la última fecha leída, de modo que
+    si dos peticiones simultáneas registran el mismo día solo una la aplica.
+
+    Args:
+        stats: Instancia de UserStats del usuario
+        day: Fecha de la actividad (por defecto, hoy)
+
+    Returns:
+        bool: True si era la primera actividad del día
+    """
+    day = day or timezone.localdate()
+    previous_date = stats.last_active_date
+
+    if previous_date is not None and previous_date >= day:
+        return False
+
+    gap = (day - previous_date).days if previous_date is not None else None
+
+    if gap == 1:
+        current_streak = stats.current_streak + 1
+    else:
+        current_streak = 1
+    longest_streak = max(stats.longest_streak, current_streak)
+
+    # Desplazar el calendario hasta el nuevo día y marcarlo como activo
+    if gap is not None and gap < ACTIVITY_WINDOW_DAYS:
+        activity_bitmap = ((stats.activity_bitmap << gap) | 1) & ACTIVITY_MASK
+    else:
+        activity_bitmap = 1
+
+    updated = UserStats.objects.filter(
+        user_id=stats.user_id, last_active_date=previous_date
+    ).update(
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+        last_active_date=day,
+        activity_bitmap=activity_bitmap,
+        updated_at=timezone.now()
+    )
+
+    if not updated:
+        # Otra petición ya ha registrado la actividad: recargar sus valores
+        stats.refresh_from_db(fields=['current_streak', 'longest_streak', 'last_active_date', 'activity_bitmap'])
+        return False
+
+    stats.current_streak = current_streak
+    stats.longest_streak = longest_streak
+    stats.last_active_date = day
+    stats.activity_bitmap = activity_bitmap
+    return True
+
+
+def get_current_streak(stats, day=None):
+    """
+    Racha vigente del usuario: la guardada si estuvo activo hoy o ayer, 0 si la ha perdido.
+
+    Args:
+        stats: Instancia de UserStats del usuario
+        day: Fecha de referencia (por defecto, hoy)
+
+    Returns:
+        int: Días consecutivos de actividad
+    """
+    day = day or timezone.localdate()
+    if stats.last_active_date is None or (day - stats.last_active_date).days > 1:
+        return 0
+    return stats.current_streak
+
+
+def get_activity_calendar(stats, days=ACTIVITY_WINDOW_DAYS, day=None):
+    """
+    Días con actividad del usuario dentro de la ventana del calendario.
+
+    Args:
+        stats: Instancia de UserStats del usuario
+        days: Número de días hacia atrás a incluir (máximo ACTIVITY_WINDOW_DAYS)
+        day: Último día de la ventana (por defecto, hoy)
+
+    Returns:
+        list: Fechas con actividad, de la más reciente a la más antigua
+    """
+    day = day or timezone.localdate()
+    if stats.last_active_date is None:
+        return []
+
+    offset = (day - stats.last_active_date).days
+    active_days = []
+    for i in range(max(offset, 0), min(days, ACTIVITY_WINDOW_DAYS + offset)):
+        if stats.activity_bitmap >> (i - offset) & 1:
+            active_days.append(day - timedelta(days=i))
+    return active_days
+
+
+def get_profile_counts(user):
+    """
+    Contadores que se muestran en el perfil del usuario.
+
+    Args:
+        user: Instancia del modelo User
+
+    Returns:
+        dict: posts_count, likes_received y comments_count
+    """
+    stats = get_user_stats(user)
+    return {
+        'posts_count': stats.posts_count,
+        'likes_received': stats.likes_received,
+        'comments_count': stats.comments_count,
+    }
+
+
+def get_achievement_values(user, stats):
+    """
+    Valor actual del usuario para cada tipo de logro evaluable automáticamente.
+
+    Args:
+        user: Instancia del modelo User
+        stats: Instancia de UserStats del usuario
+
+    Returns:
+        dict: achievement_type -> valor actual
+    """
+    return {
+        'post_count': stats.posts_count,
+        'comment_count': stats.comments_count,
+        'like_received': stats.likes_received,
+        'level_up': user.level,
+        'consecutive_days': stats.current_streak,
+    }
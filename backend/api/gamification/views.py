@@ -9,6 +9,9 @@ from django.db.models.functions import Cast
 from api.models import User
 from .models import UserLevel, UserAchievement, UserAchievementUnlock
 from .services import get_points_to_next_level, get_user_achievements, award_points
+from .stats import (
+    ACTIVITY_WINDOW_DAYS, get_activity_calendar, get_current_streak, get_user_stats, record_activity
+)
 
 from api.serializers import UserSerializer
 
@@ -55,12 +58,45 @@ def register_daily_login(request):
     """
     user = request.user
     
+    # El acceso cuenta como actividad del día aunque la acción no otorgue puntos
+    stats = get_user_stats(user)
+    record_activity(stats)
+    
     # Otorgar puntos por acceso diario
     result = award_points(user, 'daily_login')
     
+    result['current_streak'] = stats.current_streak
+    result['longest_streak'] = stats.longest_streak
+    
     return Response(result)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_activity(request):
+    """
+    Obtiene la racha y el calendario de actividad del usuario actual:
+    - Racha vigente (0 si no ha tenido actividad ni hoy ni ayer)
+    - Racha más larga
+    - Días con actividad en los últimos ?days= días (máximo ACTIVITY_WINDOW_DAYS)
+    """
+    try:
+        days = int(request.query_params.get('days', ACTIVITY_WINDOW_DAYS))
+    except ValueError:
+        return Response({'error': 'El parámetro days debe ser un número entero.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    days = min(max(days, 1), ACTIVITY_WINDOW_DAYS)
+    
+    stats = get_user_stats(request.user)
+    
+    return Response({
+        'current_streak': get_current_streak(stats),
+        'longest_streak': stats.longest_streak,
+        'last_active_date': stats.last_active_date,
+        'active_days': get_activity_calendar(stats, days=days),
+    })
+
+
 @api_view(['GET'])
 def leaderboard_levels(request):
     """
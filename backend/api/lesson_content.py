@@ -0,0 +1,185 @@
+"""
+Contenido enriquecido de las lecciones, precodificado y versionado.
+
+Al guardar una lección se codifica su contenido JSON una sola vez: se guarda
+el hash SHA-256 de los bytes (Lesson.content_hash), que sirve de versión y de
+ETag, y una copia comprimida con gzip (Lesson.content_blob). Lesson.save() y
+LessonQuerySet (update, bulk_create, bulk_update) los calculan; las filas que
+no los tengan (SQL directo) se codifican al leerlas (ensure_content_store). El endpoint
+/api/lessons/<id>/content/ sirve esa copia tal cual a los clientes que
+aceptan gzip (o descomprimida, con caché en memoria por hash) y responde 304
+si el cliente ya tiene la versión actual.
+
+Las respuestas que incluyen el contenido (detalle de una lección, detalle y
+lecciones de un curso) tampoco lo vuelven a codificar: el resto de campos se
+serializa como siempre y los bytes ya codificados se insertan tal cual en el
+JSON (render_lesson / render_lessons).
+"""
+import gzip
+import hashlib
+import json
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+
+
+def render_content(content):
+    """Bytes JSON del contenido de una lección."""
+    return json.dumps(
+        content, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def prepare_lesson_content(content):
+    """
+    Codifica el contenido de una lección antes de guardarlo.
+
+    Args:
+        content: Contenido JSON de la lección
+
+    Returns:
+        tuple: (hash SHA-256 de los bytes JSON, bytes JSON comprimidos con gzip)
+    """
+    payload = render_content(content)
+    # mtime=0 para que el mismo contenido produzca siempre los mismos bytes
+    return hashlib.sha256(payload).hexdigest(), gzip.compress(payload, mtime=0)
+
+
+@lru_cache(maxsize=128)
+def _decompress(content_hash, blob):
+    # El hash forma parte de la clave para que cada versión tenga su entrada
+    return gzip.decompress(blob)
+
+
+def ensure_content_store(lesson):
+    """
+    Calcula y guarda el hash y la copia comprimida de una lección que no los
+    tiene. No hace nada (ni consulta la base de datos) si ya los tiene.
+    """
+    has_blob = 'content_blob' in lesson.get_deferred_fields() or lesson.content_blob is not None
+    if lesson.content_hash and has_blob:
+        return
+    lesson.content_hash, lesson.content_blob = prepare_lesson_content(lesson.content)
+    # La lección no cambia: se conserva updated_at (y con él el ETag)
+    type(lesson)._default_manager.filter(pk=lesson.pk).update(
+        content_hash=lesson.content_hash, content_blob=lesson.content_blob, updated_at=F('updated_at')
+    )
+
+
+def get_content_bytes(lesson, gzipped):
+    """
+    Bytes del contenido de una lección listos para enviar.
+
+    Args:
+        lesson: Lección con content_hash y content_blob cargados
+        gzipped: True para devolver la copia comprimida
+
+    Returns:
+        bytes: JSON del contenido (comprimido o no)
+    """
+    ensure_content_store(lesson)
+    blob = bytes(lesson.content_blob)
+    if gzipped:
+        return blob
+    return _decompress(lesson.content_hash, blob)
+
+
+def content_etag(lesson):
+    """ETag fuerte del contenido de una lección."""
+    ensure_content_store(lesson)
+    return f'"{lesson.content_hash}"'
+
+
+def lesson_etag(lesson):
+    """
+    ETag fuerte de la representación completa de una lección: cambia con el
+    contenido y con cualquier otro campo (updated_at se actualiza al guardar y
+    en LessonQuerySet.update).
+    """
+    ensure_content_store(lesson)
+    return f'"{lesson.content_hash}.{int(lesson.updated_at.timestamp() * 1_000_000)}"'
+
+
+def accepts_gzip(request):
+    """
+    Indica si el cliente acepta respuestas comprimidas con gzip según su
+    cabecera Accept-Encoding: gzip (o *, si gzip no aparece) con q > 0.
+    """
+    qvalues = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
+
+
+def splice_json(payload, key, raw):
+    """
+    Añade a un objeto JSON ya codificado una clave cuyo valor también está ya
+    codificado, sin decodificar ni volver a codificar ninguno de los dos.
+
+    Args:
+        payload: Bytes de un objeto JSON ('{...}')
+        key: Nombre de la clave
+        raw: Bytes JSON del valor
+
+    Returns:
+        bytes: Objeto JSON con la nueva clave al final
+    """
+    member = json.dumps(key).encode('utf-8') + b':' + raw
+    if payload == b'{}':
+        return b'{' + member + b'}'
+    return payload[:-1] + b',' + member + b'}'
+
+
+def render_lesson(serializer_class, lesson, context=None):
+    """
+    JSON de una lección con su contenido precodificado.
+
+    Args:
+        serializer_class: Serializador de la lección (con el campo content)
+        lesson: Lección con content_hash y content_blob cargados (content puede estar diferido)
+        context: Contexto del serializador
+
+    Returns:
+        bytes: JSON de la lección
+    """
+    serializer = serializer_class(lesson, context=context)
+    # Serializar el resto de campos sin leer ni codificar el contenido
+    names = list(serializer.fields)
+    position = names.index('content')
+    serializer.fields.pop('content')
+    data = serializer.data
+    # El contenido va en la misma posición que con el serializador
+    before = {name: data[name] for name in names[:position] if name in data}
+    after = {name: data[name] for name in names[position + 1:] if name in data}
+    payload = splice_json(JSONRenderer().render(before), 'content', get_content_bytes(lesson, gzipped=False))
+    if after:
+        payload = payload[:-1] + b',' + JSONRenderer().render(after)[1:]
+    return payload
+
+
+def render_lessons(serializer_class, lessons, context=None):
+    """JSON de una lista de lecciones con su contenido precodificado."""
+    return b'[' + b','.join(render_lesson(serializer_class, lesson, context) for lesson in lessons) + b']'
+
+
+def render_with_lessons(data, serializer_class, lessons, context=None):
+    """JSON de un objeto ya serializado (p. ej. un curso) con sus lecciones precodificadas en 'lessons'."""
+    return splice_json(JSONRenderer().render(data), 'lessons', render_lessons(serializer_class, lessons, context))
@@ -0,0 +1,162 @@
+"""
+Buffer de escritura diferida para los contadores de likes.
+
+Con LIKE_COUNTER_BUFFERING activado, set_like sigue creando y borrando las
+filas de PostLike / CommentLike en su transacción, pero en lugar de hacer un
+UPDATE de Post.likes o Comment.likes por cada like acumula el incremento en
+memoria. Los incrementos se vuelcan en lote (un UPDATE por modelo y valor de
+incremento) cuando hay más de LIKE_COUNTER_FLUSH_THRESHOLD pendientes o han
+pasado LIKE_COUNTER_FLUSH_INTERVAL segundos (lo comprueba un hilo en segundo
+plano aunque no lleguen más likes), y al terminar el proceso (atexit y el
+hook worker_exit de gunicorn.conf.py). Así un post viral no serializa a
+todos los workers sobre la misma fila.
+
+Cada proceso tiene su propio buffer: las lecturas del mismo worker suman los
+incrementos pendientes, de modo que quien da like ve su like al instante. Si
+un worker muere sin volcar su buffer (SIGKILL) se pierden como mucho los
+incrementos de los últimos segundos, y el comando sync_like_counters
+recalcula los contadores a partir de las filas de likes.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled():
+    """Indica si los contadores de likes se actualizan de forma diferida."""
+    return getattr(settings, 'LIKE_COUNTER_BUFFERING', False)
+
+
+class LikeCounterBuffer:
+    """
+    Incrementos de likes pendientes de volcar, por modelo y clave primaria.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._deltas = defaultdict(int)   # (modelo, pk) -> incremento pendiente
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._flusher_pid = None
+
+    def add(self, model, pk, delta):
+        """Acumula un incremento y vuelca el buffer si toca."""
+        with self._lock:
+            self._deltas[(model, pk)] += delta
+            self._pending_total += abs(delta)
+            self._start_flusher()
+        self.maybe_flush()
+
+    def _start_flusher(self):
+        # Un hilo por proceso: tras un fork (workers de gunicorn) el hilo del
+        # proceso padre no existe en el hijo, así que se compara el PID
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        self._flusher_pid = pid
+        threading.Thread(target=self._run_flusher, name='like-counter-flush', daemon=True).start()
+
+    def _run_flusher(self):
+        """Vuelca periódicamente los incrementos pendientes aunque no lleguen más likes."""
+        while True:
+            time.sleep(getattr(settings, 'LIKE_COUNTER_FLUSH_INTERVAL', 5))
+            try:
+                # El hilo tiene su propia conexión: descartarla si ha caducado
+                close_old_connections()
+                self.maybe_flush()
+            except Exception as e:
+                logger.error(f"Error en el volcado periódico de likes: {str(e)}")
+
+    def pending(self, model, pk):
+        """Incremento pendiente de un objeto (0 si no hay ninguno)."""
+        with self._lock:
+            return self._deltas.get((model, pk), 0)
+
+    def maybe_flush(self):
+        """Vuelca el buffer si se ha superado el intervalo o el umbral configurados."""
+        interval = getattr(settings, 'LIKE_COUNTER_FLUSH_INTERVAL', 5)
+        threshold = getattr(settings, 'LIKE_COUNTER_FLUSH_THRESHOLD', 100)
+        with self._lock:
+            due = self._pending_total and (
+                self._pending_total >= threshold or time.monotonic() - self._last_flush >= interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Escribe los incrementos pendientes en la base de datos.
+
+        Returns:
+            int: Número de objetos actualizados
+        """
+        # Solo un hilo vuelca a la vez; los demás siguen acumulando
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+
+        try:
+            with self._lock:
+                deltas = self._deltas
+                self._deltas = defaultdict(int)
+                self._pending_total = 0
+                self._last_flush = time.monotonic()
+
+            # Agrupar por modelo e incremento para actualizar muchas filas con un solo UPDATE
+            batches = defaultdict(list)
+            for (model, pk), delta in deltas.items():
+                if delta:
+                    batches[(model, delta)].append(pk)
+
+            updated = 0
+            remaining = list(batches.items())
+            while remaining:
+                (model, delta), pks = remaining[0]
+                try:
+                    updated += model.objects.filter(pk__in=pks).update(
+                        likes=Greatest(F('likes') + delta, Value(0))
+                    )
+                except Exception as e:
+                    # Devolver al buffer los lotes no escritos para reintentarlos en el siguiente volcado
+                    logger.error(f"Error al volcar los contadores de likes: {str(e)}")
+                    with self._lock:
+                        for (model, delta), pks in remaining:
+                            for pk in pks:
+                                self._deltas[(model, pk)] += delta
+                                self._pending_total += abs(delta)
+                    break
+                remaining.pop(0)
+
+            return updated
+        finally:
+            self._flush_lock.release()
+
+
+# Buffer compartido por todo el proceso
+like_buffer = LikeCounterBuffer()
+atexit.register(like_buffer.flush)
+
+
+def current_likes(obj):
+    """
+    Contador de likes de un Post o Comment incluyendo los incrementos pendientes.
+
+    Args:
+        obj: Instancia de Post o Comment
+
+    Returns:
+        int: Número de likes
+    """
+    if not is_enabled():
+        return obj.likes
+    return max(0, obj.likes + like_buffer.pending(type(obj), obj.pk))
@@ -0,0 +1,107 @@
+"""
+Servicio para dar y quitar likes a posts y comentarios.
+
+La fila del like y el contador desnormalizado (Post.likes / Comment.likes) se
+modifican en la misma transacción, y el contador solo se toca cuando el like
+se ha creado o borrado de verdad, con un UPDATE ... SET likes = likes ± 1.
+Así el contador no pierde actualizaciones con peticiones concurrentes de
+varios workers y sigue coincidiendo con el número de filas de likes.
+
+Con LIKE_COUNTER_BUFFERING activado el contador no se actualiza en la
+transacción sino que se acumula en el buffer de like_buffer y se vuelca en lote.
+
+Las peticiones pueden indicar el estado deseado ('like' / 'unlike'): repetir
+una petición reintentada no cambia nada. Sin estado deseado, se alterna.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F
+
+from .like_buffer import current_likes, is_enabled as buffering_enabled, like_buffer
+from .models import Post, Comment, PostLike, CommentLike
+
+# Modelo de like y nombre del campo que apunta al objeto, por tipo de objeto
+LIKE_MODELS = {
+    Post: (PostLike, 'post'),
+    Comment: (CommentLike, 'comment'),
+}
+
+# Valores aceptados en el campo 'action' de la petición
+LIKE_ACTIONS = {
+    'like': True,
+    'unlike': False,
+}
+
+LikeResult = namedtuple('LikeResult', ['liked', 'changed', 'likes'])
+
+
+def parse_like_action(data):
+    """
+    Obtiene el estado deseado de los datos de la petición.
+
+    Args:
+        data: request.data
+
+    Returns:
+        bool o None: True para dar like, False para quitarlo, None para alternar
+
+    Raises:
+        ValueError: Si el valor de 'action' no es válido
+    """
+    action = data.get('action') if hasattr(data, 'get') else None
+    if action in (None, '', 'toggle'):
+        return None
+    if action not in LIKE_ACTIONS:
+        raise ValueError(f"Acción no válida: {action}. Usa 'like', 'unlike' o 'toggle'.")
+    return LIKE_ACTIONS[action]
+
+
+def set_like(user, target, liked=None):
+    """
+    Da o quita el like de un usuario a un post o comentario.
+
+    Args:
+        user: Usuario que da o quita el like
+        target: Instancia de Post o Comment
+        liked: True para dar like, False para quitarlo, None para alternar
+
+    Returns:
+        LikeResult: Estado final del like, si ha cambiado y el contador actualizado
+    """
+    target_model = type(target)
+    like_model, field = LIKE_MODELS[target_model]
+    lookup = {'user': user, field: target}
+
+    with transaction.atomic():
+        changed = False
+
+        if liked is not True:
+            # Bloquear la fila antes de borrarla: si dos peticiones quitan el
+            # mismo like a la vez, la segunda ya no la encuentra
+            like = like_model.objects.select_for_update().filter(**lookup).first()
+            if like is not None:
+                like.delete()
+                changed = True
+                liked = False
+            elif liked is None:
+                liked = True
+
+        if liked and not changed:
+            # get_or_create resuelve la carrera de dos inserciones con la restricción unique
+            _, changed = like_model.objects.get_or_create(**lookup)
+
+        counter = target_model.objects.filter(pk=target.pk)
+        delta = (1 if liked else -1) if changed else 0
+
+        if delta and buffering_enabled():
+            # Acumular el incremento solo si la transacción se confirma
+            transaction.on_commit(lambda: like_buffer.add(target_model, target.pk, delta))
+        elif delta > 0:
+            counter.update(likes=F('likes') + 1)
+        elif delta < 0:
+            counter.filter(likes__gt=0).update(likes=F('likes') - 1)
+
+        target.likes = counter.values_list('likes', flat=True).get()
+
+    return LikeResult(liked, changed, current_likes(target))
@@ -0,0 +1,89 @@
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from api.middleware import PremiumContentMiddleware
+
+
+# Rutas representativas del tráfico de la API
+SAMPLE_PATHS = [
+    '/api/posts/',
+    '/api/posts/3f0c2a8e-6a55-4b0e-9d5b-1f4a3c2e7d10/comments/',
+    '/api/pinned-posts/',
+    '/api/categories/',
+    '/api/auth/me/',
+    '/api/token/refresh/',
+    '/api/user/lessons/progress/',
+    '/api/gamification/user/progression/',
+    '/api/subscription/status/',
+    '/api/newsletter/subscribe/',
+    '/backend-admin/',
+    '/static/admin/css/custom.css',
+]
+
+
+def legacy_substring_gate(path):
+    """Implementación anterior: búsqueda de subcadena (nunca coincidía por el '^')."""
+    for exception in PremiumContentMiddleware.PUBLIC_EXCEPTIONS:
+        if exception in path:
+            return False
+    for endpoint in PremiumContentMiddleware.PREMIUM_ENDPOINTS:
+        if endpoint in path:
+            return True
+    return False
+
+
+_LEGACY_PUBLIC = [re.compile(p.replace('^', '^/?')) for p in PremiumContentMiddleware.PUBLIC_EXCEPTIONS]
+_LEGACY_PREMIUM = [re.compile(p.replace('^', '^/?')) for p in PremiumContentMiddleware.PREMIUM_ENDPOINTS]
+
+
+def per_pattern_regex_gate(path):
+    """Bucle de expresiones regulares por patrón (lo que pretendía la versión anterior)."""
+    for pattern in _LEGACY_PUBLIC:
+        if pattern.match(path):
+            return False
+    for pattern in _LEGACY_PREMIUM:
+        if pattern.match(path):
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Compara el coste por petición de las distintas formas de decidir si una ruta es premium'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20000,
+            help='Número de pasadas sobre las rutas de ejemplo',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        middleware = PremiumContentMiddleware(get_response=lambda request: None)
+
+        candidates = [
+            ('Subcadena (anterior)', legacy_substring_gate),
+            ('Regex por patrón', per_pattern_regex_gate),
+            ('Matcher precompilado', middleware.is_premium_endpoint),
+        ]
+
+        # Comprobar que el matcher coincide con el bucle de expresiones regulares
+        for path in SAMPLE_PATHS:
+            if middleware.is_premium_endpoint(path) != per_pattern_regex_gate(path):
+                self.stdout.write(self.style.ERROR(f'Decisión distinta para {path}'))
+
+        total_calls = iterations * len(SAMPLE_PATHS)
+        self.stdout.write(f'{total_calls} decisiones por implementación\n')
+
+        for name, gate in candidates:
+            elapsed = timeit.timeit(
+                lambda: [gate(path) for path in SAMPLE_PATHS],
+                number=iterations
+            )
+            per_call_ns = elapsed / total_calls * 1e9
+            self.stdout.write(f'{name:<24} {elapsed * 1000:10.1f} ms  {per_call_ns:8.1f} ns/petición')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completado'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from api.course_progress import counter_subqueries, recalculate_course_progress
+from api.models import UserCourseProgress
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de lecciones de UserCourseProgress y detecta desfases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Solo comprobar los desfases, sin modificar nada (termina con error si hay alguno)',
+        )
+
+    def handle(self, *args, **options):
+        completed, total = counter_subqueries()
+        drifted = UserCourseProgress.objects.annotate(
+            real_completed=completed, real_total=total
+        ).filter(
+            ~Q(completed_lessons_count=F('real_completed')) | ~Q(total_lessons_count=F('real_total'))
+        )
+
+        count = 0
+        for progress in drifted.only('pk', 'user_id', 'course_id', 'completed_lessons_count', 'total_lessons_count'):
+            count += 1
+            self.stdout.write(
+                f'  Usuario {progress.user_id}, curso {progress.course_id}: '
+                f'completadas {progress.completed_lessons_count} -> {progress.real_completed}, '
+                f'total {progress.total_lessons_count} -> {progress.real_total}'
+            )
+
+        if options['check']:
+            if count:
+                raise CommandError(f'{count} progresos de curso con desfase')
+            self.stdout.write(self.style.SUCCESS('Los contadores de progreso de los cursos están sincronizados'))
+            return
+
+        # Recalcular todos: también corrige porcentajes y fechas de completado desfasados
+        updated = recalculate_course_progress(UserCourseProgress.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} progresos de curso con desfase corregidos ({updated} recalculados)'
+        ))
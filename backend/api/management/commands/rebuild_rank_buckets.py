@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.gamification.models import RankBucket
+from api.gamification.ranking import compute_rank_buckets, lock_rank_buckets
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde User.points el ranking materializado (RankBucket) y detecta desfases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Solo comprobar los desfases, sin modificar nada (termina con error si hay alguno)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tamaño de los lotes de escritura',
+        )
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            if not check_only:
+                # Nadie puede mover usuarios en el ranking mientras se recalcula
+                lock_rank_buckets()
+
+            stored = {bucket.points: bucket for bucket in RankBucket.objects.all()}
+            expected = compute_rank_buckets(stored)
+
+            drifted = []
+            for points, (users, users_above) in expected.items():
+                bucket = stored.get(points)
+                current = (bucket.users, bucket.users_above) if bucket else None
+                if current != (users, users_above):
+                    drifted.append((points, current, (users, users_above)))
+
+            for points, current, (users, users_above) in drifted:
+                before = 'sin tramo' if current is None else f'{current[0]} usuarios, {current[1]} por encima'
+                self.stdout.write(
+                    f'  {points} puntos: {before} -> {users} usuarios, {users_above} por encima'
+                )
+
+            summary = f'{len(drifted)} tramos con desfase de {len(expected)}'
+
+            if check_only:
+                if drifted:
+                    raise CommandError(summary)
+                self.stdout.write(self.style.SUCCESS(f'El ranking materializado está sincronizado ({summary})'))
+                return
+
+            RankBucket.objects.bulk_create(
+                [
+                    RankBucket(points=points, users=users, users_above=users_above)
+                    for points, _, (users, users_above) in drifted
+                ],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['points'],
+                update_fields=['users', 'users_above'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Ranking materializado reconstruido: {summary}'))
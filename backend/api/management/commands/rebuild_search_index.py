@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Post
+from api.search import create_search_index, drop_search_index, extract_search_text
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el texto indexable de los posts y recrea el índice de búsqueda'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tamaño de los lotes de actualización',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            # Quitar índice y triggers primero para no actualizar el índice fila a fila
+            drop_search_index(connection)
+
+            posts = []
+            updated = 0
+            for post in Post.objects.only('pk', 'content', 'search_text').iterator():
+                search_text = extract_search_text(post.content)
+                if search_text != post.search_text:
+                    post.search_text = search_text
+                    posts.append(post)
+                if len(posts) >= batch_size:
+                    updated += Post.objects.bulk_update(posts, ['search_text'])
+                    posts = []
+            if posts:
+                updated += Post.objects.bulk_update(posts, ['search_text'])
+
+            create_search_index(connection)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice de búsqueda reconstruido ({connection.vendor}); {updated} posts actualizados'
+        ))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import User
+from api.gamification.models import UserStats
+from api.gamification.stats import COUNTER_FIELDS, compute_all_user_counters
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero los contadores de UserStats y detecta desfases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Solo comprobar los desfases, sin modificar nada (termina con error si hay alguno)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tamaño de los lotes de escritura',
+        )
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        batch_size = options['batch_size']
+
+        self.stdout.write(self.style.NOTICE('Calculando contadores desde las tablas de contenido...'))
+        expected = compute_all_user_counters()
+        stored = {stats.user_id: stats for stats in UserStats.objects.all()}
+
+        missing = []
+        drifted = []
+        for user_id in User.objects.values_list('pk', flat=True).iterator():
+            counters = expected.get(user_id, dict.fromkeys(COUNTER_FIELDS, 0))
+            stats = stored.get(user_id)
+
+            if stats is None:
+                missing.append(UserStats(user_id=user_id, **counters))
+                continue
+
+            differences = {
+                field: (getattr(stats, field), value)
+                for field, value in counters.items()
+                if getattr(stats, field) != value
+            }
+            if differences:
+                drifted.append((stats, differences))
+                for field, value in counters.items():
+                    setattr(stats, field, value)
+
+        for stats, differences in drifted:
+            detail = ', '.join(f'{field}: {old} -> {new}' for field, (old, new) in differences.items())
+            self.stdout.write(f'  Usuario {stats.user_id}: {detail}')
+
+        summary = f'{len(drifted)} usuarios con desfase, {len(missing)} sin fila de estadísticas'
+
+        if check_only:
+            # Las filas que faltan no son un desfase: se calculan al pedirlas por primera vez
+            if drifted:
+                raise CommandError(summary)
+            self.stdout.write(self.style.SUCCESS(f'Los contadores de UserStats están sincronizados ({summary})'))
+            return
+
+        with transaction.atomic():
+            UserStats.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+            UserStats.objects.bulk_update(
+                [stats for stats, _ in drifted], COUNTER_FIELDS, batch_size=batch_size
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'UserStats reconstruido: {summary}'))
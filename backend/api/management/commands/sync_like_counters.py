@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Post, Comment, PostLike, CommentLike
+
+
+class Command(BaseCommand):
+    # Con LIKE_COUNTER_BUFFERING, los workers en marcha pueden tener incrementos
+    # sin volcar (como mucho los de LIKE_COUNTER_FLUSH_INTERVAL segundos, que
+    # vuelcan ellos mismos): ejecutarlo tras reiniciarlos para no contarlos dos veces
+    help = 'Recalcula Post.likes y Comment.likes a partir de las filas de likes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Solo comprobar los desfases, sin modificar nada (termina con error si hay alguno)',
+        )
+
+    def handle(self, *args, **options):
+        total_drift = 0
+        for model, like_model, field in ((Post, PostLike, 'post'), (Comment, CommentLike, 'comment')):
+            like_count = Coalesce(Subquery(
+                like_model.objects.filter(**{field: OuterRef('pk')})
+                .values(field).annotate(total=Count('pk')).values('total'),
+                output_field=IntegerField()
+            ), 0)
+
+            drifted = model.objects.annotate(real_likes=like_count).exclude(likes=F('real_likes'))
+            count = drifted.count()
+            total_drift += count
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {count} con el contador desfasado')
+
+            if count and not options['check']:
+                for obj in drifted.only('pk', 'likes').iterator():
+                    model.objects.filter(pk=obj.pk).update(likes=obj.real_likes)
+
+        if options['check']:
+            if total_drift:
+                raise CommandError(f'{total_drift} contadores de likes desfasados')
+            self.stdout.write(self.style.SUCCESS('Los contadores de likes están sincronizados'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{total_drift} contadores de likes corregidos'))
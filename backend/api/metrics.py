@@ -0,0 +1,258 @@
+"""
+Métricas de consultas SQL y latencia por endpoint.
+
+RequestMetricsMiddleware mide cada petición resuelta a una vista y acumula,
+por nombre de vista ('PostViewSet.list', 'UserMeView'...), histogramas de:
+
+    - número de consultas SQL,
+    - tiempo total en SQL,
+    - latencia total de la petición,
+    - tiempo de serialización (serializadores con TimedSerializerMixin).
+
+Las consultas se cuentan con connection.execute_wrapper, sin necesidad de
+DEBUG. Los histogramas son del proceso actual (cada worker de gunicorn tiene
+los suyos) y se exportan en formato de texto de Prometheus en /api/metrics/.
+
+QUERY_BUDGETS fija el máximo de consultas de algunas vistas. Al superarlo se
+registra un aviso o, con QUERY_BUDGET_STRICT (pensado para los tests), se
+lanza QueryBudgetExceeded y la petición falla.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los intervalos de los histogramas
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Métricas por petición: (nombre, ayuda, intervalos)
+METRICS = (
+    ('api_request_queries', 'Consultas SQL por petición', QUERY_BUCKETS),
+    ('api_request_sql_seconds', 'Tiempo en SQL por petición', SECONDS_BUCKETS),
+    ('api_request_latency_seconds', 'Latencia total por petición', SECONDS_BUCKETS),
+    ('api_request_serializer_seconds', 'Tiempo de serialización por petición', SECONDS_BUCKETS),
+)
+
+_current_request = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Una vista ha ejecutado más consultas de las que permite QUERY_BUDGETS."""
+
+
+def metrics_enabled():
+    return getattr(settings, 'REQUEST_METRICS_ENABLED', True)
+
+
+def get_query_budget(view_name):
+    """Máximo de consultas permitido para una vista, o None si no tiene límite."""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+
+
+class Histogram:
+    """
+    Histograma acumulativo con intervalos fijos.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self):
+        """Pares (límite, observaciones <= límite), terminando en '+Inf'."""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield '+Inf', self.count
+
+
+class MetricsRegistry:
+    """
+    Histogramas por vista del proceso actual.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._budget_exceeded = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view_name, values):
+        """
+        Registra las medidas de una petición.
+
+        Args:
+            view_name: Nombre de la vista
+            values: Valor de cada métrica de METRICS, en el mismo orden
+        """
+        with self._lock:
+            histograms = self._histograms.get(view_name)
+            if histograms is None:
+                histograms = [Histogram(buckets) for _, _, buckets in METRICS]
+                self._histograms[view_name] = histograms
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+
+    def record_budget_exceeded(self, view_name):
+        with self._lock:
+            self._budget_exceeded[view_name] = self._budget_exceeded.get(view_name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._budget_exceeded.clear()
+
+    def render(self):
+        """Métricas en formato de texto de Prometheus."""
+        with self._lock:
+            lines = []
+            for index, (name, help_text, _) in enumerate(METRICS):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view_name in sorted(self._histograms):
+                    histogram = self._histograms[view_name][index]
+                    for bound, count in histogram.cumulative_counts():
+                        lines.append(f'{name}_bucket{{view="{view_name}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{view="{view_name}"}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{view="{view_name}"}} {histogram.count}')
+
+            name = 'api_query_budget_exceeded_total'
+            lines.append(f'# HELP {name} Peticiones que han superado su presupuesto de consultas')
+            lines.append(f'# TYPE {name} counter')
+            for view_name in sorted(self._budget_exceeded):
+                lines.append(f'{name}{{view="{view_name}"}} {self._budget_exceeded[view_name]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestTracker:
+    """
+    Medidas de la petición en curso. Se usa como execute_wrapper de las
+    conexiones para contar las consultas y su duración.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Suma el tiempo del bloque al tiempo de serialización de la petición.
+    Los serializadores anidados no se cuentan dos veces.
+    """
+    tracker = _current_request.get()
+    if tracker is None or tracker.serializing:
+        yield
+        return
+    tracker.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracker.serializer_time += time.perf_counter() - start
+        tracker.serializing = False
+
+
+class TimedSerializerMixin:
+    """
+    Mixin para serializadores cuyo tiempo se incluye en las métricas.
+    """
+
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
+
+
+def get_view_name(view_func, method):
+    """
+    Nombre con el que se agrupan las métricas de una vista: 'Clase.acción'
+    para los viewsets, el nombre de la clase para las APIView y el de la
+    función para el resto.
+    """
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', repr(view_func))
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    if action:
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware que mide las consultas y la latencia de cada petición y
+    comprueba los presupuestos de consultas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics_enabled():
+            return self.get_response(request)
+
+        tracker = RequestTracker()
+        token = _current_request.set(tracker)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(tracker))
+                response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        latency = time.perf_counter() - start
+
+        # Solo las peticiones resueltas a una vista (no los 404 de rutas inexistentes)
+        view_name = getattr(request, '_metrics_view_name', None)
+        if view_name is not None:
+            registry.observe(view_name, (tracker.queries, tracker.sql_time, latency, tracker.serializer_time))
+            self.check_budget(view_name, tracker.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'exclude_from_metrics', False):
+            return None
+        request._metrics_view_name = get_view_name(view_func, request.method)
+        return None
+
+    def check_budget(self, view_name, queries):
+        budget = get_query_budget(view_name)
+        if budget is None or queries <= budget:
+            return
+        registry.record_budget_exceeded(view_name)
+        message = f"{view_name} ha ejecutado {queries} consultas (presupuesto: {budget})"
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -1,13 +1,34 @@
 import logging
 import json
+import re
 from django.urls import resolve
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from .services import StripeService
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .authentication import RequestCachedJWTAuthentication
+from .subscription_cache import check_subscription_status_cached
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+
+def compile_route_matcher(public_patterns, premium_patterns):
+    """
+    Compila las listas de rutas públicas y premium en una única expresión
+    regular anclada al inicio de la ruta. Las excepciones públicas van primero
+    en la alternancia, de modo que una sola búsqueda decide el resultado:
+    el grupo 'public' o el grupo 'premium' indica qué lista ha coincidido.
+    """
+    def alternatives(patterns):
+        # Los patrones se escriben relativos a la raíz ('^api/...'), sin la barra inicial
+        return '|'.join(pattern.lstrip('^') for pattern in patterns)
+
+    return re.compile(
+        rf'^/?(?:(?P<public>{alternatives(public_patterns)})|(?P<premium>{alternatives(premium_patterns)}))'
+    )
+
+
 class PremiumContentMiddleware(MiddlewareMixin):
     """
     Middleware para verificar si el usuario tiene acceso a contenido premium.
@@ -48,21 +69,33 @@ class PremiumContentMiddleware(MiddlewareMixin):
         r'^api/subscription/create-checkout-session',
     ]
     
+    # Matcher precompilado al cargar el módulo a partir de las dos listas anteriores
+    ROUTE_MATCHER = compile_route_matcher(PUBLIC_EXCEPTIONS, PREMIUM_ENDPOINTS)
+    
     def is_premium_endpoint(self, path):
         """Determina si la ruta solicitada requiere acceso premium."""
+        match = self.ROUTE_MATCHER.match(path)
         
-        # Primero verificar si la ruta está en las excepciones públicas
-        for exception in self.PUBLIC_EXCEPTIONS:
-            if exception in path:
-                return False
+        # Por defecto (o si es una excepción pública), permitir acceso
+        return bool(match and match.group('premium'))
+    
+    def get_user(self, request):
+        """
+        Obtiene el usuario de la petición. La API usa JWT, que DRF solo procesa
+        dentro de la vista, así que si la sesión no identifica al usuario se
+        intenta autenticar con el token del header Authorization. El resultado
+        queda guardado en la petición y DRF lo reutiliza en la vista.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
         
-        # Luego verificar si está en las rutas premium
-        for endpoint in self.PREMIUM_ENDPOINTS:
-            if endpoint in path:
-                return True
+        try:
+            result = RequestCachedJWTAuthentication().authenticate(request)
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
         
-        # Por defecto, permitir acceso
-        return False
+        return result[0] if result else None
     
     def process_request(self, request):
         """
@@ -71,20 +104,23 @@ class PremiumContentMiddleware(MiddlewareMixin):
         """
         path = request.path_info
         
+        # Las peticiones preflight de CORS no llevan credenciales
+        if request.method == 'OPTIONS':
+            return None
+        
         # Si no es un endpoint premium, permitir la solicitud
         if not self.is_premium_endpoint(path):
             return None
         
         # Verificar si el usuario está autenticado
-        if not hasattr(request, 'user') or not request.user.is_authenticated:
+        user = self.get_user(request)
+        if user is None:
             return JsonResponse({
                 'error': 'Autenticación requerida para acceder a este recurso',
                 'authenticated': False,
                 'is_premium': False
             }, status=401)
         
-        user = request.user
-        
         # Si el usuario es superusuario o staff, permitir acceso sin más verificaciones
         if user.is_superuser or user.is_staff:
             logger.info(f"Acceso premium garantizado para {user.username} (superuser/staff)")
@@ -92,9 +128,10 @@ class PremiumContentMiddleware(MiddlewareMixin):
         
         # Verificar si el usuario tiene una suscripción activa
         if hasattr(user, 'has_active_subscription') and user.has_active_subscription:
-            # Doble verificación con Stripe Service (opcional, puede ser comentado si causa sobrecarga)
+            # Doble verificación con Stripe, cacheada por usuario y suscripción
+            # (los webhooks de Stripe invalidan la caché cuando algo cambia)
             try:
-                is_still_active = StripeService.check_subscription_status(user)
+                is_still_active = check_subscription_status_cached(user)
                 if not is_still_active:
                     logger.warning(f"Suscripción marcada como activa para {user.username} pero Stripe indica que no está activa")
                     # Actualizar el usuario en la base de datos
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_daily_points(apps, schema_editor):
+    """Agrega el historial de UserActionLog en puntos por usuario y día."""
+    from django.db.models import Sum
+    from django.db.models.functions import TruncDate
+
+    UserActionLog = apps.get_model('api', 'UserActionLog')
+    UserDailyPoints = apps.get_model('api', 'UserDailyPoints')
+
+    rows = UserActionLog.objects.annotate(
+        date=TruncDate('created_at')
+    ).values('user_id', 'date').annotate(total=Sum('points_earned')).order_by()
+
+    UserDailyPoints.objects.bulk_create(
+        [
+            UserDailyPoints(user_id=row['user_id'], date=row['date'], points=row['total'] or 0)
+            for row in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_add_avatar_url_external'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Puntos Diarios',
+                'verbose_name_plural': 'Puntos Diarios',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='api_userdai_date_d20c98_idx')],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_user_stats(apps, schema_editor):
+    """Calcula los contadores de cada usuario y su racha a partir de los puntos diarios."""
+    from datetime import timedelta
+    from django.db.models import Count
+
+    User = apps.get_model('api', 'User')
+    Post = apps.get_model('api', 'Post')
+    Comment = apps.get_model('api', 'Comment')
+    PostLike = apps.get_model('api', 'PostLike')
+    CommentLike = apps.get_model('api', 'CommentLike')
+    UserDailyPoints = apps.get_model('api', 'UserDailyPoints')
+    UserStats = apps.get_model('api', 'UserStats')
+
+    def counts(queryset, user_field):
+        return dict(
+            queryset.values_list(user_field).annotate(total=Count('pk')).order_by()
+        )
+
+    posts = counts(Post.objects.all(), 'author_id')
+    comments = counts(Comment.objects.all(), 'author_id')
+    post_likes = counts(PostLike.objects.all(), 'post__author_id')
+    comment_likes = counts(CommentLike.objects.all(), 'comment__author_id')
+
+    # Racha: días consecutivos con puntos que terminan en el último día activo
+    streaks = {}
+    for user_id, date in UserDailyPoints.objects.order_by('user_id', '-date').values_list('user_id', 'date'):
+        if user_id not in streaks:
+            streaks[user_id] = [date, date, 1]
+            continue
+        streak = streaks[user_id]
+        if streak[1] is not None and date == streak[1] - timedelta(days=1):
+            streak[1] = date
+            streak[2] += 1
+        else:
+            # La racha se ha cortado; los días anteriores ya no cuentan
+            streak[1] = None
+
+    UserStats.objects.bulk_create(
+        [
+            UserStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                comments_count=comments.get(user_id, 0),
+                post_likes_received=post_likes.get(user_id, 0),
+                comment_likes_received=comment_likes.get(user_id, 0),
+                current_streak=streaks[user_id][2] if user_id in streaks else 0,
+                last_active_date=streaks[user_id][0] if user_id in streaks else None,
+            )
+            for user_id in User.objects.values_list('pk', flat=True)
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_user_daily_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('post_likes_received', models.PositiveIntegerField(default=0)),
+                ('comment_likes_received', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('last_active_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de Usuario',
+                'verbose_name_plural': 'Estadísticas de Usuarios',
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
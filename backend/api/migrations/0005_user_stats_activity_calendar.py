@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+# Debe coincidir con api.gamification.stats.ACTIVITY_WINDOW_DAYS
+ACTIVITY_WINDOW_DAYS = 63
+
+
+def backfill_activity_calendar(apps, schema_editor):
+    """Reconstruye el calendario de actividad y las rachas a partir de los puntos diarios."""
+    UserDailyPoints = apps.get_model('api', 'UserDailyPoints')
+    UserStats = apps.get_model('api', 'UserStats')
+
+    dates_by_user = {}
+    for user_id, date in UserDailyPoints.objects.order_by('user_id', 'date').values_list('user_id', 'date'):
+        dates_by_user.setdefault(user_id, []).append(date)
+
+    for user_id, dates in dates_by_user.items():
+        last_date = dates[-1]
+        current_streak = longest_streak = 0
+        previous = None
+        bitmap = 0
+        for date in dates:
+            current_streak = current_streak + 1 if previous and (date - previous).days == 1 else 1
+            longest_streak = max(longest_streak, current_streak)
+            previous = date
+            offset = (last_date - date).days
+            if offset < ACTIVITY_WINDOW_DAYS:
+                bitmap |= 1 << offset
+
+        UserStats.objects.filter(user_id=user_id).update(
+            current_streak=current_streak,
+            longest_streak=longest_streak,
+            last_active_date=last_date,
+            activity_bitmap=bitmap
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='activity_bitmap',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='longest_streak',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_activity_calendar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def extract_poll_votes(apps, schema_editor):
+    """
+    Pasa los votos guardados en el JSON de Post.content (features.user_votes)
+    a PollVote, recalcula los recuentos y elimina user_votes y poll_results
+    del contenido.
+    """
+    import json
+    from collections import Counter
+
+    Post = apps.get_model('api', 'Post')
+    User = apps.get_model('api', 'User')
+    PollVote = apps.get_model('api', 'PollVote')
+    PollOptionTally = apps.get_model('api', 'PollOptionTally')
+
+    user_ids = set(User.objects.values_list('pk', flat=True))
+
+    for post in Post.objects.filter(content__contains='user_votes').iterator():
+        try:
+            content_json = json.loads(post.content)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(content_json, dict) or not isinstance(content_json.get('features'), dict):
+            continue
+
+        features = content_json['features']
+        votes = []
+        for user_id, option_id in (features.get('user_votes') or {}).items():
+            try:
+                user_id, option_id = int(user_id), int(option_id)
+            except (TypeError, ValueError):
+                continue
+            if user_id in user_ids:
+                votes.append(PollVote(post_id=post.pk, user_id=user_id, option_id=option_id))
+
+        PollVote.objects.bulk_create(votes, ignore_conflicts=True)
+
+        tallies = Counter(vote.option_id for vote in votes)
+        PollOptionTally.objects.bulk_create([
+            PollOptionTally(post_id=post.pk, option_id=option_id, votes=count)
+            for option_id, count in tallies.items()
+        ], ignore_conflicts=True)
+
+        features.pop('user_votes', None)
+        features.pop('poll_results', None)
+        Post.objects.filter(pk=post.pk).update(content=json.dumps(content_json))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_user_stats_activity_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('option_id', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poll_votes', to='api.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poll_votes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Voto de Encuesta',
+                'verbose_name_plural': 'Votos de Encuestas',
+                'unique_together': {('post', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PollOptionTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('option_id', models.IntegerField()),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poll_tallies', to='api.post')),
+            ],
+            options={
+                'verbose_name': 'Recuento de Encuesta',
+                'verbose_name_plural': 'Recuentos de Encuestas',
+                'unique_together': {('post', 'option_id')},
+            },
+        ),
+        migrations.RunPython(extract_poll_votes, migrations.RunPython.noop),
+    ]
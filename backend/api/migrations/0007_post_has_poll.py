@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+def backfill_has_poll(apps, schema_editor):
+    """Marca los posts cuyo contenido JSON incluye una encuesta."""
+    import json
+
+    Post = apps.get_model('api', 'Post')
+
+    poll_ids = []
+    for post_id, content in Post.objects.filter(content__contains='"poll"').values_list('pk', 'content').iterator():
+        try:
+            content_json = json.loads(content)
+        except (TypeError, ValueError):
+            continue
+        features = content_json.get('features') if isinstance(content_json, dict) else None
+        if isinstance(features, dict) and features.get('poll'):
+            poll_ids.append(post_id)
+
+    Post.objects.filter(pk__in=poll_ids).update(has_poll=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_poll_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='has_poll',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_has_poll, migrations.RunPython.noop),
+    ]
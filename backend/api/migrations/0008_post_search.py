@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+from api.search import create_search_index, drop_search_index, extract_search_text
+
+
+def backfill_search_text(apps, schema_editor):
+    """Calcula el texto indexable de los posts existentes."""
+    Post = apps.get_model('api', 'Post')
+
+    posts = []
+    for post in Post.objects.only('pk', 'content').iterator():
+        post.search_text = extract_search_text(post.content)
+        posts.append(post)
+    Post.objects.bulk_update(posts, ['search_text'], batch_size=500)
+
+
+def add_search_index(apps, schema_editor):
+    create_search_index(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_post_has_poll'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+def backfill_course_progress_counters(apps, schema_editor):
+    """Calcula los contadores de lecciones de los progresos de curso existentes."""
+    from django.db.models import Count, IntegerField, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+
+    Lesson = apps.get_model('api', 'Lesson')
+    UserLessonProgress = apps.get_model('api', 'UserLessonProgress')
+    UserCourseProgress = apps.get_model('api', 'UserCourseProgress')
+
+    completed = UserLessonProgress.objects.filter(
+        user=OuterRef('user'), lesson__course=OuterRef('course'), completed=True
+    ).order_by().values('user').annotate(total=Count('pk')).values('total')
+    total = Lesson.objects.filter(
+        course=OuterRef('course')
+    ).order_by().values('course').annotate(total=Count('pk')).values('total')
+
+    UserCourseProgress.objects.update(
+        completed_lessons_count=Coalesce(Subquery(completed, output_field=IntegerField()), 0),
+        total_lessons_count=Coalesce(Subquery(total, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_feed_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercourseprogress',
+            name='completed_lessons_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usercourseprogress',
+            name='total_lessons_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_course_progress_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:29
+
+from django.db import migrations, models
+
+
+def backfill_lesson_content(apps, schema_editor):
+    """Calcula el hash y la copia comprimida del contenido de las lecciones existentes."""
+    import gzip
+    import hashlib
+    import json
+
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    Lesson = apps.get_model('api', 'Lesson')
+
+    lessons = []
+    for lesson in Lesson.objects.only('pk', 'content').iterator():
+        payload = json.dumps(
+            lesson.content, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+        lesson.content_hash = hashlib.sha256(payload).hexdigest()
+        lesson.content_blob = gzip.compress(payload, mtime=0)
+        lessons.append(lesson)
+        if len(lessons) >= 200:
+            Lesson.objects.bulk_update(lessons, ['content_hash', 'content_blob'])
+            lessons = []
+    if lessons:
+        Lesson.objects.bulk_update(lessons, ['content_hash', 'content_blob'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_course_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='content_blob',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_lesson_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+def backfill_rank_buckets(apps, schema_editor):
+    """Calcula el ranking materializado a partir de los puntos de los usuarios."""
+    from django.db.models import Count
+
+    User = apps.get_model('api', 'User')
+    RankBucket = apps.get_model('api', 'RankBucket')
+
+    buckets = []
+    users_above = 0
+    for points, users in User.objects.values_list('points').annotate(total=Count('pk')).order_by('-points'):
+        buckets.append(RankBucket(points=points, users=users, users_above=users_above))
+        users_above += users
+    RankBucket.objects.bulk_create(buckets, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_user_points_rank_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankBucket',
+            fields=[
+                ('points', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('users_above', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Tramo del Ranking',
+                'verbose_name_plural': 'Tramos del Ranking',
+                'ordering': ['-points'],
+            },
+        ),
+        migrations.RunPython(backfill_rank_buckets, migrations.RunPython.noop),
+    ]
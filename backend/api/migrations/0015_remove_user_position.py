@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_rank_bucket'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='position',
+        ),
+    ]
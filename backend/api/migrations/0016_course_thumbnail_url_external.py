@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def add_thumbnail_url_external(apps, schema_editor):
+    """
+    Añade la columna solo si no existe: las bases de datos de producción la
+    tienen aunque no figuraba en el historial de migraciones.
+    """
+    Course = apps.get_model('api', 'Course')
+    table = Course._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+    if 'thumbnail_url_external' not in columns:
+        schema_editor.add_field(Course, Course._meta.get_field('thumbnail_url_external'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_remove_user_position'),
+    ]
+
+    operations = [
+        # El estado de las migraciones no conocía el campo; la columna se crea aparte
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='course',
+                    name='thumbnail_url_external',
+                    field=models.URLField(blank=True, max_length=500, null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(add_thumbnail_url_external, migrations.RunPython.noop),
+    ]
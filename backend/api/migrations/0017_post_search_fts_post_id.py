@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from api.search import create_search_index, drop_search_index
+
+
+def recreate_sqlite_search_index(apps, schema_editor):
+    """
+    Recrea la tabla FTS5 de SQLite enlazada por post_id en lugar del rowid
+    implícito de api_post. En PostgreSQL no cambia nada.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    drop_search_index(schema_editor.connection)
+    create_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_course_thumbnail_url_external'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_sqlite_search_index, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.db.models.functions import Coalesce
 import uuid
 from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
@@ -39,7 +40,6 @@ class User(AbstractUser):
     level = models.PositiveIntegerField(default=1)
     points = models.PositiveIntegerField(default=0)
     website = models.URLField(blank=True, null=True)
-    position = models.PositiveIntegerField(default=0, blank=True, null=True)  # Posición en el ranking
     is_premium = models.BooleanField(default=False)  # Si el usuario es premium
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -56,6 +56,10 @@ class User(AbstractUser):
     
     class Meta:
         ordering = ['-points']
+        indexes = [
+            # Top-N del ranking (la posición se lee de RankBucket)
+            models.Index(fields=['-points', 'id'], name='api_user_points_rank_idx'),
+        ]
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
     
@@ -81,6 +85,51 @@ class Category(models.Model):
         return self.name
 
 
+class PostQuerySet(models.QuerySet):
+    """
+    QuerySet de posts con utilidades para el feed de la comunidad.
+    """
+
+    def for_feed(self, user=None):
+        """
+        Prepara el queryset para serializar el feed sin consultas por post:
+        carga autor y categoría en la misma consulta, anota el número de
+        comentarios, si el usuario que consulta ha dado like a cada post y su
+        voto en las encuestas, y precarga los recuentos de las encuestas.
+        """
+        # Subconsulta correlacionada en lugar de Count() para no introducir un
+        # GROUP BY (que haría ignorar Meta.ordering y encarecería el COUNT)
+        comments_count = Comment.objects.filter(post=models.OuterRef('pk')).order_by().values(
+            'post'
+        ).annotate(total=models.Count('pk')).values('total')
+
+        queryset = self.select_related('author', 'category').prefetch_related('poll_tallies').annotate(
+            annotated_comments_count=Coalesce(
+                models.Subquery(comments_count, output_field=models.IntegerField()), 0
+            )
+        )
+
+        return queryset.with_viewer(user)
+
+    def with_viewer(self, user=None):
+        """
+        Anota si el usuario que consulta ha dado like a cada post
+        (annotated_is_liked) y su voto en las encuestas (annotated_poll_vote).
+        """
+        if user is not None and user.is_authenticated:
+            liked = PostLike.objects.filter(post=models.OuterRef('pk'), user=user)
+            poll_vote = PollVote.objects.filter(post=models.OuterRef('pk'), user=user).values('option_id')[:1]
+            return self.annotate(
+                annotated_is_liked=models.Exists(liked),
+                annotated_poll_vote=models.Subquery(poll_vote, output_field=models.IntegerField())
+            )
+
+        return self.annotate(
+            annotated_is_liked=models.Value(False, output_field=models.BooleanField()),
+            annotated_poll_vote=models.Value(None, output_field=models.IntegerField())
+        )
+
+
 class Post(models.Model):
     """
     Posts creados por los usuarios en la comunidad.
@@ -95,16 +144,39 @@ class Post(models.Model):
     image_3 = models.ImageField(upload_to='post_images/', blank=True, null=True)
     likes = models.PositiveIntegerField(default=0)
     is_pinned = models.BooleanField(default=False)
+    has_poll = models.BooleanField(default=False, editable=False)  # Calculado al guardar a partir de content
+    search_text = models.TextField(blank=True, default='', editable=False)  # Texto plano indexado para la búsqueda
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PostQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-is_pinned', '-created_at']
+        indexes = [
+            # Paginación por cursor del feed (api.pagination.FeedPagination)
+            models.Index(fields=['-is_pinned', '-created_at', '-id'], name='api_post_feed_idx'),
+        ]
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
     
     def __str__(self):
         return f"{self.author.username}: {self.content[:50]}"
+    
+    def save(self, *args, **kwargs):
+        from .polls import prepare_poll_content
+        from .search import extract_search_text
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            # Detectar la encuesta y descartar votos en bruto que pueda reenviar el cliente
+            self.content, self.has_poll = prepare_poll_content(self.content)
+            # Texto plano para el índice de búsqueda (sin encuesta ni demás features)
+            self.search_text = extract_search_text(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'has_poll', 'search_text'}
+        
+        super().save(*args, **kwargs)
 
 
 class Comment(models.Model):
@@ -123,6 +195,10 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Paginación por cursor de los comentarios de un post
+            models.Index(fields=['post', 'created_at', 'id'], name='api_comment_post_page_idx'),
+        ]
         verbose_name = 'Comentario'
         verbose_name_plural = 'Comentarios'
     
@@ -147,9 +223,44 @@ class PostLike(models.Model):
         return f"{self.user.username} liked {self.post.id}"
 
 
-# El modelo PollVote se ha eliminado temporalmente para evitar la necesidad de migraciones
-# En su lugar, los votos se almacenan directamente en el campo content del modelo Post
-# como parte de su estructura JSON
+class PollVote(models.Model):
+    """
+    Voto de un usuario en la encuesta de un post.
+    Las opciones de la encuesta siguen definidas en el JSON de Post.content
+    (features.poll); aquí solo se guarda la opción elegida por cada usuario.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='poll_votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='poll_votes')
+    option_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('post', 'user')
+        verbose_name = 'Voto de Encuesta'
+        verbose_name_plural = 'Votos de Encuestas'
+    
+    def __str__(self):
+        return f"{self.user.username} votó la opción {self.option_id} en {self.post_id}"
+
+
+class PollOptionTally(models.Model):
+    """
+    Recuento de votos de cada opción de una encuesta.
+    Se mantiene con incrementos atómicos al votar, de modo que mostrar los
+    resultados no requiere contar los votos.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='poll_tallies')
+    option_id = models.IntegerField()
+    votes = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('post', 'option_id')
+        verbose_name = 'Recuento de Encuesta'
+        verbose_name_plural = 'Recuentos de Encuestas'
+    
+    def __str__(self):
+        return f"{self.post_id} - opción {self.option_id}: {self.votes} votos"
 
 
 class CommentLike(models.Model):
@@ -169,6 +280,24 @@ class CommentLike(models.Model):
         return f"{self.user.username} liked comment {self.comment.id}"
 
 
+class CourseQuerySet(models.QuerySet):
+    """
+    QuerySet de cursos.
+    """
+
+    def with_lessons_count(self):
+        """Anota el número de lecciones de cada curso (annotated_lessons_count)."""
+        # Subconsulta correlacionada en lugar de Count() para no introducir un GROUP BY
+        lessons_count = Lesson.objects.filter(course=models.OuterRef('pk')).order_by().values(
+            'course'
+        ).annotate(total=models.Count('pk')).values('total')
+        return self.annotate(
+            annotated_lessons_count=Coalesce(
+                models.Subquery(lessons_count, output_field=models.IntegerField()), 0
+            )
+        )
+
+
 class Course(models.Model):
     """
     Cursos de la plataforma.
@@ -182,6 +311,8 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CourseQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Curso'
@@ -191,6 +322,45 @@ class Course(models.Model):
         return self.title
 
 
+class LessonQuerySet(models.QuerySet):
+    """
+    QuerySet de lecciones que mantiene content_hash, content_blob y updated_at
+    también en las escrituras que no pasan por Lesson.save().
+    """
+
+    def update(self, **kwargs):
+        # updated_at forma parte del ETag de la lección (ver lesson_etag)
+        kwargs.setdefault('updated_at', timezone.now())
+        # bulk_update ya incluye content_hash y content_blob (ver abajo)
+        if 'content' in kwargs and 'content_hash' not in kwargs:
+            from .lesson_content import prepare_lesson_content
+            
+            if hasattr(kwargs['content'], 'resolve_expression'):
+                # Valor calculado por la base de datos: se codificará al leer la lección
+                kwargs.update(content_hash='', content_blob=None)
+            else:
+                kwargs['content_hash'], kwargs['content_blob'] = prepare_lesson_content(kwargs['content'])
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .lesson_content import prepare_lesson_content
+        
+        objs = list(objs)
+        for lesson in objs:
+            lesson.content_hash, lesson.content_blob = prepare_lesson_content(lesson.content)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'content' in fields:
+            from .lesson_content import prepare_lesson_content
+            
+            objs = list(objs)
+            for lesson in objs:
+                lesson.content_hash, lesson.content_blob = prepare_lesson_content(lesson.content)
+            fields = list(dict.fromkeys([*fields, 'content_hash', 'content_blob']))
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class Lesson(models.Model):
     """
     Lecciones de los cursos.
@@ -199,10 +369,15 @@ class Lesson(models.Model):
     course = models.ForeignKey(Course, related_name='lessons', on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     content = models.JSONField(default=dict, encoder=DjangoJSONEncoder)  # Para contenido enriquecido
+    # Versión (hash SHA-256) y copia comprimida del contenido, calculadas al guardar (ver api.lesson_content)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    content_blob = models.BinaryField(null=True, editable=False)
     order = models.PositiveIntegerField(default=0)  # Para ordenar lecciones dentro de un curso
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = LessonQuerySet.as_manager()
+    
     class Meta:
         ordering = ['order']
         verbose_name = 'Lección'
@@ -210,6 +385,18 @@ class Lesson(models.Model):
     
     def __str__(self):
         return self.title
+    
+    def save(self, *args, **kwargs):
+        from .lesson_content import prepare_lesson_content
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            # Codificar el contenido una sola vez por versión
+            self.content_hash, self.content_blob = prepare_lesson_content(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_hash', 'content_blob'}
+        
+        super().save(*args, **kwargs)
 
 # Nuevos modelos para el progreso del usuario
 
@@ -252,6 +439,9 @@ class UserCourseProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_progress')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='user_progress')
     progress_percentage = models.FloatField(default=0.0)
+    # Contadores mantenidos por api.course_progress (ver rebuild_course_progress)
+    completed_lessons_count = models.PositiveIntegerField(default=0)
+    total_lessons_count = models.PositiveIntegerField(default=0)
     last_accessed_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
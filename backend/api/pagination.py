@@ -0,0 +1,191 @@
+"""
+Paginadores de la API.
+
+KeysetPagination pagina por cursor (keyset): el cursor codifica los valores
+de las columnas de ordenación del último elemento devuelto y la página
+siguiente se obtiene con un WHERE sobre esas columnas en lugar de un OFFSET.
+El coste de cualquier página es el mismo sin importar lo profunda que sea y
+no se ejecuta ningún COUNT(*).
+
+Si todas las columnas se ordenan en el mismo sentido, la condición es una
+comparación de filas, (f1, f2, f3) < (v1, v2, v3), que la base de datos
+resuelve como un único rango del índice sobre esas columnas. Con sentidos
+mezclados se expande en ORs, que no puede usar el índice como un rango.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Paginación estándar para las vistas de API.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RowValue(Func):
+    """Valor de fila SQL: (a, b, c)."""
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor sobre una ordenación única y estable.
+
+    La ordenación debe terminar en una columna única (p. ej. 'id') para que
+    el cursor identifique una posición exacta, y conviene que todas sus
+    columnas vayan en el mismo sentido (ver filter_after_cursor). La respuesta
+    tiene la forma {'next': url o None, 'results': [...]}.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor no válido'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        # str() conserva los microsegundos de las fechas (DjangoJSONEncoder los trunca)
+        payload = json.dumps(values, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, queryset, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(payload)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            opts = queryset.model._meta
+            return [
+                opts.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError) as e:
+            raise NotFound(self.invalid_cursor_message) from e
+
+    def filter_after_cursor(self, queryset, values):
+        """
+        Filtra los elementos posteriores al cursor según la ordenación: con
+        una comparación de filas si todas las columnas van en el mismo sentido
+        y si no con (f1 tras v1) OR (f1 = v1 AND ((f2 tras v2) OR (f2 = v2 AND ...))).
+        """
+        descending = {field.startswith('-') for field in self.ordering}
+        if len(descending) == 1:
+            opts = queryset.model._meta
+            lookup = 'lt' if descending.pop() else 'gt'
+            position = RowValue(*(
+                Value(value, output_field=opts.get_field(field.lstrip('-')))
+                for field, value in zip(self.ordering, values)
+            ))
+            return queryset.alias(
+                keyset_position=RowValue(*(F(field.lstrip('-')) for field in self.ordering))
+            ).filter(**{f'keyset_position__{lookup}': position})
+
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, values))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            condition = after if condition is None else after | (Q(**{name: value}) & condition)
+        return queryset.filter(condition)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = self.filter_after_cursor(queryset, self.decode_cursor(queryset, cursor))
+
+        # Pedir un elemento más para saber si hay página siguiente sin contar
+        results = list(queryset[:page_size + 1])
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_cursor = self.encode_cursor(results[-1])
+        else:
+            self.next_cursor = None
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Paginación del feed de posts.
+
+    Usa cursor sobre (-is_pinned, -created_at, -id), el mismo orden que
+    Post.Meta.ordering más el id como desempate, que recorre el índice
+    api_post_feed_idx. ?page=1 se acepta como primera página para los
+    clientes que todavía lo envían; el resto de páginas se piden con el
+    enlace 'next'. Solo las búsquedas (?search=, ordenadas por relevancia,
+    que puntúan todas las coincidencias) usan la paginación por número de
+    página.
+    """
+    ordering = ('-is_pinned', '-created_at', '-id')
+    legacy_query_params = ('search',)
+    page_query_param = 'page'
+    invalid_page_message = 'Página no válida: usa el enlace next para las páginas siguientes'
+
+    def __init__(self, ordering=None):
+        super().__init__(ordering)
+        self.legacy = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if any(param in request.query_params for param in self.legacy_query_params):
+            self.legacy = StandardResultsSetPagination()
+            return self.legacy.paginate_queryset(queryset, request, view)
+        if request.query_params.get(self.page_query_param, '1') != '1':
+            raise NotFound(self.invalid_page_message)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,244 @@
+"""
+Votaciones en las encuestas de los posts.
+
+Cada voto es una fila de PollVote (una por usuario y post) y los resultados se
+guardan en PollOptionTally, que se actualiza con incrementos atómicos en la
+misma transacción que el voto. Votar cuesta siempre las mismas consultas sin
+importar cuánta gente haya votado, y dos votos simultáneos nunca se pisan.
+
+Al serializar, project_poll_content sustituye los votos en bruto por los
+resultados agregados y el voto del usuario que consulta. Solo se procesan los
+posts con Post.has_poll, que se calcula al guardar, y el JSON de cada
+contenido se analiza una única vez por proceso.
+"""
+import json
+from collections import namedtuple
+from functools import lru_cache
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import PollVote, PollOptionTally
+
+VoteResult = namedtuple('VoteResult', ['previous_option', 'changed', 'poll_results'])
+
+# Claves con votos en bruto que ya no se guardan en el JSON de Post.content
+RAW_VOTE_KEYS = ('user_votes', 'poll_results')
+
+
+@lru_cache(maxsize=1024)
+def _parse_content(content):
+    # Resultado compartido entre llamadas: no modificarlo
+    return json.loads(content)
+
+
+def _get_features(content):
+    if not isinstance(content, str) or not content.lstrip().startswith('{'):
+        return None
+    try:
+        content_json = _parse_content(content)
+    except ValueError:
+        return None
+    if not isinstance(content_json, dict) or not isinstance(content_json.get('features'), dict):
+        return None
+    return content_json['features']
+
+
+def prepare_poll_content(content):
+    """
+    Prepara el contenido de un post antes de guardarlo.
+
+    Args:
+        content: Texto del post (JSON con features o texto plano)
+
+    Returns:
+        tuple: (contenido sin votos en bruto, True si el post tiene encuesta)
+    """
+    features = _get_features(content)
+    if features is None:
+        return content, False
+
+    has_poll = bool(features.get('poll'))
+    if any(key in features for key in RAW_VOTE_KEYS):
+        content_json = _parse_content(content)
+        clean_features = {key: value for key, value in features.items() if key not in RAW_VOTE_KEYS}
+        content = json.dumps({**content_json, 'features': clean_features})
+    return content, has_poll
+
+
+def get_poll_options(post):
+    """
+    Obtiene los IDs de las opciones de la encuesta de un post.
+
+    Args:
+        post: Instancia de Post
+
+    Returns:
+        list: IDs de las opciones, o None si el post no tiene encuesta
+    """
+    features = _get_features(post.content)
+    poll = features.get('poll') if features else None
+    if not poll or not isinstance(poll, list):
+        return None
+    return [option.get('id') for option in poll if isinstance(option, dict)]
+
+
+def get_poll_results(post, option_ids=None):
+    """
+    Resultados de la encuesta de un post a partir de los recuentos.
+
+    Args:
+        post: Instancia de Post
+        option_ids: IDs de las opciones para incluir también las que no tienen votos
+
+    Returns:
+        dict: ID de opción (como texto) -> número de votos
+    """
+    results = {str(option_id): 0 for option_id in option_ids or []}
+    for option_id, votes in PollOptionTally.objects.filter(post=post).values_list('option_id', 'votes'):
+        results[str(option_id)] = votes
+    return results
+
+
+def _add_to_tally(post, option_id, delta):
+    tally = PollOptionTally.objects.filter(post=post, option_id=option_id)
+    if delta < 0:
+        tally.filter(votes__gt=0).update(votes=F('votes') + delta)
+        return
+
+    if tally.update(votes=F('votes') + delta):
+        return
+    try:
+        with transaction.atomic():
+            PollOptionTally.objects.create(post=post, option_id=option_id, votes=delta)
+    except IntegrityError:
+        # Otro voto ha creado el recuento de la opción entre medias
+        tally.update(votes=F('votes') + delta)
+
+
+def cast_vote(user, post, option_id, option_ids=None):
+    """
+    Registra o cambia el voto de un usuario en una encuesta.
+
+    Args:
+        user: Usuario que vota
+        post: Instancia de Post con encuesta
+        option_id: ID de la opción elegida (ya validado)
+        option_ids: IDs de todas las opciones, para incluirlas en los resultados
+
+    Returns:
+        VoteResult: Opción anterior (None si es su primer voto), si el voto ha
+                    cambiado y los resultados actualizados
+    """
+    with transaction.atomic():
+        # Bloquear el voto previo para que dos cambios simultáneos del mismo usuario se serialicen
+        vote = PollVote.objects.select_for_update().filter(post=post, user=user).first()
+
+        created = False
+        if vote is None:
+            try:
+                with transaction.atomic():
+                    vote = PollVote.objects.create(post=post, user=user, option_id=option_id)
+                created = True
+            except IntegrityError:
+                # El mismo usuario ha votado a la vez desde otra petición
+                vote = PollVote.objects.select_for_update().get(post=post, user=user)
+
+        if created:
+            previous_option = None
+            changed = True
+        elif vote.option_id != option_id:
+            previous_option = vote.option_id
+            changed = True
+            vote.option_id = option_id
+            vote.save(update_fields=['option_id', 'updated_at'])
+            _add_to_tally(post, previous_option, -1)
+        else:
+            # Voto repetido: no cambia nada
+            previous_option = option_id
+            changed = False
+
+        if changed:
+            _add_to_tally(post, option_id, 1)
+
+    return VoteResult(previous_option, changed, get_poll_results(post, option_ids))
+
+
+def get_viewer_vote(post, user):
+    """
+    Opción votada por un usuario en la encuesta de un post.
+
+    Usa el valor anotado por Post.objects.for_feed() si está disponible.
+
+    Args:
+        post: Instancia de Post
+        user: Usuario que consulta (puede ser anónimo o None)
+
+    Returns:
+        int o None: ID de la opción votada
+    """
+    if hasattr(post, 'annotated_poll_vote'):
+        return post.annotated_poll_vote
+    if user is None or not user.is_authenticated:
+        return None
+    return PollVote.objects.filter(post=post, user=user).values_list('option_id', flat=True).first()
+
+
+def project_poll_content(post, user=None):
+    """
+    Contenido del post tal y como se envía al cliente.
+
+    En los posts con encuesta añade a features los resultados agregados
+    (poll_results) y la opción votada por el usuario que consulta
+    (user_vote). El resto de posts se devuelven sin analizar su contenido.
+
+    Args:
+        post: Instancia de Post
+        user: Usuario que consulta (puede ser anónimo o None)
+
+    Returns:
+        str: Contenido a serializar
+    """
+    if not post.has_poll:
+        return post.content
+
+    features = _get_features(post.content)
+    if features is None:
+        return post.content
+
+    # Recuentos precargados por for_feed() o, si no, una consulta para este post
+    if 'poll_tallies' in getattr(post, '_prefetched_objects_cache', {}):
+        tallies = [(tally.option_id, tally.votes) for tally in post.poll_tallies.all()]
+    else:
+        tallies = PollOptionTally.objects.filter(post=post).values_list('option_id', 'votes')
+
+    poll_results = {
+        str(option.get('id')): 0 for option in features.get('poll') or [] if isinstance(option, dict)
+    }
+    for option_id, votes in tallies:
+        poll_results[str(option_id)] = votes
+
+    clean_features = {key: value for key, value in features.items() if key not in RAW_VOTE_KEYS}
+    clean_features['poll_results'] = poll_results
+    clean_features['user_vote'] = get_viewer_vote(post, user)
+
+    return json.dumps({**_parse_content(post.content), 'features': clean_features})
+
+
+def set_user_vote(content, option_id):
+    """
+    Cambia el voto del usuario (user_vote) en un contenido ya proyectado con
+    project_poll_content, p. ej. el de una respuesta compartida por todos los
+    usuarios.
+
+    Args:
+        content: Contenido proyectado del post
+        option_id: ID de la opción votada (o None)
+
+    Returns:
+        str: Contenido con user_vote actualizado
+    """
+    features = _get_features(content)
+    if features is None:
+        return content
+    return json.dumps({**_parse_content(content), 'features': {**features, 'user_vote': option_id}})
@@ -4,10 +4,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Count
+from django.db import transaction
 
+from .course_progress import (
+    apply_completion_delta, completion_delta, delete_lesson_progress, set_lesson_completed, sync_lesson_progress
+)
 from .models import Course, Lesson, UserLessonProgress, UserCourseProgress
-from .serializers import UserLessonProgressSerializer, UserCourseProgressSerializer
+from .serializers import UserLessonProgressSerializer, UserCourseProgressSerializer, LessonProgressSyncItemSerializer
 
 class UserLessonProgressViewSet(viewsets.ModelViewSet):
     """
@@ -34,58 +37,83 @@ class UserLessonProgressViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Guardar el progreso de la lección y actualizar el progreso del curso"""
-        # Guardar el progreso de la lección
-        instance = serializer.save(
-            user=self.request.user,
-            completion_date=timezone.now() if serializer.validated_data.get('completed') else None
-        )
-        
-        # Actualizar el progreso del curso
-        self._update_course_progress(instance.lesson.course)
+        with transaction.atomic():
+            # Guardar el progreso de la lección
+            instance = serializer.save(
+                user=self.request.user,
+                completion_date=timezone.now() if serializer.validated_data.get('completed') else None
+            )
+            
+            # Actualizar el progreso del curso (+1 si se crea ya completada)
+            apply_completion_delta(
+                self.request.user, instance.lesson.course_id, completion_delta(False, instance.completed)
+            )
     
     def perform_update(self, serializer):
-        """Actualizar el progreso de la lección y recalcular el progreso del curso"""
-        # Si la lección se marca como completada y no tenía fecha de completado, la añadimos
-        if serializer.validated_data.get('completed') and not serializer.instance.completion_date:
-            serializer.save(completion_date=timezone.now())
-        else:
-            serializer.save()
-        
-        # Actualizar el progreso del curso
-        self._update_course_progress(serializer.instance.lesson.course)
+        """Actualizar el progreso de la lección y el contador de lecciones completadas del curso"""
+        with transaction.atomic():
+            # Estado anterior con la fila bloqueada para que dos cambios simultáneos no se pisen
+            was_completed = UserLessonProgress.objects.select_for_update().filter(
+                pk=serializer.instance.pk
+            ).values_list('completed', flat=True).first()
+            
+            # Si la lección se marca como completada y no tenía fecha de completado, la añadimos
+            if serializer.validated_data.get('completed') and not serializer.instance.completion_date:
+                instance = serializer.save(completion_date=timezone.now())
+            else:
+                instance = serializer.save()
+            
+            # Actualizar el progreso del curso con el cambio (+1, -1 o 0)
+            apply_completion_delta(
+                self.request.user, instance.lesson.course_id, completion_delta(was_completed, instance.completed)
+            )
     
-    def _update_course_progress(self, course):
-        """Calcular y actualizar el progreso del curso para el usuario actual"""
-        user = self.request.user
-        
-        # Contar lecciones totales y completadas
-        total_lessons = Lesson.objects.filter(course=course).count()
-        completed_lessons = UserLessonProgress.objects.filter(
-            user=user,
-            lesson__course=course,
-            completed=True
-        ).count()
-        
-        # Calcular porcentaje
-        if total_lessons > 0:
-            progress_percentage = (completed_lessons / total_lessons) * 100
-        else:
-            progress_percentage = 0
+    def perform_destroy(self, instance):
+        """Eliminar el progreso de la lección descontándolo del progreso del curso"""
+        delete_lesson_progress(instance)
+    
+    # Máximo de actualizaciones por petición de sincronización
+    MAX_SYNC_UPDATES = 200
+    
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Aplicar muchas actualizaciones de progreso de lecciones en una sola petición.
+        Recibe: updates, lista de {lesson, completed (opcional), time_spent_seconds (segundos a sumar)}
+        """
+        updates = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        if not isinstance(updates, list) or not updates:
+            return Response(
+                {'error': 'Se requiere una lista de actualizaciones en updates'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(updates) > self.MAX_SYNC_UPDATES:
+            return Response(
+                {'error': f'Se admiten como máximo {self.MAX_SYNC_UPDATES} actualizaciones por petición'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Actualizar o crear el registro de progreso del curso
-        user_course_progress, created = UserCourseProgress.objects.update_or_create(
-            user=user,
-            course=course,
-            defaults={
-                'progress_percentage': progress_percentage,
-                'last_accessed_at': timezone.now()
-            }
-        )
+        items = LessonProgressSyncItemSerializer(data=updates, many=True)
+        items.is_valid(raise_exception=True)
         
-        # Actualizar también el campo progress_percentage del curso
-        # (Puede ser útil para administradores que vean el curso)
-        # course.progress_percentage = int(progress_percentage)
-        # course.save(update_fields=['progress_percentage'])
+        try:
+            lesson_progress, course_progress = sync_lesson_progress(request.user, items.validated_data)
+        except Lesson.DoesNotExist as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'lessons': UserLessonProgressSerializer(lesson_progress, many=True).data,
+            'courses': [
+                {
+                    'course': str(progress.course_id),
+                    'progress_percentage': progress.progress_percentage,
+                    'completed_lessons_count': progress.completed_lessons_count,
+                    'total_lessons_count': progress.total_lessons_count,
+                    'completed_at': progress.completed_at,
+                }
+                for progress in course_progress
+            ]
+        })
 
 
 class UserCourseProgressViewSet(viewsets.ReadOnlyModelViewSet):
@@ -97,7 +125,7 @@ class UserCourseProgressViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Devolver progreso solo del usuario actual"""
-        return UserCourseProgress.objects.filter(user=self.request.user)
+        return UserCourseProgress.objects.filter(user=self.request.user).select_related('course')
     
     def retrieve(self, request, *args, **kwargs):
         """Recuperar progreso de un curso o crearlo si no existe"""
@@ -109,15 +137,9 @@ class UserCourseProgressViewSet(viewsets.ReadOnlyModelViewSet):
             # Buscar el curso
             course = get_object_or_404(Course, pk=course_id)
             
-            # Obtener o crear el progreso del curso
-            course_progress, created = UserCourseProgress.objects.get_or_create(
-                user=request.user,
-                course=course,
-                defaults={
-                    'progress_percentage': 0,
-                    'last_accessed_at': timezone.now()
-                }
-            )
+            # Obtener o crear el progreso del curso (con sus contadores de lecciones)
+            with transaction.atomic():
+                course_progress = apply_completion_delta(request.user, course.pk, 0)
             
             serializer = self.get_serializer(course_progress)
             return Response(serializer.data)
@@ -140,39 +162,8 @@ class UserCourseProgressViewSet(viewsets.ReadOnlyModelViewSet):
         # Verificar que la lección pertenece al curso
         lesson = get_object_or_404(Lesson, pk=lesson_id, course=course)
         
-        # Actualizar o crear el progreso de la lección
-        lesson_progress, created = UserLessonProgress.objects.update_or_create(
-            user=request.user,
-            lesson=lesson,
-            defaults={
-                'completed': True,
-                'completion_date': timezone.now()
-            }
-        )
-        
-        # Actualizar el progreso del curso
-        total_lessons = Lesson.objects.filter(course=course).count()
-        completed_lessons = UserLessonProgress.objects.filter(
-            user=request.user,
-            lesson__course=course,
-            completed=True
-        ).count()
-        
-        # Calcular porcentaje
-        if total_lessons > 0:
-            progress_percentage = (completed_lessons / total_lessons) * 100
-        else:
-            progress_percentage = 0
-        
-        # Actualizar o crear el registro de progreso del curso
-        course_progress, created = UserCourseProgress.objects.update_or_create(
-            user=request.user,
-            course=course,
-            defaults={
-                'progress_percentage': progress_percentage,
-                'last_accessed_at': timezone.now()
-            }
-        )
+        # Marcar la lección y sumar una lección completada al progreso del curso
+        lesson_progress, course_progress = set_lesson_completed(request.user, lesson, True)
         
         serializer = UserCourseProgressSerializer(course_progress)
         return Response(serializer.data)
@@ -195,39 +186,8 @@ class UserCourseProgressViewSet(viewsets.ReadOnlyModelViewSet):
         # Verificar que la lección pertenece al curso
         lesson = get_object_or_404(Lesson, pk=lesson_id, course=course)
         
-        # Actualizar o crear el progreso de la lección
-        lesson_progress, created = UserLessonProgress.objects.update_or_create(
-            user=request.user,
-            lesson=lesson,
-            defaults={
-                'completed': False,
-                'completion_date': None
-            }
-        )
-        
-        # Actualizar el progreso del curso
-        total_lessons = Lesson.objects.filter(course=course).count()
-        completed_lessons = UserLessonProgress.objects.filter(
-            user=request.user,
-            lesson__course=course,
-            completed=True
-        ).count()
-        
-        # Calcular porcentaje
-        if total_lessons > 0:
-            progress_percentage = (completed_lessons / total_lessons) * 100
-        else:
-            progress_percentage = 0
-        
-        # Actualizar o crear el registro de progreso del curso
-        course_progress, created = UserCourseProgress.objects.update_or_create(
-            user=request.user,
-            course=course,
-            defaults={
-                'progress_percentage': progress_percentage,
-                'last_accessed_at': timezone.now()
-            }
-        )
+        # Desmarcar la lección y restar una lección completada al progreso del curso
+        lesson_progress, course_progress = set_lesson_completed(request.user, lesson, False)
         
         serializer = UserCourseProgressSerializer(course_progress)
         return Response(serializer.data)
@@ -0,0 +1,154 @@
+"""
+Caché de respuestas para endpoints de lectura que cambian poco.
+
+Cada grupo de respuestas (posts fijados, categorías) tiene un número de
+versión en la caché de Django (CACHES, compartida entre workers en
+producción) que forma parte de la clave de sus entradas. Las señales y las acciones del admin que modifican esos datos
+cambian la versión al confirmarse la transacción, de modo que las entradas
+anteriores dejan de usarse en todos los workers sin tener que buscarlas y
+borrarlas. Las entradas caducan además a los RESPONSE_CACHE_TTL
+segundos, lo que acota el desfase de los cambios que no generan señal (p. ej.
+el nombre o el avatar del autor de un post fijado).
+
+Las respuestas con datos del usuario que consulta (p. ej. is_liked en los
+posts fijados) se cachean sin ellos, una sola entrada para todos los
+usuarios, y esos datos se aplican en cada petición (personalize).
+
+Las respuestas llevan un ETag calculado sobre su contenido y una petición con
+If-None-Match coincidente recibe un 304 sin cuerpo.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'response_cache'
+
+# Grupos de respuestas cacheadas
+PINNED_POSTS = 'pinned_posts'
+CATEGORIES = 'categories'
+
+_PINNED_IDS_KEY = f'{CACHE_KEY_PREFIX}:{PINNED_POSTS}:ids'
+
+
+def get_cache_ttl():
+    """Tiempo de vida (en segundos) de una respuesta cacheada."""
+    return getattr(settings, 'RESPONSE_CACHE_TTL', 300)
+
+
+def _version_key(name):
+    return f'{CACHE_KEY_PREFIX}:{name}:version'
+
+
+def get_version(name):
+    """Versión actual de un grupo de respuestas."""
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Partir de la hora actual para no coincidir con una versión anterior
+        # que haya sido expulsada de la caché
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    """
+    Invalida todas las respuestas cacheadas de un grupo.
+
+    La nueva versión se guarda al confirmarse la transacción en curso: si se
+    guardara antes, otra petición podría cachear con ella los datos anteriores
+    al cambio. Es un valor nuevo en lugar de un incr() porque el incremento
+    de la caché en base de datos no es atómico y dos cambios simultáneos
+    podrían dejar la misma versión.
+    """
+    def set_new_version():
+        cache.set(_version_key(name), time.time_ns(), None)
+        logger.debug(f"Caché de respuestas invalidada: {name}")
+
+    transaction.on_commit(set_new_version)
+
+
+def set_pinned_post_ids(post_ids):
+    """Guarda los IDs de los posts fijados que aparecen en las respuestas cacheadas."""
+    cache.set(_PINNED_IDS_KEY, frozenset(str(post_id) for post_id in post_ids), None)
+
+
+def may_be_pinned(post_id):
+    """
+    Indica si un post puede aparecer en la respuesta de posts fijados.
+
+    Si no se conocen los posts fijados se responde que sí, para invalidar de
+    más antes que servir datos desfasados.
+    """
+    post_ids = cache.get(_PINNED_IDS_KEY)
+    return post_ids is None or str(post_id) in post_ids
+
+
+def make_etag(payload):
+    """ETag fuerte para el contenido serializado de una respuesta."""
+    return '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    """Comprueba si el ETag está en la cabecera If-None-Match de la petición."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    # If-None-Match usa comparación débil: W/"x" equivale a "x"
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def cached_response(request, name, build, per_user=False, personalize=None):
+    """
+    Respuesta cacheada de un endpoint GET.
+
+    Args:
+        request: Petición actual
+        name: Grupo de respuestas (PINNED_POSTS, CATEGORIES...)
+        build: Función sin argumentos que devuelve los datos de la respuesta
+        per_user: Si los datos dependen del usuario que consulta (una entrada por usuario)
+        personalize: Función que recibe los datos cacheados, comunes a todos
+            los usuarios, y devuelve los del usuario que consulta (p. ej. con
+            is_liked); alternativa a per_user con una única entrada
+
+    Returns:
+        Response: 200 con los datos o 304 si el cliente ya los tiene, con ETag
+    """
+    # Leer la versión antes de construir los datos: si cambian mientras tanto,
+    # la entrada queda guardada con la versión anterior y no se sirve
+    parts = [CACHE_KEY_PREFIX, name, str(get_version(name))]
+    if per_user:
+        parts.append(str(request.user.pk) if request.user.is_authenticated else 'anon')
+    parts.append(hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest())
+    key = ':'.join(parts)
+
+    entry = cache.get(key)
+    if entry is None:
+        payload = json.dumps(build(), default=str)
+        entry = (make_etag(payload), json.loads(payload))
+        cache.set(key, entry, get_cache_ttl())
+    etag, data = entry
+    if personalize is not None:
+        data = personalize(data)
+        etag = make_etag(json.dumps(data, default=str))
+
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    if per_user or personalize is not None:
+        patch_vary_headers(response, ['Authorization'])
+    return response
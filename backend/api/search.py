@@ -0,0 +1,209 @@
+"""
+Búsqueda de texto completo en los posts.
+
+Se indexa Post.search_text, el texto plano del post (el campo 'text' de su
+JSON, sin encuestas ni demás features) que se calcula al guardar, junto con
+el título:
+
+    - PostgreSQL: índice GIN sobre to_tsvector(SEARCH_CONFIG, ...), consultas
+      con prefijo ('term:*') y ordenación por ts_rank.
+    - SQLite (desarrollo): tabla virtual FTS5 mantenida con triggers,
+      consultas con prefijo ('"term"*') y ordenación por bm25. La tabla
+      guarda su propia copia del texto y el id del post (post_id): el rowid
+      implícito de api_post (clave primaria UUID) puede cambiar con un VACUUM
+      o al rehacer la tabla, así que no sirve para enlazar ambas tablas.
+    - Cualquier otro caso (p. ej. SQLite sin FTS5): icontains por término.
+
+El índice y los triggers se crean en la migración 0008 con
+create_search_index; en SQLite, el comando rebuild_search_index los recrea si
+una migración rehace la tabla de posts (lo que descarta sus triggers).
+"""
+import json
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Configuración de texto de PostgreSQL; debe coincidir con la del índice
+SEARCH_CONFIG = 'spanish'
+
+# Nombre de la tabla FTS5 de SQLite
+SQLITE_FTS_TABLE = 'api_post_fts'
+
+# Número máximo de términos que se tienen en cuenta por búsqueda
+MAX_SEARCH_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def extract_search_text(content):
+    """
+    Texto plano indexable de un post.
+
+    Args:
+        content: Contenido del post (JSON con 'text' y 'features' o texto plano)
+
+    Returns:
+        str: Texto sin encuestas, enlaces ni demás features
+    """
+    if not isinstance(content, str):
+        return ''
+    if content.lstrip().startswith('{'):
+        try:
+            content_json = json.loads(content)
+        except ValueError:
+            return content
+        if isinstance(content_json, dict):
+            text = content_json.get('text')
+            return text if isinstance(text, str) else ''
+    return content
+
+
+def get_search_terms(query):
+    """Palabras de la búsqueda, en minúsculas y sin duplicados."""
+    terms = []
+    for term in _TERM_RE.findall(query.lower()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_SEARCH_TERMS]
+
+
+def _postgres_document(table):
+    # Misma expresión que el índice GIN de la migración
+    return (
+        f"to_tsvector('{SEARCH_CONFIG}'::regconfig, "
+        f"coalesce({table}.title, '') || ' ' || {table}.search_text)"
+    )
+
+
+def create_search_index(connection):
+    """
+    Crea el índice de búsqueda adecuado para el motor de base de datos.
+
+    Args:
+        connection: Conexión de base de datos (p. ej. schema_editor.connection)
+    """
+    table = connection.ops.quote_name('api_post')
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS api_post_search_idx ON {table} "
+                f"USING GIN ({_postgres_document(table)})"
+            )
+        elif connection.vendor == 'sqlite':
+            fts = connection.ops.quote_name(SQLITE_FTS_TABLE)
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"post_id UNINDEXED, title, search_text, "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+            except Exception:
+                # SQLite compilado sin FTS5: la búsqueda usará icontains
+                return
+
+            delete_old = f"DELETE FROM {fts} WHERE post_id = old.id;"
+            insert_new = (
+                f"INSERT INTO {fts}(post_id, title, search_text) "
+                f"VALUES (new.id, new.title, new.search_text);"
+            )
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS api_post_fts_ai AFTER INSERT ON {table} BEGIN {insert_new} END")
+            cursor.execute(f"CREATE TRIGGER IF NOT EXISTS api_post_fts_ad AFTER DELETE ON {table} BEGIN {delete_old} END")
+            # Solo las columnas indexadas: los demás cambios (likes, fijar...) no tocan el índice
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS api_post_fts_au AFTER UPDATE OF id, title, search_text ON {table} "
+                f"BEGIN {delete_old} {insert_new} END"
+            )
+            cursor.execute(f"DELETE FROM {fts}")
+            cursor.execute(f"INSERT INTO {fts}(post_id, title, search_text) SELECT id, title, search_text FROM {table}")
+
+
+def drop_search_index(connection):
+    """
+    Elimina el índice de búsqueda creado por create_search_index.
+
+    Args:
+        connection: Conexión de base de datos (p. ej. schema_editor.connection)
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS api_post_search_idx")
+        elif connection.vendor == 'sqlite':
+            for trigger in ('api_post_fts_ai', 'api_post_fts_ad', 'api_post_fts_au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(SQLITE_FTS_TABLE)}")
+
+
+def sqlite_fts_available():
+    """Indica si existe la tabla FTS5 de posts en la base de datos SQLite."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SQLITE_FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def search_posts(queryset, query):
+    """
+    Filtra un queryset de posts por una búsqueda y lo ordena por relevancia.
+
+    Args:
+        queryset: QuerySet de Post
+        query: Texto buscado
+
+    Returns:
+        QuerySet: Posts que contienen todos los términos (con prefijo),
+                  anotados con search_rank y ordenados de más a menos relevante
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return queryset
+
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+
+    if connection.vendor == 'postgresql':
+        document = _postgres_document(table)
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        queryset = queryset.extra(
+            where=[f"{document} @@ to_tsquery('{SEARCH_CONFIG}'::regconfig, %s)"],
+            params=[tsquery]
+        ).annotate(search_rank=RawSQL(
+            f"ts_rank({document}, to_tsquery('{SEARCH_CONFIG}'::regconfig, %s))",
+            [tsquery], output_field=FloatField()
+        ))
+    elif sqlite_fts_available():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        fts = connection.ops.quote_name(SQLITE_FTS_TABLE)
+        queryset = queryset.extra(
+            where=[f"{table}.id IN (SELECT post_id FROM {fts} WHERE {fts} MATCH %s)"],
+            params=[match]
+        ).annotate(search_rank=RawSQL(
+            # bm25 devuelve valores menores cuanto más relevante: se cambia el signo
+            f"(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND {fts}.post_id = {table}.id)",
+            [match], output_field=FloatField()
+        ))
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(search_text__icontains=term)
+        return queryset.filter(condition)
+
+    return queryset.order_by('-search_rank', '-created_at')
+
+
+class PostSearchFilter(filters.BaseFilterBackend):
+    """
+    Filtro de búsqueda de texto completo para posts (?search=...).
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return search_posts(queryset, query)
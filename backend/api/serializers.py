@@ -1,9 +1,18 @@
+from collections import defaultdict
+
 from rest_framework import serializers
+from django.db import models
 from django.contrib.auth.password_validation import validate_password
 from .models import (
     Subscriber, User, Category, Post, Comment, PostLike, CommentLike, 
     Course, Lesson, UserLessonProgress, UserCourseProgress, Event
 )
+from .comment_tree import CommentTree, MAX_COMMENT_DEPTH
+from .like_buffer import current_likes
+from .polls import project_poll_content
+from .metrics import TimedSerializerMixin
+from .viewer_context import ViewerListSerializer, get_viewer_context
+from api.gamification.ranking import position_of
 
 class SubscriberSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,9 +20,10 @@ class SubscriberSerializer(serializers.ModelSerializer):
         fields = ['name', 'email']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()
+    position = serializers.SerializerMethodField()
     
     class Meta:
         model = User
@@ -44,6 +54,10 @@ class UserSerializer(serializers.ModelSerializer):
     def get_is_admin(self, obj):
         return obj.is_superuser or obj.is_staff
 
+    def get_position(self, obj):
+        # Posición en el ranking: anotada en los listados o contada sobre el índice de puntos
+        return position_of(obj)
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -71,7 +85,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserShortSerializer(serializers.ModelSerializer):
+class UserShortSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializador simplificado de usuario para incluir en otros serializadores (posts, comentarios, etc.)
     """
@@ -113,30 +127,46 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserShortSerializer(read_only=True)
     mentioned_user = UserShortSerializer(read_only=True)
     post = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
+    likes = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
         fields = ['id', 'author', 'content', 'likes', 'created_at', 'updated_at', 'mentioned_user', 'post', 'replies', 'is_liked']
         read_only_fields = ['id', 'author', 'created_at', 'updated_at', 'likes', 'is_liked']
+        list_serializer_class = ViewerListSerializer
+
+    def prime_viewer_context(self, viewer, comments):
+        # Con un árbol precargado los likes ya vienen de CommentTree
+        if not self.context.get('comment_tree'):
+            viewer.prime_comments(comments)
     
     def get_post(self, obj):
-        return str(obj.post.id) if obj.post else None
+        return str(obj.post_id) if obj.post_id else None
+
+    def get_likes(self, obj):
+        # Incluir los likes pendientes de volcar si el contador es diferido
+        return current_likes(obj)
 
     def get_replies(self, obj):
         # Limitar la profundidad de la serialización para evitar recursión infinita
-        depth = getattr(self.context, 'depth', 0)
+        depth = self.context.get('depth', 0) if self.context else 0
         
         # Si ya estamos en una profundidad excesiva, no serializar más niveles
-        if depth > 5:  # Limitar a 5 niveles de anidamiento
+        if depth > MAX_COMMENT_DEPTH:
             return []
-            
-        replies = Comment.objects.filter(parent=obj)
+        
+        # Si hay un árbol precargado en el contexto, obtener las respuestas en memoria
+        tree = self.context.get('comment_tree') if self.context else None
+        if tree is not None:
+            replies = tree.replies_to(obj)
+        else:
+            replies = Comment.objects.filter(parent=obj).select_related('author', 'mentioned_user')
         
         # Pasar el contexto con la profundidad incrementada y el request original
         new_context = self.context.copy() if self.context else {}
@@ -144,16 +174,18 @@ class CommentSerializer(serializers.ModelSerializer):
         return CommentSerializer(replies, many=True, context=new_context).data
         
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return CommentLike.objects.filter(user=request.user, comment=obj).exists()
-        return False
+        tree = self.context.get('comment_tree') if self.context else None
+        if tree is not None:
+            return tree.is_liked(obj)
+        # Likes del usuario cargados una vez para todos los comentarios de la respuesta
+        return get_viewer_context(self.context).is_comment_liked(obj)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserShortSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     comments_count = serializers.SerializerMethodField()
+    likes = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -170,6 +202,11 @@ class PostSerializer(serializers.ModelSerializer):
         fields = ['id', 'author', 'category', 'title', 'content', 'image', 'image_2_url', 'image_3_url', 'likes', 'is_pinned', 
                 'created_at', 'updated_at', 'comments_count', 'category_id', 'is_liked']
         read_only_fields = ['id', 'author', 'created_at', 'updated_at', 'likes', 'is_pinned', 'is_liked']
+        list_serializer_class = ViewerListSerializer
+
+    def prime_viewer_context(self, viewer, posts):
+        # Los posts de for_feed() ya traen anotado el like del usuario
+        viewer.prime_posts([post for post in posts if not hasattr(post, 'annotated_is_liked')])
     
     def create(self, validated_data):
         # Log para debugging
@@ -182,6 +219,16 @@ class PostSerializer(serializers.ModelSerializer):
         logger.info(f"Post creado con ID: {post.id}")
         return post
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        
+        # En las encuestas, enviar resultados agregados y el voto del usuario en lugar de los votos en bruto
+        if getattr(instance, 'has_poll', False):
+            request = self.context.get('request')
+            data['content'] = project_poll_content(instance, request.user if request else None)
+        
+        return data
+
     def get_image_2_url(self, obj):
         if obj.image_2 and hasattr(obj.image_2, 'url'):
             request = self.context.get('request')
@@ -198,14 +245,21 @@ class PostSerializer(serializers.ModelSerializer):
             return obj.image_3.url
         return None
 
+    def get_likes(self, obj):
+        # Incluir los likes pendientes de volcar si el contador es diferido
+        return current_likes(obj)
+
     def get_comments_count(self, obj):
+        # Usar el valor anotado por Post.objects.for_feed() si está disponible
+        if hasattr(obj, 'annotated_comments_count'):
+            return obj.annotated_comments_count
         return obj.comments.count()
         
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return PostLike.objects.filter(user=request.user, post=obj).exists()
-        return False
+        if hasattr(obj, 'annotated_is_liked'):
+            return obj.annotated_is_liked
+        # Likes del usuario cargados una vez para todos los posts de la respuesta
+        return get_viewer_context(self.context).is_post_liked(obj)
 
 
 class PostDetailSerializer(PostSerializer):
@@ -215,9 +269,14 @@ class PostDetailSerializer(PostSerializer):
         fields = PostSerializer.Meta.fields + ['comments']
 
     def get_comments(self, obj):
-        # Obtener solo comentarios de primer nivel (sin padres)
-        comments = Comment.objects.filter(post=obj, parent=None)
-        return CommentSerializer(comments, many=True).data
+        # Cargar todo el árbol de comentarios de una vez y serializar los de primer nivel
+        request = self.context.get('request')
+        tree = CommentTree(obj, request.user if request else None)
+        return CommentSerializer(tree.roots, many=True, context={
+            'request': request,
+            'depth': 0,
+            'comment_tree': tree
+        }).data
 
 
 class PostLikeSerializer(serializers.ModelSerializer):
@@ -262,6 +321,9 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_lessons_count(self, obj):
+        # Usar el valor anotado por Course.objects.with_lessons_count() si está disponible
+        if hasattr(obj, 'annotated_lessons_count'):
+            return obj.annotated_lessons_count
         return obj.lessons.count()
         
     def get_thumbnail_url(self, obj):
@@ -296,6 +358,22 @@ class CourseDetailSerializer(CourseSerializer):
         fields = CourseSerializer.Meta.fields + ['lessons']
 
 
+class LessonOutlineSerializer(serializers.ModelSerializer):
+    """Lección sin su contenido, para el índice de un curso"""
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'order']
+        read_only_fields = fields
+
+
+class CourseOutlineSerializer(CourseSerializer):
+    """Curso con el índice de sus lecciones; el contenido se pide por lección"""
+    lessons = LessonOutlineSerializer(many=True, read_only=True)
+    
+    class Meta(CourseSerializer.Meta):
+        fields = CourseSerializer.Meta.fields + ['lessons']
+
+
 # Nuevos serializadores para el progreso del usuario
 
 class UserLessonProgressSerializer(serializers.ModelSerializer):
@@ -312,6 +390,14 @@ class UserLessonProgressSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class LessonProgressSyncItemSerializer(serializers.Serializer):
+    """Una actualización del endpoint de sincronización de progreso de lecciones"""
+    lesson = serializers.UUIDField()
+    completed = serializers.BooleanField(required=False, allow_null=True, default=None)
+    # Segundos a sumar al tiempo ya registrado
+    time_spent_seconds = serializers.IntegerField(required=False, min_value=0, default=0)
+
+
 class LessonProgressSerializer(serializers.ModelSerializer):
     """Serializador simplificado para usarse en UserCourseProgressSerializer"""
     lesson_id = serializers.CharField(source='lesson.id')
@@ -322,6 +408,34 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         fields = ['lesson_id', 'lesson_title', 'completed', 'completion_date', 'time_spent_seconds']
 
 
+class CourseProgressListSerializer(serializers.ListSerializer):
+    """
+    Carga en una sola consulta el progreso de lecciones de todos los cursos
+    de la lista y lo reparte en memoria entre sus UserCourseProgress.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        course_progress = list(data)
+
+        grouped = defaultdict(list)
+        if course_progress:
+            lesson_progress = UserLessonProgress.objects.filter(
+                user_id__in={progress.user_id for progress in course_progress},
+                lesson__course_id__in={progress.course_id for progress in course_progress}
+            ).select_related('lesson').only(
+                'user', 'lesson', 'completed', 'completion_date', 'time_spent_seconds',
+                'lesson__title', 'lesson__course'
+            ).order_by('lesson__order')
+            for progress in lesson_progress:
+                grouped[(progress.user_id, progress.lesson.course_id)].append(progress)
+
+        for progress in course_progress:
+            progress.prefetched_lesson_progress = grouped.get((progress.user_id, progress.course_id), [])
+        return super().to_representation(course_progress)
+
+
 class UserCourseProgressSerializer(serializers.ModelSerializer):
     completed_lessons = serializers.SerializerMethodField()
     course_title = serializers.CharField(source='course.title', read_only=True)
@@ -333,18 +447,24 @@ class UserCourseProgressSerializer(serializers.ModelSerializer):
                   'last_accessed_at', 'completed_at', 'created_at', 'updated_at',
                   'completed_lessons', 'total_lessons']
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'completed_at']
+        list_serializer_class = CourseProgressListSerializer
     
     def get_completed_lessons(self, obj):
         """Obtener todas las lecciones completadas por el usuario en este curso"""
-        lesson_progress = UserLessonProgress.objects.filter(
-            user=obj.user,
-            lesson__course=obj.course
-        )
+        # Usar el progreso precargado por CourseProgressListSerializer si está disponible
+        if hasattr(obj, 'prefetched_lesson_progress'):
+            lesson_progress = obj.prefetched_lesson_progress
+        else:
+            lesson_progress = UserLessonProgress.objects.filter(
+                user_id=obj.user_id,
+                lesson__course_id=obj.course_id
+            ).select_related('lesson').defer('lesson__content', 'lesson__content_blob').order_by('lesson__order')
         return LessonProgressSerializer(lesson_progress, many=True).data
     
     def get_total_lessons(self, obj):
         """Obtener el número total de lecciones en el curso"""
-        return Lesson.objects.filter(course=obj.course).count()
+        # Contador mantenido por api.course_progress
+        return obj.total_lessons_count
 
 
 class EventSerializer(serializers.ModelSerializer):
@@ -389,9 +389,10 @@ class StripeService:
             return False
     
     @staticmethod
-    def check_subscription_status(user):
+    def check_subscription_status(user, raise_errors=False):
         """
-        Verifica el estado de la suscripción de un usuario y actualiza la base de datos
+        Verifica el estado de la suscripción de un usuario y actualiza la base de datos.
+        Con raise_errors, un error de Stripe se propaga en lugar de devolver False.
         """
         # Si el usuario es superadmin, siempre tiene suscripción activa
         if user.is_superuser:
@@ -434,4 +435,6 @@ class StripeService:
             return is_active
         except stripe.error.StripeError as e:
             logger.error(f"Error al verificar suscripción: {e}")
+            if raise_errors:
+                raise
             return False
\ No newline at end of file
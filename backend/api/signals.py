@@ -0,0 +1,45 @@
+"""
+Señales que invalidan la caché de respuestas de los endpoints de lectura y
+mantienen los contadores de lecciones del progreso de los cursos.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .course_progress import add_lesson_to_course_progress, recalculate_course_progress
+from .models import Category, Post, Comment, PostLike, PollVote, Lesson, UserCourseProgress
+from .response_cache import CATEGORIES, PINNED_POSTS, bump_version, may_be_pinned
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_responses(sender, **kwargs):
+    bump_version(CATEGORIES)
+    # Los posts fijados incluyen su categoría
+    bump_version(PINNED_POSTS)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_pinned_posts_on_post_change(sender, instance, **kwargs):
+    # Post fijado (o que se acaba de fijar) o que estaba fijado y ya no lo está
+    if instance.is_pinned or may_be_pinned(instance.pk):
+        bump_version(PINNED_POSTS)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=PostLike)
+@receiver([post_save, post_delete], sender=PollVote)
+def invalidate_pinned_posts_on_activity(sender, instance, **kwargs):
+    # Comentarios, likes y votos cambian los contadores de los posts fijados
+    if may_be_pinned(instance.post_id):
+        bump_version(PINNED_POSTS)
+
+
+@receiver(post_save, sender=Lesson)
+def add_lesson_to_progress_totals(sender, instance, created, **kwargs):
+    if created:
+        add_lesson_to_course_progress(instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def recalculate_progress_on_lesson_delete(sender, instance, **kwargs):
+    # El progreso de la lección se elimina en cascada: recontar el curso entero
+    recalculate_course_progress(UserCourseProgress.objects.filter(course_id=instance.course_id))
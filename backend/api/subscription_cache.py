@@ -0,0 +1,110 @@
+"""
+Caché de veredictos de suscripción premium.
+
+Evita consultar a Stripe en cada petición a un endpoint premium: el resultado
+de StripeService.check_subscription_status se guarda por usuario y
+subscription_id durante SUBSCRIPTION_CACHE_TTL segundos, y los webhooks de
+Stripe invalidan la entrada cuando la suscripción cambia.
+
+Los veredictos se guardan en la caché de Django (CACHES). Con la caché en
+memoria por defecto cada worker tiene la suya y la invalidación de un webhook
+solo la ve el que lo recibe (los demás la recogen al caducar la entrada); con
+una caché compartida (producción) la ven todos. Si la consulta a Stripe falla
+no hay veredicto y no se guarda nada.
+"""
+import logging
+import threading
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+
+from .services import StripeService
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'subscription_status'
+
+# Contadores del proceso actual (cada worker de gunicorn tiene los suyos)
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _increment(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def _cache_key(user_id, subscription_id):
+    return f"{CACHE_KEY_PREFIX}:{user_id}:{subscription_id or 'none'}"
+
+
+def get_cache_ttl():
+    """Tiempo de vida (en segundos) de un veredicto cacheado."""
+    return getattr(settings, 'SUBSCRIPTION_CACHE_TTL', 300)
+
+
+def check_subscription_status_cached(user):
+    """
+    Devuelve si el usuario tiene una suscripción activa, consultando a Stripe
+    solo cuando no hay un veredicto cacheado para su suscripción actual.
+    """
+    key = _cache_key(user.id, user.subscription_id)
+    cached = cache.get(key)
+
+    if cached is not None:
+        _increment('hits')
+        return cached
+
+    _increment('misses')
+    try:
+        is_active = StripeService.check_subscription_status(user, raise_errors=True)
+    except stripe.error.StripeError:
+        # Error al consultar Stripe: se trata como inactiva, como hace
+        # StripeService, pero se vuelve a consultar en la siguiente petición
+        return False
+    cache.set(key, is_active, get_cache_ttl())
+    return is_active
+
+
+def store_subscription_status(user, is_active):
+    """Guarda un veredicto ya conocido (p. ej. tras consultar a Stripe explícitamente)."""
+    cache.set(_cache_key(user.id, user.subscription_id), is_active, get_cache_ttl())
+
+
+def invalidate_subscription_status(user, *subscription_ids):
+    """
+    Elimina los veredictos cacheados del usuario para su suscripción actual y
+    para cualquier otro subscription_id indicado (p. ej. el anterior).
+    """
+    keys = {_cache_key(user.id, user.subscription_id)}
+    keys.update(_cache_key(user.id, subscription_id) for subscription_id in subscription_ids)
+    cache.delete_many(list(keys))
+    _increment('invalidations')
+    logger.debug(f"Caché de suscripción invalidada para {user.username}")
+
+
+def get_cache_stats():
+    """Devuelve los contadores de aciertos, fallos e invalidaciones del proceso."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def render_cache_stats():
+    """Contadores de get_cache_stats en formato de texto de Prometheus (para /api/metrics/)."""
+    stats = get_cache_stats()
+    lookups = 'api_subscription_cache_lookups_total'
+    invalidations = 'api_subscription_cache_invalidations_total'
+    lines = [
+        f'# HELP {lookups} Consultas a la caché de veredictos de suscripción',
+        f'# TYPE {lookups} counter',
+        f'{lookups}{{result="hit"}} {stats["hits"]}',
+        f'{lookups}{{result="miss"}} {stats["misses"]}',
+        f'# HELP {invalidations} Veredictos de suscripción invalidados',
+        f'# TYPE {invalidations} counter',
+        f'{invalidations} {stats["invalidations"]}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -4,6 +4,7 @@ from django.conf import settings
 import stripe
 import logging
 from .services import StripeService
+from .subscription_cache import invalidate_subscription_status, store_subscription_status
 from datetime import datetime
 
 # Configurar logging
@@ -45,6 +46,7 @@ class UpdateSubscriptionView(views.APIView):
             logger.info(f"Suscripción encontrada: {subscription.id}, estado: {subscription.status}")
             
             # Actualizar el usuario
+            previous_subscription_id = user.subscription_id
             user.subscription_id = subscription.id
             user.subscription_status = subscription.status
             
@@ -62,6 +64,7 @@ class UpdateSubscriptionView(views.APIView):
             
             # Guardar cambios
             user.save()
+            invalidate_subscription_status(user, previous_subscription_id)
             
             return Response({
                 "has_subscription": is_active,
@@ -179,6 +182,7 @@ class SubscriptionStatusView(views.APIView):
         
         # Verificar estado actual
         is_active = StripeService.check_subscription_status(user)
+        store_subscription_status(user, is_active)
         
         return Response({
             "has_subscription": is_active,
@@ -206,6 +210,7 @@ class CancelSubscriptionView(views.APIView):
         success = StripeService.cancel_subscription(user)
         
         if success:
+            invalidate_subscription_status(user)
             return Response({"status": "Suscripción cancelada correctamente"})
         else:
             return Response(
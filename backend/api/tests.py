@@ -1,3 +1,874 @@
-from django.test import TestCase
+import json
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .debug_utils import instrumentation_enabled
+from .gamification.models import UserAction, UserDailyPoints
+from .gamification.ranking import position_of, with_positions
+from .gamification.services import award_points
+from .gamification.stats import compute_user_counters, get_user_stats
+from .likes import set_like
+from .polls import cast_vote
+from .search import create_search_index, drop_search_index, search_posts, sqlite_fts_available
+from .metrics import QueryBudgetExceeded, get_query_budget
+from .course_progress import count_course_progress, set_lesson_completed
+from .lesson_content import render_lesson, splice_json
+from .models import Comment, CommentLike, Course, Lesson, Post, PostLike, User, UserCourseProgress, UserLessonProgress
+from .serializers import LessonSerializer
+from .subscription_cache import store_subscription_status
+
+
+def create_member(username):
+    """Usuario con suscripción activa, para los endpoints premium."""
+    return User.objects.create_user(
+        username=username, password='x', email=f'{username}@example.com',
+        has_active_subscription=True, subscription_id=f'sub_{username}'
+    )
+
+
+def client_for(user):
+    """Cliente de la API autenticado con JWT, como el frontend."""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+class APITestCase(TestCase):
+    """
+    Tests de la API con un usuario premium. Stripe no se consulta: la
+    verificación de la suscripción devuelve el estado guardado en el usuario.
+    """
+
+    def setUp(self):
+        # La caché en memoria sobrevive entre tests: empezar cada uno sin veredictos ni respuestas
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch(
+            'api.services.StripeService.check_subscription_status',
+            side_effect=lambda user, **kwargs: bool(user.has_active_subscription)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_member('lector')
+        self.client = client_for(self.user)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(LIKE_COUNTER_BUFFERING=False)
+class SetLikeConcurrencyTests(TransactionTestCase):
+    """
+    set_like desde varios hilos a la vez: el contador desnormalizado
+    Post.likes debe coincidir siempre con el número de filas de PostLike.
+    Requiere SELECT ... FOR UPDATE (no se ejecuta en SQLite); la semántica
+    sin concurrencia se prueba en SetLikeTests.
+    """
+    THREADS = 8
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x')
+        self.post = Post.objects.create(author=self.author, content='Post concurrido')
+        self.users = [
+            User.objects.create_user(username=f'usuario{i}', password='x') for i in range(self.THREADS)
+        ]
+
+    def run_concurrently(self, calls):
+        """Ejecuta cada (usuario, liked) en su propio hilo, todos a la vez."""
+        barrier = threading.Barrier(len(calls))
+        errors = []
+
+        def worker(user, liked):
+            try:
+                barrier.wait()
+                set_like(user, Post.objects.get(pk=self.post.pk), liked)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # Cada hilo abre su propia conexión
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=call) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assertCounterMatchesRows(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, PostLike.objects.filter(post=self.post).count())
+
+    def test_likes_from_different_users(self):
+        self.run_concurrently([(user, True) for user in self.users])
+
+        self.assertCounterMatchesRows()
+        self.assertEqual(self.post.likes, self.THREADS)
+
+    def test_repeated_like_from_same_user(self):
+        user = self.users[0]
+        self.run_concurrently([(user, True)] * self.THREADS)
+
+        self.assertCounterMatchesRows()
+        self.assertEqual(self.post.likes, 1)
+
+    def test_toggles_from_same_user(self):
+        user = self.users[0]
+        self.run_concurrently([(user, None)] * self.THREADS)
+
+        self.assertCounterMatchesRows()
+
+    def test_likes_and_unlikes_mixed(self):
+        for user in self.users[::2]:
+            set_like(user, self.post, True)
+
+        self.run_concurrently([(user, i % 2 == 0) for i, user in enumerate(self.users)] * 2)
+
+        self.assertCounterMatchesRows()
+        self.assertEqual(self.post.likes, len(self.users[::2]))
+
+
+class SetLikeTests(APITestCase):
+    """
+    Semántica de set_like y de los endpoints de like en cualquier motor de
+    base de datos: el contador desnormalizado solo cambia cuando el like se
+    crea o se borra de verdad y siempre coincide con las filas de likes.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.author = create_member('autor')
+        self.post = Post.objects.create(author=self.author, content='Post')
+        self.comment = Comment.objects.create(author=self.author, post=self.post, content='Comentario')
+
+    def assertLikes(self, target, expected):
+        like_model = PostLike if isinstance(target, Post) else CommentLike
+        target.refresh_from_db()
+        self.assertEqual(target.likes, expected)
+        self.assertEqual(like_model.objects.filter(**{type(target).__name__.lower(): target}).count(), expected)
+
+    def test_like_unlike_and_toggle(self):
+        for target in (self.post, self.comment):
+            with self.subTest(target=type(target).__name__):
+                self.assertEqual(tuple(set_like(self.user, target, True)), (True, True, 1))
+                # Repetir el mismo estado no cambia nada
+                self.assertEqual(tuple(set_like(self.user, target, True)), (True, False, 1))
+                self.assertLikes(target, 1)
+
+                self.assertEqual(tuple(set_like(self.user, target, False)), (False, True, 0))
+                self.assertEqual(tuple(set_like(self.user, target, False)), (False, False, 0))
+                self.assertLikes(target, 0)
+
+                self.assertEqual(tuple(set_like(self.user, target)), (True, True, 1))
+                self.assertEqual(tuple(set_like(self.author, target)), (True, True, 2))
+                self.assertEqual(tuple(set_like(self.user, target)), (False, True, 1))
+                self.assertLikes(target, 1)
+
+    def test_unlike_never_goes_below_zero(self):
+        Post.objects.filter(pk=self.post.pk).update(likes=0)
+        PostLike.objects.create(user=self.user, post=self.post)
+
+        self.assertEqual(tuple(set_like(self.user, self.post, False)), (False, True, 0))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 0)
+
+    def test_endpoints(self):
+        for target, url in (
+            (self.post, f'/api/posts/{self.post.pk}/like/'),
+            (self.comment, f'/api/comments/{self.comment.pk}/like/'),
+        ):
+            with self.subTest(url=url):
+                for data, expected in (
+                    ({'action': 'like'}, {'status': 'liked', 'likes': 1}),
+                    ({'action': 'like'}, {'status': 'liked', 'likes': 1}),
+                    ({}, {'status': 'unliked', 'likes': 0}),
+                    ({'action': 'toggle'}, {'status': 'liked', 'likes': 1}),
+                ):
+                    response = self.client.post(url, data, format='json')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.data, expected)
+                self.assertLikes(target, 1)
+
+                # DELETE quita el like y repetirlo no cambia nada
+                for _ in range(2):
+                    response = self.client.delete(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.data, {'status': 'unliked', 'likes': 0})
+                self.assertLikes(target, 0)
+
+                response = self.client.post(url, {'action': 'love'}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+                self.assertLikes(target, 0)
+
+
+@override_settings(DEBUG_INSTRUMENTATION=False)
+class FeedDiagnosticsQueryTests(APITestCase):
+    """
+    Con DEBUG_INSTRUMENTATION desactivado los diagnósticos del feed no
+    ejecutan ninguna consulta.
+    """
+
+    def create_posts(self, count):
+        for i in range(count):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Contenido')
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/', {'page': 1})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_instrumentation_check_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(instrumentation_enabled())
+
+    def test_list_skips_feed_diagnostics(self):
+        self.create_posts(3)
+
+        with mock.patch('api.views.log_feed_diagnostics') as diagnostics:
+            self.count_list_queries()
+
+        diagnostics.assert_not_called()
+
+    def test_list_queries_do_not_include_diagnostics(self):
+        self.create_posts(3)
+        # Primera petición: verificación de la suscripción, que después queda cacheada
+        self.count_list_queries()
+
+        # Usuario (una vez, compartido por el middleware premium y DRF), posts y
+        # recuentos de encuestas; el veredicto de la suscripción sale de la caché en memoria
+        with self.assertNumQueries(3):
+            self.count_list_queries()
+
+        with override_settings(DEBUG_INSTRUMENTATION=True):
+            # Los recuentos de log_feed_diagnostics son las únicas consultas extra
+            self.assertGreater(self.count_list_queries(), 3)
+
+        self.create_posts(10)
+        with self.assertNumQueries(3):
+            self.count_list_queries()
+
+
+class PremiumGatingTests(APITestCase):
+    """
+    PremiumContentMiddleware autentica el JWT antes de la vista y DRF reutiliza
+    ese usuario: una sola lectura del usuario por petición.
+    """
+
+    def user_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        user_selects = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "api_user" WHERE "api_user"."id" =' in query['sql']
+        ]
+        return response, len(user_selects)
+
+    def test_member_is_authenticated_once(self):
+        response, user_selects = self.user_queries(self.client, '/api/posts/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_selects, 1)
+
+    def test_non_member_is_rejected(self):
+        user = User.objects.create_user(username='visitante', password='x')
+
+        response, user_selects = self.user_queries(client_for(user), '/api/posts/')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(user_selects, 1)
+
+    def test_anonymous_and_invalid_token_are_rejected(self):
+        self.assertEqual(APIClient().get('/api/posts/').status_code, 401)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer no-es-un-token')
+        self.assertEqual(client.get('/api/posts/').status_code, 401)
+
+    def test_public_exception_is_not_gated(self):
+        user = User.objects.create_user(username='visitante', password='x')
+
+        response, user_selects = self.user_queries(client_for(user), '/api/auth/me/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_selects, 1)
+
+
+class PinnedPostsCacheTests(APITestCase):
+    """
+    /api/pinned-posts/ cachea una única respuesta para todos los usuarios y
+    aplica en cada petición el like y el voto del usuario que consulta.
+    """
+
+    url = '/api/pinned-posts/'
+
+    def setUp(self):
+        super().setUp()
+        self.other = create_member('otro')
+        poll_content = json.dumps({
+            'text': 'Encuesta',
+            'features': {'poll': [{'id': 1, 'text': 'Sí'}, {'id': 2, 'text': 'No'}]}
+        })
+        self.poll_post = Post.objects.create(author=self.user, content=poll_content, is_pinned=True)
+        self.post = Post.objects.create(author=self.user, content='Fijado', is_pinned=True)
+        Post.objects.create(author=self.user, content='Sin fijar')
+        set_like(self.user, self.post, True)
+        cast_vote(self.user, self.poll_post, 2)
+
+    def viewer_fields(self, response):
+        fields = {}
+        for post in response.data['results']:
+            content = json.loads(post['content']) if post['id'] == str(self.poll_post.pk) else {}
+            fields[post['id']] = (post['is_liked'], post['likes'], content.get('features', {}).get('user_vote'))
+        return fields
+
+    def poll_results(self, response):
+        post = next(post for post in response.data['results'] if post['id'] == str(self.poll_post.pk))
+        return json.loads(post['content'])['features']['poll_results']
+
+    def test_shared_entry_with_viewer_overlay(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.viewer_fields(response), {
+            str(self.poll_post.pk): (False, 0, 2),
+            str(self.post.pk): (True, 1, None),
+        })
+
+        with CaptureQueriesContext(connection) as queries:
+            other_response = self.client_for_other().get(self.url)
+        # La respuesta cacheada sirve también al otro usuario: solo se leen su like y su voto
+        post_queries = [q['sql'] for q in queries.captured_queries if 'FROM "api_post"' in q['sql']]
+        self.assertEqual(len(post_queries), 1)
+        self.assertEqual(self.viewer_fields(other_response), {
+            str(self.poll_post.pk): (False, 0, None),
+            str(self.post.pk): (False, 1, None),
+        })
+        self.assertEqual(self.poll_results(other_response), self.poll_results(response))
+        self.assertEqual(self.poll_results(response), {'1': 0, '2': 1})
+        self.assertNotEqual(other_response['ETag'], response['ETag'])
+
+    def test_etag_is_per_viewer(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client_for_other().get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def client_for_other(self):
+        return client_for(self.other)
+
+
+class SQLiteSearchIndexTests(TransactionTestCase):
+    """
+    La tabla FTS5 de SQLite se enlaza con los posts por su id (post_id), no
+    por el rowid implícito de api_post, que puede cambiar con un VACUUM.
+    """
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Índice FTS5 de SQLite')
+        create_search_index(connection)
+        self.addCleanup(drop_search_index, connection)
+        if not sqlite_fts_available():
+            self.skipTest('SQLite sin FTS5')
+        self.author = User.objects.create_user(username='autor', password='x', email='autor@example.com')
+
+    def search(self, query):
+        return sorted(search_posts(Post.objects.all(), query).values_list('content', flat=True))
+
+    def test_index_follows_post_changes(self):
+        kept = Post.objects.create(author=self.author, title='Canción', content='Guitarra española')
+        edited = Post.objects.create(author=self.author, title='Receta', content='Tortilla de patatas')
+        deleted = Post.objects.create(author=self.author, content='Guitarra eléctrica')
+        self.assertEqual(self.search('guitar'), ['Guitarra eléctrica', 'Guitarra española'])
+
+        deleted.delete()
+        edited.content = 'Guitarra acústica'
+        edited.save()
+        Post.objects.filter(pk=kept.pk).update(is_pinned=True)
+
+        self.assertEqual(self.search('guitarra'), ['Guitarra acústica', 'Guitarra española'])
+        self.assertEqual(self.search('tortilla'), [])
+        self.assertEqual(self.search('cancion'), ['Guitarra española'])
+
+    def test_survives_rowid_renumbering(self):
+        first = Post.objects.create(author=self.author, content='Ajedrez')
+        second = Post.objects.create(author=self.author, content='Damas')
+        first.delete()
+        with connection.cursor() as cursor:
+            # Renumerar el rowid implícito de los posts sin disparar los triggers,
+            # como puede hacer un VACUUM en las tablas sin INTEGER PRIMARY KEY
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'api_post'")
+            triggers = cursor.fetchall()
+            for name, _ in triggers:
+                cursor.execute(f'DROP TRIGGER {name}')
+            cursor.execute('UPDATE api_post SET rowid = rowid - 1')
+            for _, sql in triggers:
+                cursor.execute(sql)
+
+        self.assertEqual(self.search('damas'), ['Damas'])
+        second.delete()
+        self.assertEqual(self.search('damas'), [])
+
+class KeysetPaginationTests(APITestCase):
+    """
+    El feed, los posts de un usuario y los comentarios se paginan por cursor:
+    ninguna página ejecuta COUNT(*) ni OFFSET.
+    """
+
+    def walk(self, url, params=None):
+        """Recorre todas las páginas siguiendo 'next' y devuelve los ids en orden."""
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            for query in queries:
+                sql = query['sql'].upper()
+                if 'FROM "API_POST"' in sql or 'FROM "API_COMMENT"' in sql:
+                    self.assertNotIn('COUNT(*)', sql)
+                    self.assertNotIn('OFFSET', sql)
+            ids.extend(item['id'] for item in response.data['results'])
+            url, params = response.data['next'], None
+        return ids
+
+    def test_feed_pages_follow_feed_order(self):
+        posts = [
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Contenido', is_pinned=i % 7 == 0)
+            for i in range(25)
+        ]
+        expected = [str(pk) for pk in Post.objects.order_by('-is_pinned', '-created_at', '-id').values_list('id', flat=True)]
+
+        self.assertEqual([str(pk) for pk in self.walk('/api/posts/', {'page_size': 4})], expected)
+        # ?page=1 es la primera página del cursor
+        self.assertEqual([str(pk) for pk in self.walk('/api/posts/', {'page': 1})], expected)
+        self.assertEqual(len(expected), len(posts))
+
+    def test_feed_rejects_page_numbers_beyond_first(self):
+        response = self.client.get('/api/posts/', {'page': 2})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_user_posts_are_paginated_by_cursor(self):
+        for i in range(12):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Contenido')
+        expected = [str(pk) for pk in Post.objects.filter(author=self.user).order_by('-created_at', '-id').values_list('id', flat=True)]
+
+        ids = self.walk(f'/api/users/{self.user.pk}/posts/', {'page': 1})
+
+        self.assertEqual([str(pk) for pk in ids], expected)
+
+    def test_comments_are_paginated_by_cursor(self):
+        post = Post.objects.create(author=self.user, title='Post', content='Contenido')
+        for i in range(15):
+            root = Comment.objects.create(post=post, author=self.user, content=f'Comentario {i}')
+            Comment.objects.create(post=post, author=self.user, parent=root, content='Respuesta')
+        expected = [
+            str(pk) for pk in Comment.objects.filter(post=post, parent__isnull=True)
+            .order_by('created_at', 'id').values_list('id', flat=True)
+        ]
+
+        ids = self.walk(f'/api/posts/{post.pk}/comments/')
+
+        self.assertEqual([str(pk) for pk in ids], expected)
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(APITestCase):
+    """
+    Los endpoints con presupuesto en QUERY_BUDGETS no lo superan: con
+    QUERY_BUDGET_STRICT una petición que lo supera lanza QueryBudgetExceeded.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Veredicto de la suscripción ya cacheado, como en cualquier petición salvo la primera
+        store_subscription_status(self.user, True)
+
+        others = [create_member(f'miembro{i}') for i in range(3)]
+        for i, author in enumerate([self.user, *others] * 3):
+            post = Post.objects.create(author=author, title=f'Post {i}', content='Contenido')
+            for other in others:
+                comment = Comment.objects.create(post=post, author=other, content='Comentario')
+                Comment.objects.create(post=post, author=author, parent=comment, content='Respuesta')
+                set_like(other, post, True)
+        self.post = post
+
+        for points, user in enumerate([self.user, *others], start=1):
+            user.points = points * 10
+            user.save(update_fields=['points'])
+            UserDailyPoints.objects.create(user=user, date=timezone.localdate(), points=points)
+
+    def assertWithinBudget(self, view_name, url, params=None):
+        with mock.patch('api.metrics.get_query_budget', wraps=get_query_budget) as budget_lookup:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        # La petición se ha medido con el nombre que usa QUERY_BUDGETS
+        budget_lookup.assert_called_once_with(view_name)
+        self.assertIsNotNone(get_query_budget(view_name))
+        return response
+
+    def test_post_list(self):
+        self.assertWithinBudget('PostViewSet.list', '/api/posts/')
+        self.assertWithinBudget('PostViewSet.list', '/api/posts/', {'page': 1})
+        response = self.assertWithinBudget('PostViewSet.list', '/api/posts/', {'page_size': 5})
+        self.assertWithinBudget('PostViewSet.list', response.data['next'])
+
+    def test_post_retrieve(self):
+        self.assertWithinBudget('PostViewSet.retrieve', f'/api/posts/{self.post.pk}/')
+
+    def test_user_me(self):
+        self.assertWithinBudget('UserMeView', '/api/auth/me/')
+
+    def test_leaderboard(self):
+        for period in ('all', 'week', 'month'):
+            self.assertWithinBudget('LeaderboardView', '/api/leaderboard/', {'period': period})
+
+    def test_exceeded_budget_fails_request(self):
+        with override_settings(QUERY_BUDGETS={'UserMeView': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/auth/me/')
+
+
+class RankingTests(TestCase):
+    """
+    El ranking materializado (RankBucket) da la misma posición que contar
+    los usuarios con más puntos, también tras award_points, cambios desde el
+    admin y bajas.
+    """
+
+    def setUp(self):
+        self.users = []
+        for i, points in enumerate([50, 10, 50, 0, 30, 10]):
+            user = User.objects.create_user(username=f'jugador{i}', password='x')
+            user.points = points
+            user.save()
+            self.users.append(user)
+
+    def assertPositionsMatchCount(self):
+        for user in User.objects.all():
+            expected = User.objects.filter(points__gt=user.points).count() + 1
+            self.assertEqual(position_of(user), expected, user.username)
+        for user in with_positions(User.objects.all()):
+            self.assertEqual(user.rank_position, User.objects.filter(points__gt=user.points).count() + 1)
+        call_command('rebuild_rank_buckets', '--check', stdout=StringIO())
+
+    def test_positions_after_saves(self):
+        self.assertPositionsMatchCount()
+        self.assertEqual([position_of(user) for user in self.users], [1, 4, 1, 6, 3, 4])
+
+    def test_award_points_moves_user(self):
+        UserAction.objects.create(action_type='create_post', points=25, description='Crear post')
+
+        award_points(self.users[1], 'create_post')
+        award_points(self.users[3], 'create_post')
+        award_points(self.users[3], 'create_post')
+
+        self.assertPositionsMatchCount()
+        self.assertEqual(position_of(User.objects.get(pk=self.users[3].pk)), 1)
+
+    def test_points_lowered_and_user_deleted(self):
+        self.users[0].points = 5
+        self.users[0].save()
+        self.users[2].delete()
+
+        self.assertPositionsMatchCount()
+
+    def test_check_detects_drift_and_rebuild_fixes_it(self):
+        # Un UPDATE directo no pasa por award_points ni por las señales
+        User.objects.filter(pk=self.users[3].pk).update(points=100)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rank_buckets', '--check', stdout=StringIO())
+
+        call_command('rebuild_rank_buckets', stdout=StringIO())
+        self.assertPositionsMatchCount()
+
+
+class UserStatsCascadeTests(TestCase):
+    """
+    Al borrar un post, los contadores de UserStats descuentan sus likes y
+    comentarios borrados en cascada con un UPDATE por autor, no por fila.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x', email='autor@example.com')
+        self.commenters = [
+            User.objects.create_user(username=f'comentarista{i}', password='x', email=f'c{i}@example.com')
+            for i in range(2)
+        ]
+        self.likers = [
+            User.objects.create_user(username=f'fan{i}', password='x', email=f'fan{i}@example.com')
+            for i in range(5)
+        ]
+        self.post = Post.objects.create(author=self.author, title='Post', content='Contenido')
+        self.other_post = Post.objects.create(author=self.author, title='Otro', content='Contenido')
+        for user in self.likers:
+            PostLike.objects.create(user=user, post=self.post)
+        PostLike.objects.create(user=self.likers[0], post=self.other_post)
+        for commenter in self.commenters:
+            comment = Comment.objects.create(author=commenter, post=self.post, content='Comentario')
+            reply = Comment.objects.create(author=self.author, post=self.post, parent=comment, content='Respuesta')
+            for user in self.likers:
+                CommentLike.objects.create(user=user, comment=comment)
+            CommentLike.objects.create(user=commenter, comment=reply)
+        Comment.objects.create(author=self.commenters[0], post=self.other_post, content='Se queda')
+        self.users = [self.author, *self.commenters, *self.likers]
+        for user in self.users:
+            get_user_stats(user)
+
+    def assertStatsMatchCount(self):
+        for user in self.users:
+            stats = get_user_stats(user)
+            counters = compute_user_counters(user.pk)
+            self.assertEqual(
+                {field: getattr(stats, field) for field in counters}, counters, user.username
+            )
+
+    def stats_updates(self, delete):
+        with CaptureQueriesContext(connection) as queries:
+            delete()
+        return [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "api_userstats"')]
+
+    def test_post_delete(self):
+        updates = self.stats_updates(self.post.delete)
+
+        # posts_count y likes del autor, y comentarios y likes de comentarios de
+        # cada uno de sus tres autores (fila a fila serían 22)
+        self.assertEqual(len(updates), 8)
+        self.assertStatsMatchCount()
+
+    def test_queryset_delete(self):
+        self.stats_updates(Post.objects.filter(author=self.author).delete)
+
+        self.assertStatsMatchCount()
+        self.assertEqual(get_user_stats(self.author).posts_count, 0)
+
+    def test_comment_and_user_delete_still_counted(self):
+        # Fuera del borrado de un post cada fila se sigue descontando
+        self.post.comments.filter(parent__isnull=True).first().delete()
+        self.assertStatsMatchCount()
+
+        self.likers[1].delete()
+        self.users.remove(self.likers[1])
+        self.assertStatsMatchCount()
+
+
+class CourseProgressTestCase(APITestCase):
+    """Dos cursos con lecciones para los tests de progreso."""
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.objects.create(title='Curso')
+        self.other_course = Course.objects.create(title='Otro curso')
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f'Lección {i}', order=i) for i in range(4)
+        ]
+        self.other_lessons = [
+            Lesson.objects.create(course=self.other_course, title=f'Lección {i}', order=i) for i in range(2)
+        ]
+
+    def assertCountersMatch(self, course):
+        progress = UserCourseProgress.objects.get(user=self.user, course=course)
+        counters = count_course_progress(self.user, course.pk)
+        self.assertEqual(progress.completed_lessons_count, counters['completed_lessons_count'])
+        self.assertEqual(progress.total_lessons_count, counters['total_lessons_count'])
+        call_command('rebuild_course_progress', '--check', stdout=StringIO())
+        return progress
+
+
+class CourseProgressCounterTests(CourseProgressTestCase):
+    """
+    Los contadores incrementales de UserCourseProgress coinciden con
+    rebuild_course_progress --check tras cada cambio.
+    """
+
+    def course_url(self, action):
+        return f'/api/user/courses/progress/{self.course.pk}/{action}/'
+
+    def test_complete_uncomplete_and_destroy(self):
+        lesson = self.lessons[0]
+
+        response = self.client.post(self.course_url('mark_lesson_complete'), {'lesson_id': str(lesson.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.assertCountersMatch(self.course).completed_lessons_count, 1)
+
+        # Marcarla otra vez no suma de nuevo
+        self.client.post(self.course_url('mark_lesson_complete'), {'lesson_id': str(lesson.pk)})
+        self.assertEqual(self.assertCountersMatch(self.course).completed_lessons_count, 1)
+
+        response = self.client.post(self.course_url('mark_lesson_incomplete'), {'lesson_id': str(lesson.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.assertCountersMatch(self.course).completed_lessons_count, 0)
+
+        self.client.post(self.course_url('mark_lesson_complete'), {'lesson_id': str(lesson.pk)})
+        lesson_progress = UserLessonProgress.objects.get(user=self.user, lesson=lesson)
+        response = self.client.delete(f'/api/user/lessons/progress/{lesson_progress.pk}/')
+        self.assertEqual(response.status_code, 204)
+        progress = self.assertCountersMatch(self.course)
+        self.assertEqual(progress.completed_lessons_count, 0)
+        self.assertEqual(progress.progress_percentage, 0)
+
+    def test_lesson_added_and_deleted(self):
+        for lesson in self.lessons:
+            set_lesson_completed(self.user, lesson, True)
+        progress = self.assertCountersMatch(self.course)
+        self.assertEqual(progress.progress_percentage, 100)
+        self.assertIsNotNone(progress.completed_at)
+
+        new_lesson = Lesson.objects.create(course=self.course, title='Lección nueva', order=4)
+        progress = self.assertCountersMatch(self.course)
+        self.assertEqual(progress.total_lessons_count, 5)
+        self.assertEqual(progress.progress_percentage, 80)
+        self.assertIsNone(progress.completed_at)
+
+        # Al borrar una lección completada su progreso se elimina en cascada
+        self.lessons[0].delete()
+        new_lesson.delete()
+        progress = self.assertCountersMatch(self.course)
+        self.assertEqual(progress.total_lessons_count, 3)
+        self.assertEqual(progress.completed_lessons_count, 3)
+        self.assertEqual(progress.progress_percentage, 100)
+
+
+class LessonProgressSyncTests(CourseProgressTestCase):
+    """POST /api/user/lessons/progress/sync/ (sync_lesson_progress)."""
+
+    url = '/api/user/lessons/progress/sync/'
+
+    def sync(self, updates):
+        return self.client.post(self.url, {'updates': updates}, format='json')
+
+    def test_duplicate_lessons_are_merged(self):
+        lesson = self.lessons[0]
+
+        response = self.sync([
+            {'lesson': str(lesson.pk), 'time_spent_seconds': 30},
+            {'lesson': str(lesson.pk), 'completed': True, 'time_spent_seconds': 15},
+            {'lesson': str(lesson.pk), 'time_spent_seconds': 5},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['lessons']), 1)
+        progress = UserLessonProgress.objects.get(user=self.user, lesson=lesson)
+        self.assertEqual(progress.time_spent_seconds, 50)
+        self.assertTrue(progress.completed)
+        self.assertIsNotNone(progress.completion_date)
+        self.assertEqual(self.assertCountersMatch(self.course).completed_lessons_count, 1)
+
+    def test_time_is_added_to_existing_rows(self):
+        lesson = self.lessons[1]
+        UserLessonProgress.objects.create(user=self.user, lesson=lesson, time_spent_seconds=100, completed=True)
+
+        response = self.sync([{'lesson': str(lesson.pk), 'time_spent_seconds': 20}])
+
+        self.assertEqual(response.status_code, 200)
+        progress = UserLessonProgress.objects.get(user=self.user, lesson=lesson)
+        self.assertEqual(progress.time_spent_seconds, 120)
+        # Sin 'completed' se conserva el estado anterior
+        self.assertTrue(progress.completed)
+
+    def test_unknown_lesson_is_rejected_without_changes(self):
+        response = self.sync([
+            {'lesson': str(self.lessons[0].pk), 'completed': True},
+            {'lesson': '00000000-0000-0000-0000-000000000000', 'completed': True},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('00000000-0000-0000-0000-000000000000', response.data['error'])
+        self.assertFalse(UserLessonProgress.objects.filter(user=self.user).exists())
+
+    def test_course_counters_after_mixed_batch(self):
+        set_lesson_completed(self.user, self.lessons[0], True)
+        set_lesson_completed(self.user, self.lessons[1], True)
+        set_lesson_completed(self.user, self.other_lessons[0], True)
+
+        response = self.sync([
+            # Desmarcar una completada, completar dos nuevas y repetir una ya completada
+            {'lesson': str(self.lessons[0].pk), 'completed': False},
+            {'lesson': str(self.lessons[2].pk), 'completed': True},
+            {'lesson': str(self.lessons[3].pk), 'completed': True, 'time_spent_seconds': 60},
+            {'lesson': str(self.lessons[1].pk), 'completed': True},
+            # Solo tiempo en el otro curso, y una lección completada y desmarcada en el mismo lote
+            {'lesson': str(self.other_lessons[0].pk), 'time_spent_seconds': 10},
+            {'lesson': str(self.other_lessons[1].pk), 'completed': True},
+            {'lesson': str(self.other_lessons[1].pk), 'completed': False},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        progress = self.assertCountersMatch(self.course)
+        self.assertEqual(progress.completed_lessons_count, 3)
+        self.assertEqual(progress.progress_percentage, 75)
+        other_progress = self.assertCountersMatch(self.other_course)
+        self.assertEqual(other_progress.completed_lessons_count, 1)
+        self.assertEqual(
+            {course['course']: course['completed_lessons_count'] for course in response.data['courses']},
+            {str(self.course.pk): 3, str(self.other_course.pk): 1}
+        )
+
+
+class LessonRetrieveTests(APITestCase):
+    """
+    GET /api/lessons/<id>/: ETag y contenido precodificado (render_lesson),
+    que debe producir los mismos bytes que LessonSerializer.
+    """
+
+    content = {'blocks': [{'type': 'text', 'text': 'Añadir «comillas» y emojis 🚀'}], 'n': 1.5, 'vacío': None}
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.objects.create(title='Curso')
+        self.lesson = Lesson.objects.create(course=self.course, title='Lección', order=1, content=self.content)
+        self.url = f'/api/lessons/{self.lesson.pk}/'
+
+    def lesson_queries(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, **headers)
+        return response, [q['sql'] for q in queries.captured_queries if 'FROM "api_lesson"' in q['sql']]
+
+    def test_render_lesson_matches_serializer(self):
+        lesson = Lesson.objects.defer('content').get(pk=self.lesson.pk)
+        expected = JSONRenderer().render(LessonSerializer(Lesson.objects.get(pk=self.lesson.pk)).data)
+        self.assertEqual(render_lesson(LessonSerializer, lesson), expected)
+
+    def test_splice_json(self):
+        self.assertEqual(splice_json(b'{}', 'content', b'[1]'), b'{"content":[1]}')
+        self.assertEqual(splice_json(b'{"id":1}', 'content', b'{"a":"b"}'), b'{"id":1,"content":{"a":"b"}}')
+
+    def test_200_then_304(self):
+        response, lesson_queries = self.lesson_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(LessonSerializer(Lesson.objects.get(pk=self.lesson.pk)).data)
+        )
+        # Primero solo la versión de la lección y después la lección sin el JSON del contenido
+        self.assertEqual(len(lesson_queries), 2)
+        etag = response['ETag']
+
+        response, lesson_queries = self.lesson_queries(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # Con la versión vigente no se lee la copia comprimida del contenido
+        self.assertEqual(len(lesson_queries), 1)
+        self.assertNotIn('content_blob', lesson_queries[0])
+
+    def test_queryset_update_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        Lesson.objects.filter(pk=self.lesson.pk).update(title='Otro título')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'Otro título')
@@ -38,6 +38,7 @@ urlpatterns = [
     # Rutas para diagnóstico
     path('check-gamification/', views.check_gamification_config, name='check-gamification'),
     path('debug/posts/', debug_posts, name='debug_posts'),
+    path('metrics/', views.request_metrics, name='request-metrics'),
     
     # Rutas de la API de usuarios y comunidad
     path('', include(router.urls)),
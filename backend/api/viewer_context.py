@@ -0,0 +1,134 @@
+"""
+Estado del usuario que consulta, compartido por todos los serializadores de
+una petición.
+
+ViewerContext guarda qué posts y comentarios ha marcado con like el usuario.
+Los serializadores de listas (ViewerListSerializer) lo cargan por lotes antes
+de serializar cada página: una consulta para los posts y otra para los
+comentarios de los posts que aparecen en la respuesta, de modo que las
+respuestas anidadas reutilizan lo ya cargado.
+
+apply_viewer_to_posts aplica el estado del usuario a posts ya serializados
+para todos los usuarios (respuestas cacheadas compartidas).
+"""
+from django.db import models
+from rest_framework import serializers
+
+from .metrics import measure_serialization
+from .models import Post, PostLike, CommentLike
+from .polls import set_user_vote
+
+
+class ViewerContext:
+    """
+    Likes del usuario que consulta, cargados bajo demanda y por lotes.
+    """
+
+    def __init__(self, user=None):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.liked_post_ids = set()
+        self.liked_comment_ids = set()
+        # Posts cuyo like ya se conoce y posts cuyos likes en comentarios ya se conocen
+        self._loaded_posts = set()
+        self._loaded_comment_posts = set()
+
+    def prime_posts(self, posts):
+        """Carga en una consulta los likes del usuario en los posts que aún no se conocen."""
+        post_ids = {post.pk for post in posts} - self._loaded_posts
+        if not post_ids:
+            return
+        self._loaded_posts |= post_ids
+        if self.user is None:
+            return
+        self.liked_post_ids.update(PostLike.objects.filter(
+            user=self.user, post_id__in=post_ids
+        ).values_list('post_id', flat=True))
+
+    def prime_comments(self, comments):
+        """
+        Carga en una consulta los likes del usuario en todos los comentarios de
+        los posts de esos comentarios (incluidas sus respuestas).
+        """
+        post_ids = {comment.post_id for comment in comments} - self._loaded_comment_posts
+        if not post_ids:
+            return
+        self._loaded_comment_posts |= post_ids
+        if self.user is None:
+            return
+        self.liked_comment_ids.update(CommentLike.objects.filter(
+            user=self.user, comment__post_id__in=post_ids
+        ).values_list('comment_id', flat=True))
+
+    def is_post_liked(self, post):
+        """Indica si el usuario ha dado like al post."""
+        self.prime_posts([post])
+        return post.pk in self.liked_post_ids
+
+    def is_comment_liked(self, comment):
+        """Indica si el usuario ha dado like al comentario."""
+        self.prime_comments([comment])
+        return comment.pk in self.liked_comment_ids
+
+
+def get_viewer_context(serializer_context):
+    """
+    ViewerContext de la petición del contexto de un serializador.
+
+    Se guarda en la propia petición, así que lo comparten todos los
+    serializadores (y sus copias de contexto) de una misma respuesta.
+    """
+    request = serializer_context.get('request') if serializer_context else None
+    if request is None:
+        return ViewerContext()
+    viewer = getattr(request, '_viewer_context', None)
+    if viewer is None:
+        viewer = ViewerContext(getattr(request, 'user', None))
+        request._viewer_context = viewer
+    return viewer
+
+
+class ViewerListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer que carga el estado del usuario para toda la página antes
+    de serializar sus elementos.
+
+    El serializador hijo debe definir prime_viewer_context(viewer, instances).
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        with measure_serialization():
+            instances = list(data)
+            self.child.prime_viewer_context(get_viewer_context(self.context), instances)
+            return super().to_representation(instances)
+
+
+def apply_viewer_to_posts(posts, user):
+    """
+    Aplica a posts serializados sin usuario (is_liked a False y sin voto en
+    las encuestas) el like y el voto del usuario que consulta, leídos en una
+    sola consulta.
+
+    Args:
+        posts: Lista de posts serializados con PostSerializer (se modifican)
+        user: Usuario que consulta (puede ser anónimo)
+
+    Returns:
+        list: Los mismos posts
+    """
+    if not posts or user is None or not user.is_authenticated:
+        return posts
+
+    viewer_state = {
+        str(post_id): (is_liked, poll_vote)
+        for post_id, is_liked, poll_vote in Post.objects.filter(
+            pk__in=[post['id'] for post in posts]
+        ).with_viewer(user).values_list('pk', 'annotated_is_liked', 'annotated_poll_vote')
+    }
+    for post in posts:
+        is_liked, poll_vote = viewer_state.get(str(post['id']), (False, None))
+        post['is_liked'] = is_liked
+        if poll_vote is not None:
+            post['content'] = set_user_vote(post['content'], poll_vote)
+    return posts
@@ -9,11 +9,11 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.reverse import reverse
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Q
+from django.db.models import Count, Prefetch, Q
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from django.conf import settings
 from functools import wraps
 
@@ -21,7 +21,8 @@ from .models import Subscriber, User, Category, Post, Comment, PostLike, Comment
 from .serializers import (
     SubscriberSerializer, UserSerializer, UserRegistrationSerializer, CategorySerializer,
     PostSerializer, PostDetailSerializer, CommentSerializer, PostLikeSerializer, CommentLikeSerializer, UserShortSerializer,
-    CourseSerializer, CourseDetailSerializer, LessonSerializer, LessonDetailSerializer, EventSerializer
+    CourseSerializer, CourseDetailSerializer, CourseOutlineSerializer, LessonSerializer, LessonDetailSerializer,
+    LessonOutlineSerializer, EventSerializer
 )
 from django.conf import settings
 from django.core.mail import send_mail
@@ -29,8 +30,24 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.urls import reverse
 from .welcome_email import send_welcome_email
+from .comment_tree import CommentTree
+from .likes import parse_like_action, set_like
+from .polls import cast_vote, get_poll_options
+from .search import PostSearchFilter
+from .pagination import StandardResultsSetPagination, KeysetPagination, FeedPagination
+from .debug_utils import instrumentation_enabled, log_feed_diagnostics
+from .metrics import registry as metrics_registry
+from .subscription_cache import render_cache_stats
+from .response_cache import CATEGORIES, PINNED_POSTS, cached_response, etag_matches, set_pinned_post_ids
+from .viewer_context import apply_viewer_to_posts
+from .lesson_content import (
+    accepts_gzip, content_etag, get_content_bytes, lesson_etag, render_lesson, render_lessons, render_with_lessons
+)
 from .beehiiv import add_subscriber_to_beehiiv
 from api.gamification.services import award_points
+from api.gamification.ranking import top_users, with_positions
+from api.gamification.services import get_period_leaderboard
+from api.gamification.stats import get_profile_counts, get_user_stats
 from datetime import timedelta
 import datetime
 import uuid
@@ -90,6 +107,28 @@ def test_post_creation(request):
 
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def request_metrics(request):
+    """
+    Histogramas de consultas y latencia por endpoint y contadores de la caché
+    de suscripciones, en formato Prometheus. Solo accesible desde la propia máquina (sin pasar por el proxy) o para staff.
+    """
+    is_local = (
+        request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+        and 'HTTP_X_FORWARDED_FOR' not in request.META
+    )
+    if not (is_local or request.user.is_staff):
+        return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        metrics_registry.render() + render_cache_stats(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+# No medir las consultas del propio endpoint de métricas
+request_metrics.exclude_from_metrics = True
+
+
 @api_view(['GET'])
 def check_gamification_config(request):
     """
@@ -454,15 +493,6 @@ def send_confirmation_email(subscriber):
 
 # ----------------------- API USUARIOS Y COMUNIDAD -----------------------
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """
-    Paginación estándar para las vistas de API.
-    """
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 class UserRegistrationView(generics.CreateAPIView):
     """
     Vista para registro de usuarios.
@@ -483,20 +513,10 @@ class UserMeView(APIView):
         serializer = UserSerializer(user, context={'request': request})
         user_data = serializer.data
         
-        # Añadir contador de posts, likes recibidos y comentarios
-        user_data['posts_count'] = Post.objects.filter(author=user).count()
+        # Añadir contador de posts, likes recibidos y comentarios (mantenidos en UserStats)
+        user_data.update(get_profile_counts(user))
         
-        post_likes = PostLike.objects.filter(post__author=user).count()
-        comment_likes = CommentLike.objects.filter(comment__author=user).count()
-        user_data['likes_received'] = post_likes + comment_likes
-        
-        user_data['comments_count'] = Comment.objects.filter(author=user).count()
-        
-        # Calcular la posición en el ranking (basado en puntos)
-        # Contar cuántos usuarios tienen más puntos que el usuario actual
-        higher_ranked_users = User.objects.filter(points__gt=user.points).count()
-        # La posición es el número de usuarios con más puntos + 1
-        user_data['position'] = higher_ranked_users + 1
+        # La posición en el ranking la calcula UserSerializer con un COUNT sobre el índice de puntos
         
         return Response(user_data)
 
@@ -529,13 +549,9 @@ class UserMeView(APIView):
         if serializer.is_valid():
             serializer.save()
             
-            # Obtener datos actualizados del usuario con la posición en el ranking
+            # Obtener datos actualizados del usuario (incluye la posición en el ranking)
             user_data = serializer.data
             
-            # Calcular la posición en el ranking
-            higher_ranked_users = User.objects.filter(points__gt=request.user.points).count()
-            user_data['position'] = higher_ranked_users + 1
-            
             return Response(user_data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -543,13 +559,14 @@ class UserMeView(APIView):
         """Actualizar avatar del usuario"""
         try:
             # Importar utilidades de debug
-            from .debug_utils import log_request_details, log_exception, check_media_permissions
-            
-            # Registrar detalles de la solicitud para diagnosticar problemas
-            log_request_details(request, prefix="AVATAR")
+            from .debug_utils import log_request_details, check_media_permissions
             
-            # Verificar permisos de carpetas media
-            check_media_permissions()
+            if instrumentation_enabled():
+                # Registrar detalles de la solicitud para diagnosticar problemas
+                log_request_details(request, prefix="AVATAR")
+                
+                # Verificar permisos de carpetas media
+                check_media_permissions()
             
             if 'avatar_url' not in request.FILES:
                 return Response({"error": "No se ha proporcionado una imagen"}, status=status.HTTP_400_BAD_REQUEST)
@@ -605,10 +622,6 @@ class UserMeView(APIView):
             serializer = UserSerializer(request.user, context={'request': request})
             user_data = serializer.data
             
-            # Calcular la posición en el ranking
-            higher_ranked_users = User.objects.filter(points__gt=request.user.points).count()
-            user_data['position'] = higher_ranked_users + 1
-            
             # Verificar que la URL del avatar está presente
             if 'avatar_url' in user_data and user_data['avatar_url']:
                 logger.info(f"URL del avatar generada: {user_data['avatar_url']}")
@@ -633,7 +646,8 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Vista para listar y recuperar usuarios (sólo lectura).
     """
-    queryset = User.objects.all().order_by('-points')
+    # La posición en el ranking se anota en la misma consulta que los usuarios
+    queryset = with_positions(User.objects.all()).order_by('-points')
     serializer_class = UserSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [filters.SearchFilter]
@@ -655,18 +669,8 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
             serializer = self.get_serializer(user)
             user_data = serializer.data
             
-            # Añadir contador de posts, likes recibidos y comentarios
-            user_data['posts_count'] = Post.objects.filter(author=user).count()
-            
-            post_likes = PostLike.objects.filter(post__author=user).count()
-            comment_likes = CommentLike.objects.filter(comment__author=user).count()
-            user_data['likes_received'] = post_likes + comment_likes
-            
-            user_data['comments_count'] = Comment.objects.filter(author=user).count()
-            
-            # Calcular la posición en el ranking (basado en puntos)
-            higher_ranked_users = User.objects.filter(points__gt=user.points).count()
-            user_data['position'] = higher_ranked_users + 1
+            # Añadir contador de posts, likes recibidos y comentarios (mantenidos en UserStats)
+            user_data.update(get_profile_counts(user))
             
             return Response(user_data)
         except User.DoesNotExist:
@@ -679,15 +683,13 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         Obtener los posts de un usuario específico.
         """
         user = self.get_object()
-        posts = Post.objects.filter(author=user).order_by('-created_at')
-        page = self.paginate_queryset(posts)
+        posts = Post.objects.filter(author=user).for_feed(request.user)
         
-        if page is not None:
-            serializer = PostSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-            
-        serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data)
+        # Cursor sobre (-created_at, -id): el coste no depende de la profundidad de la página
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        page = paginator.paginate_queryset(posts.order_by('-created_at', '-id'), request, view=self)
+        serializer = PostSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
         
     @action(detail=True, methods=['get'])
     def activity(self, request, pk=None):
@@ -776,7 +778,7 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         Obtener el número de comentarios de un usuario.
         """
         user = self.get_object()
-        count = Comment.objects.filter(author=user).count()
+        count = get_user_stats(user).comments_count
         return Response({'count': count})
     
     @action(detail=True, methods=['get'], url_path='likes/received')
@@ -786,13 +788,8 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         """
         user = self.get_object()
         
-        # Contar likes en posts del usuario
-        post_likes = PostLike.objects.filter(post__author=user).count()
-        
-        # Contar likes en comentarios del usuario
-        comment_likes = CommentLike.objects.filter(comment__author=user).count()
-        
-        total_likes = post_likes + comment_likes
+        # Likes recibidos en posts y comentarios del usuario
+        total_likes = get_user_stats(user).likes_received
         
         return Response({'count': total_likes})
 
@@ -805,24 +802,26 @@ class LeaderboardView(generics.ListAPIView):
     serializer_class = UserShortSerializer
     permission_classes = [IsAuthenticated]  # Cambiado de AllowAny a IsAuthenticated
 
+    # Ventanas (en días) de los rankings por período
+    PERIOD_DAYS = {
+        'week': 7,
+        'month': 30,
+    }
+
     def get_queryset(self):
         # Obtener el período del leaderboard (all, month, week) desde la URL
         period = self.request.query_params.get('period', 'all')
+        self.period_points = {}
         
-        # Obtener los 10 usuarios con más puntos según el período
-        queryset = User.objects.all()
-        
-        if period == 'week':
-            # Aquí se implementaría la lógica para filtrar por actividad de la última semana
-            # Por ahora, simplemente obtenemos todos ordenados por puntos
-            pass
-        elif period == 'month':
-            # Aquí se implementaría la lógica para filtrar por actividad del último mes
-            # Por ahora, simplemente obtenemos todos ordenados por puntos
-            pass
+        if period in self.PERIOD_DAYS:
+            # Ranking del período a partir de los agregados diarios de puntos,
+            # con los usuarios leídos en la misma consulta
+            users = get_period_leaderboard(self.PERIOD_DAYS[period], limit=10)
+            self.period_points = {user.id: user.period_points for user in users}
+            return users
         
-        # Ordenamos por puntos (descendente) y tomamos los primeros 10
-        return queryset.order_by('-points')[:10]
+        # Los 10 usuarios con más puntos, leídos en orden del índice de puntos
+        return top_users(10)
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -836,6 +835,10 @@ class LeaderboardView(generics.ListAPIView):
             # Asegurar que 'points' existe en la respuesta
             if 'points' not in user:
                 user['points'] = User.objects.get(id=user['id']).points
+            
+            # En los rankings por período, añadir los puntos ganados en la ventana
+            if self.period_points:
+                user['period_points'] = self.period_points.get(user['id'], 0)
         
         return Response(leaderboard_data)
 
@@ -848,6 +851,12 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def list(self, request, *args, **kwargs):
+        # Se lee en cada página de la comunidad y casi nunca cambia: cachear con ETag
+        return cached_response(
+            request, CATEGORIES, lambda: super(CategoryViewSet, self).list(request, *args, **kwargs).data
+        )
+
 
 # Importamos el decorador para proteger vistas premium
 from .decorators import premium_required
@@ -859,10 +868,11 @@ class PostViewSet(viewsets.ModelViewSet):
     """
     queryset = Post.objects.all()
     serializer_class = PostSerializer
-    pagination_class = StandardResultsSetPagination
+    # Cursor sobre (-is_pinned, -created_at, -id); solo ?search= pagina por número de página
+    pagination_class = FeedPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['content']
+    # Búsqueda de texto completo sobre título y texto plano (?search=...)
+    filter_backends = [PostSearchFilter]
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -894,21 +904,21 @@ class PostViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Post.objects.all()
         
-        # Agregar logs para depurar
-        post_count = queryset.count()
-        logger.info(f"Total de posts en la base de datos: {post_count}")
-        if post_count > 0:
-            latest_post = queryset.latest('created_at')
-            logger.info(f"Post más reciente: ID={latest_post.id}, autor={latest_post.author.username}, título={latest_post.title}")
-        
         # Aplicar filtros si existen
         category = self.request.query_params.get('category', None)
         if category and category != 'all':
             queryset = queryset.filter(category__slug=category)
-            logger.info(f"Filtrando por categoría: {category}, posts resultantes: {queryset.count()}")
+        else:
+            category = None
+        
+        # Recuentos para depurar: consultas extra, solo con DEBUG_INSTRUMENTATION
+        if instrumentation_enabled():
+            log_feed_diagnostics(queryset, category)
         
-        # Log del queryset final
-        logger.info(f"Devolviendo {queryset.count()} posts")
+        # Modo feed: autor, categoría, número de comentarios y like del usuario
+        # en la misma consulta para que el coste no dependa del tamaño de página
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.for_feed(self.request.user)
         
         return queryset
         
@@ -925,17 +935,24 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         post = self.get_object()
         
-        # Obtener comentarios raíz (sin padres) para este post
-        root_comments = Comment.objects.filter(post=post, parent=None).order_by('created_at')
+        # Comentarios raíz paginados por cursor sobre (created_at, id)
+        paginator = KeysetPagination(ordering=('created_at', 'id'))
+        roots = paginator.paginate_queryset(
+            Comment.objects.filter(post=post, parent__isnull=True).select_related('author', 'mentioned_user'),
+            request, view=self
+        )
+        # Cargar solo las respuestas de los comentarios de la página (una consulta por nivel)
+        tree = CommentTree.from_roots(post, roots, request.user)
         
         # Usar directamente el serializador, que ya maneja la anidación
-        # Pasar el contexto con request para construir URLs absolutas y verificar likes
-        serializer = CommentSerializer(root_comments, many=True, context={
+        # Pasar el contexto con request para construir URLs absolutas y el árbol precargado
+        serializer = CommentSerializer(tree.roots, many=True, context={
             'request': request,
-            'depth': 0
+            'depth': 0,
+            'comment_tree': tree
         })
         
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class PinnedPostsView(generics.ListAPIView):
@@ -946,7 +963,21 @@ class PinnedPostsView(generics.ListAPIView):
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return Post.objects.filter(is_pinned=True).order_by('-created_at')
+        # Serializados sin usuario: la respuesta cacheada es la misma para todos
+        return Post.objects.filter(is_pinned=True).for_feed().order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            # Recordar qué posts están fijados para que las señales solo invaliden cuando les afecta
+            set_pinned_post_ids(Post.objects.filter(is_pinned=True).values_list('id', flat=True))
+            return super(PinnedPostsView, self).list(request, *args, **kwargs).data
+
+        def personalize(data):
+            # is_liked y el voto en encuestas dependen del usuario: se aplican sobre la entrada compartida
+            apply_viewer_to_posts(data['results'] if isinstance(data, dict) else data, request.user)
+            return data
+
+        return cached_response(request, PINNED_POSTS, build, personalize=personalize)
 
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -990,79 +1021,83 @@ class CommentViewSet(viewsets.ModelViewSet):
 class PostLikeView(APIView):
     """
     Vista para dar/quitar like a un post.
+    
+    POST alterna el like, o fija el estado indicado en 'action' ('like' / 'unlike').
+    DELETE quita el like. Repetir una petición con estado explícito no cambia nada.
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, post_id):
+        try:
+            desired = parse_like_action(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         post = get_object_or_404(Post, id=post_id)
-        like, created = PostLike.objects.get_or_create(user=request.user, post=post)
+        return self.apply(request, post, desired)
+
+    def delete(self, request, post_id):
+        post = get_object_or_404(Post, id=post_id)
+        return self.apply(request, post, False)
+
+    def apply(self, request, post, desired):
+        result = set_like(request.user, post, desired)
         
-        if created:
-            # Incrementar contador de likes del post
-            post.likes += 1
-            post.save(update_fields=['likes'])
-            
+        if result.liked and result.changed:
             # Otorgar puntos al usuario que da like
             try:
                 award_points(request.user, 'give_like_post', reference_id=str(post.id))
             
                 # Si el autor no es el mismo usuario que da like, otorgar puntos al autor por recibir like
-                if post.author != request.user:
+                if post.author_id != request.user.id:
                     award_points(post.author, 'receive_like_post', reference_id=str(post.id))
             except Exception as e:
                 logger.error(f"Error al otorgar puntos por like: {str(e)}")
-            
-            return Response({'status': 'liked', 'likes': post.likes})
-        else:
-            # Si ya existe el like, lo eliminamos
-            like.delete()
-            
-            # Decrementar contador de likes del post
-            post.likes = max(0, post.likes - 1)
-            post.save(update_fields=['likes'])
-            
-            # Nota: No restamos puntos al quitar likes para mantener la integridad del sistema
-            
-            return Response({'status': 'unliked', 'likes': post.likes})
+        
+        # Nota: No restamos puntos al quitar likes para mantener la integridad del sistema
+        
+        return Response({'status': 'liked' if result.liked else 'unliked', 'likes': result.likes})
 
 
 class CommentLikeView(APIView):
     """
     Vista para dar/quitar like a un comentario.
+    
+    POST alterna el like, o fija el estado indicado en 'action' ('like' / 'unlike').
+    DELETE quita el like. Repetir una petición con estado explícito no cambia nada.
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, comment_id):
+        try:
+            desired = parse_like_action(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        comment = get_object_or_404(Comment, id=comment_id)
+        return self.apply(request, comment, desired)
+
+    def delete(self, request, comment_id):
         comment = get_object_or_404(Comment, id=comment_id)
-        like, created = CommentLike.objects.get_or_create(user=request.user, comment=comment)
+        return self.apply(request, comment, False)
+
+    def apply(self, request, comment, desired):
+        result = set_like(request.user, comment, desired)
         
-        if created:
-            # Incrementar contador de likes del comentario
-            comment.likes += 1
-            comment.save(update_fields=['likes'])
-            
+        if result.liked and result.changed:
             # Otorgar puntos al usuario que da like
             try:
                 award_points(request.user, 'give_like_comment', reference_id=str(comment.id))
             
                 # Si el autor no es el mismo usuario que da like, otorgar puntos al autor por recibir like
-                if comment.author != request.user:
+                if comment.author_id != request.user.id:
                     award_points(comment.author, 'receive_like_comment', reference_id=str(comment.id))
             except Exception as e:
                 logger.error(f"Error al otorgar puntos por like a comentario: {str(e)}")
-            
-            return Response({'status': 'liked', 'likes': comment.likes})
-        else:
-            # Si ya existe el like, lo eliminamos
-            like.delete()
-            
-            # Decrementar contador de likes del comentario
-            comment.likes = max(0, comment.likes - 1)
-            comment.save(update_fields=['likes'])
-            
-            # Nota: No restamos puntos al quitar likes para mantener la integridad del sistema
-            
-            return Response({'status': 'unliked', 'likes': comment.likes})
+        
+        # Nota: No restamos puntos al quitar likes para mantener la integridad del sistema
+        
+        return Response({'status': 'liked' if result.liked else 'unliked', 'likes': result.likes})
 
 
 class PollVoteView(APIView):
@@ -1074,7 +1109,6 @@ class PollVoteView(APIView):
     def post(self, request, post_id):
         post = get_object_or_404(Post, id=post_id)
         option_id = request.data.get('option_id')
-        user_id = str(request.user.id)  # Usamos el ID del usuario como clave
         
         if not option_id:
             return Response({'error': 'Se requiere el ID de la opción'}, status=status.HTTP_400_BAD_REQUEST)
@@ -1084,88 +1118,38 @@ class PollVoteView(APIView):
         except (ValueError, TypeError):
             return Response({'error': 'El ID de la opción debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Verificar si el post tiene una encuesta
-        try:
-            content = post.content
-            if isinstance(content, str):
-                try:
-                    content_json = json.loads(content)
-                    if not (content_json.get('features', {}).get('poll')):
-                        return Response({'error': 'El post no tiene una encuesta'}, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    # Verificar que la opción existe en la encuesta
-                    poll_options = content_json['features']['poll']
-                    option_ids = [opt.get('id') for opt in poll_options]
-                    
-                    if option_id not in option_ids:
-                        return Response({'error': 'La opción seleccionada no existe en esta encuesta'}, status=status.HTTP_400_BAD_REQUEST)
-                except json.JSONDecodeError:
-                    return Response({'error': 'El post no tiene una encuesta válida'}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            logger.error(f"Error al verificar encuesta: {str(e)}")
-            return Response({'error': 'Error al procesar la encuesta'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Verificar si el post tiene una encuesta y que la opción existe
+        option_ids = get_poll_options(post)
+        if option_ids is None:
+            return Response({'error': 'El post no tiene una encuesta'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Actualizar el contenido del post para almacenar los votos en el JSON
+        if option_id not in option_ids:
+            return Response({'error': 'La opción seleccionada no existe en esta encuesta'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Registrar el voto en PollVote y actualizar los recuentos de la encuesta
         try:
-            content_json = json.loads(post.content)
-            
-            # Inicializar las estructuras necesarias si no existen
-            if 'features' not in content_json:
-                content_json['features'] = {}
-            
-            if 'poll_results' not in content_json['features']:
-                content_json['features']['poll_results'] = {}
-                
-                # Inicializar contadores para cada opción
-                for opt in content_json['features']['poll']:
-                    content_json['features']['poll_results'][str(opt['id'])] = 0
-            
-            if 'user_votes' not in content_json['features']:
-                content_json['features']['user_votes'] = {}
-            
-            # Ver si el usuario ya ha votado
-            previous_vote = content_json['features']['user_votes'].get(user_id)
-            
-            # Si el usuario ya votó anteriormente
-            if previous_vote is not None:
-                # Actualizar el contador: restar uno de la opción anterior
-                old_option = str(previous_vote)
-                if old_option in content_json['features']['poll_results']:
-                    content_json['features']['poll_results'][old_option] = max(0, content_json['features']['poll_results'][old_option] - 1)
-            
-            # Registrar o actualizar el voto del usuario
-            content_json['features']['user_votes'][user_id] = option_id
-            
-            # Actualizar el contador para la nueva opción
-            option_str = str(option_id)
-            if option_str in content_json['features']['poll_results']:
-                content_json['features']['poll_results'][option_str] += 1
-            else:
-                content_json['features']['poll_results'][option_str] = 1
-            
-            # Guardar los cambios en el post
-            post.content = json.dumps(content_json)
-            post.save(update_fields=['content'])
-            
-            # Otorgar puntos solo si es el primer voto
-            if previous_vote is None:
-                try:
-                    award_points(request.user, 'vote_in_poll', reference_id=str(post.id))
-                except Exception as e:
-                    logger.error(f"Error al otorgar puntos por votar en encuesta: {str(e)}")
-            
-            status_msg = 'updated' if previous_vote is not None else 'voted'
-            message = 'Voto actualizado correctamente' if previous_vote is not None else 'Voto registrado correctamente'
-            
-            return Response({
-                'status': status_msg,
-                'message': message,
-                'poll_results': content_json['features']['poll_results']
-            })
-                
+            result = cast_vote(request.user, post, option_id, option_ids)
         except Exception as e:
             logger.error(f"Error al actualizar resultados de encuesta: {str(e)}")
             return Response({'error': f'Error al actualizar los resultados de la encuesta: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        previous_vote = result.previous_option
+        
+        # Otorgar puntos solo si es el primer voto
+        if previous_vote is None:
+            try:
+                award_points(request.user, 'vote_in_poll', reference_id=str(post.id))
+            except Exception as e:
+                logger.error(f"Error al otorgar puntos por votar en encuesta: {str(e)}")
+        
+        status_msg = 'updated' if previous_vote is not None else 'voted'
+        message = 'Voto actualizado correctamente' if previous_vote is not None else 'Voto registrado correctamente'
+        
+        return Response({
+            'status': status_msg,
+            'message': message,
+            'poll_results': result.poll_results
+        })
 
 
 class CourseViewSet(viewsets.ModelViewSet):
@@ -1176,6 +1160,41 @@ class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
+    def wants_outline(self):
+        # ?outline=1: lecciones sin contenido (id, título y orden)
+        return self.request.query_params.get('outline', '').lower() in ('1', 'true')
+    
+    def get_queryset(self):
+        queryset = Course.objects.all()
+        
+        # Número de lecciones en la misma consulta que los cursos
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_lessons_count()
+        
+        if self.action == 'retrieve':
+            if self.wants_outline():
+                lessons = Lesson.objects.only('id', 'course_id', 'title', 'order')
+            else:
+                # El contenido se sirve desde su copia precodificada (render_lessons)
+                lessons = Lesson.objects.defer('content')
+            queryset = queryset.prefetch_related(Prefetch('lessons', queryset=lessons.order_by('order')))
+        
+        return queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        if self.wants_outline():
+            return super().retrieve(request, *args, **kwargs)
+        
+        # Campos del curso serializados como siempre y lecciones con su
+        # contenido precodificado, sin volver a codificarlo en cada petición
+        course = self.get_object()
+        serializer = self.get_serializer(course)
+        serializer.fields.pop('lessons')
+        payload = render_with_lessons(
+            serializer.data, LessonDetailSerializer, course.lessons.all(), self.get_serializer_context()
+        )
+        return HttpResponse(payload, content_type='application/json')
+    
     def create(self, request, *args, **kwargs):
         """
         Crear un nuevo curso con mejor manejo de errores.
@@ -1208,6 +1227,8 @@ class CourseViewSet(viewsets.ModelViewSet):
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
+            if self.wants_outline():
+                return CourseOutlineSerializer
             return CourseDetailSerializer
         return CourseSerializer
         
@@ -1223,8 +1244,15 @@ class CourseViewSet(viewsets.ModelViewSet):
         """
         course = self.get_object()
         lessons = Lesson.objects.filter(course=course).order_by('order')
-        serializer = LessonSerializer(lessons, many=True)
-        return Response(serializer.data)
+        
+        # Con ?outline=1 solo el índice; el contenido se pide después por lección
+        if self.wants_outline():
+            serializer = LessonOutlineSerializer(lessons.only('id', 'title', 'order'), many=True)
+            return Response(serializer.data)
+        return HttpResponse(
+            render_lessons(LessonSerializer, lessons.defer('content'), self.get_serializer_context()),
+            content_type='application/json'
+        )
 
     @action(detail=True, methods=['post'])
     def upload_thumbnail(self, request, pk=None):
@@ -1285,7 +1313,8 @@ class LessonViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
-        queryset = Lesson.objects.all()
+        # La copia comprimida del contenido solo la usa el endpoint content
+        queryset = Lesson.objects.defer('content_blob')
         course_id = self.request.query_params.get('course_id', None)
         if course_id:
             queryset = queryset.filter(course_id=course_id)
@@ -1295,6 +1324,49 @@ class LessonViewSet(viewsets.ModelViewSet):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Obtener una lección, con ETag: si el cliente ya tiene la versión actual
+        se responde 304 sin cuerpo y si no, el contenido se sirve desde su
+        copia precodificada en lugar de cargarlo y codificarlo.
+        """
+        lesson = get_object_or_404(self.get_queryset().only('id', 'content_hash', 'updated_at'), pk=kwargs['pk'])
+        etag = lesson_etag(lesson)
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            # La lección completa (sin el JSON del contenido) solo se carga si hay que enviarla
+            lesson = Lesson.objects.defer('content').get(pk=lesson.pk)
+            response = HttpResponse(
+                render_lesson(self.get_serializer_class(), lesson, self.get_serializer_context()),
+                content_type='application/json'
+            )
+        response['ETag'] = etag
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def content(self, request, pk=None):
+        """
+        Obtener solo el contenido de una lección, servido desde su copia
+        precodificada (comprimida con gzip si el cliente lo acepta).
+        """
+        lesson = get_object_or_404(Lesson.objects.only('id', 'content_hash'), pk=pk)
+        etag = content_etag(lesson)
+        
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            lesson = Lesson.objects.only('id', 'content_hash', 'content_blob').get(pk=lesson.pk)
+            gzipped = accepts_gzip(request)
+            response = HttpResponse(get_content_bytes(lesson, gzipped), content_type='application/json')
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Accept-Encoding', 'Authorization'])
+        return response
 
 
 class EventListView(APIView):
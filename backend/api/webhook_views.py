@@ -6,6 +6,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.conf import settings
 from api.models import User
+from api.subscription_cache import invalidate_subscription_status
 from django.utils import timezone
 from datetime import datetime
 
@@ -143,6 +144,7 @@ def handle_checkout_session_completed(session):
             # Si el evento incluye un ID de suscripción, obtener más detalles
             if subscription_id:
                 subscription = stripe.Subscription.retrieve(subscription_id)
+                previous_subscription_id = user.subscription_id
                 
                 # Actualizar información de suscripción
                 user.subscription_id = subscription_id
@@ -157,6 +159,7 @@ def handle_checkout_session_completed(session):
                     user.subscription_end_date = datetime.fromtimestamp(subscription.current_period_end)
                 
                 user.save()
+                invalidate_subscription_status(user, previous_subscription_id)
                 logger.info(f"Usuario {user.username} actualizado con suscripción {subscription_id}")
             else:
                 logger.warning("El evento checkout.session.completed no incluye subscription_id")
@@ -190,6 +193,7 @@ def handle_invoice_paid(invoice):
             
             # Obtener detalles de la suscripción
             subscription = stripe.Subscription.retrieve(subscription_id)
+            previous_subscription_id = user.subscription_id
             
             # Actualizar información de suscripción
             user.subscription_id = subscription_id
@@ -204,6 +208,7 @@ def handle_invoice_paid(invoice):
                 user.subscription_end_date = datetime.fromtimestamp(subscription.current_period_end)
             
             user.save()
+            invalidate_subscription_status(user, previous_subscription_id)
             logger.info(f"Usuario {user.username} actualizado con suscripción {subscription_id} (factura pagada)")
     
     except Exception as e:
@@ -231,6 +236,7 @@ def handle_subscription_updated(subscription):
                 return
             
             user = users.first()
+            previous_subscription_id = user.subscription_id
             
             # Actualizar información de suscripción
             user.subscription_id = subscription_id
@@ -245,6 +251,7 @@ def handle_subscription_updated(subscription):
                 user.subscription_end_date = datetime.fromtimestamp(subscription.get('current_period_end'))
             
             user.save()
+            invalidate_subscription_status(user, previous_subscription_id)
             logger.info(f"Usuario {user.username} actualizado con suscripción {subscription_id} (actualización)")
     
     except Exception as e:
@@ -280,6 +287,7 @@ def handle_subscription_deleted(subscription):
                 user.subscription_end_date = timezone.now()
                 
                 user.save()
+                invalidate_subscription_status(user)
                 logger.info(f"Usuario {user.username} actualizado con suscripción cancelada")
     
     except Exception as e:
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.RequestMetricsMiddleware',  # Consultas SQL y latencia por endpoint (/api/metrics/)
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Agregar WhiteNoise para archivos estáticos
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -95,6 +96,19 @@ DATABASES = {
     }
 }
 
+# Caché de veredictos de suscripción y respuestas cacheadas. Por defecto es la caché en
+# memoria de cada proceso; para compartirla entre los workers de gunicorn (invalidaciones
+# de los webhooks y de la caché de respuestas) se configura una compartida, p. ej.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache con CACHE_LOCATION=redis://...
+# o CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache, cuya tabla crea
+# `python manage.py createcachetable`
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'django_cache'),
+    }
+}
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -210,11 +224,38 @@ STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_qnNuCSbsx
 STRIPE_PRICE_ID = os.environ.get('STRIPE_PRICE_ID', 'price_1KChNcB9x3GyCLI6yfkZCkxe')
 STRIPE_PRODUCT_ID = os.environ.get('STRIPE_PRODUCT_ID', '')
 STRIPE_MONTHLY_PLAN_AMOUNT = int(os.environ.get('STRIPE_MONTHLY_PLAN_AMOUNT', 20))
+# Segundos que se reutiliza el estado de una suscripción antes de volver a consultar a Stripe
+SUBSCRIPTION_CACHE_TTL = int(os.environ.get('SUBSCRIPTION_CACHE_TTL', 300))
+
+# Contadores de likes diferidos: se acumulan en memoria y se vuelcan en lote
+LIKE_COUNTER_BUFFERING = os.environ.get('LIKE_COUNTER_BUFFERING', 'False') == 'True'
+LIKE_COUNTER_FLUSH_INTERVAL = float(os.environ.get('LIKE_COUNTER_FLUSH_INTERVAL', 5))
+LIKE_COUNTER_FLUSH_THRESHOLD = int(os.environ.get('LIKE_COUNTER_FLUSH_THRESHOLD', 100))
+
+# Segundos que se conservan las respuestas cacheadas (posts fijados, categorías)
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+
+# Métricas de consultas SQL y latencia por endpoint
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', 'True') == 'True'
+
+# Máximo de consultas SQL por petición de algunos endpoints; con QUERY_BUDGET_STRICT
+# (tests) superarlo hace fallar la petición, si no solo se registra un aviso
+QUERY_BUDGETS = {
+    'PostViewSet.list': 6,
+    'PostViewSet.retrieve': 8,
+    'UserMeView': 4,
+    'LeaderboardView': 4,
+}
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+# Diagnósticos de depuración (recuentos en los logs, endpoint debug/posts/); desactivados en producción
+DEBUG_INSTRUMENTATION = os.environ.get('DEBUG_INSTRUMENTATION', 'False') == 'True'
 
 # Configuración de Rest Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT, reutilizando el usuario ya autenticado por PremiumContentMiddleware
+        'api.authentication.RequestCachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -29,6 +29,8 @@ find . -path "*/migrations/*.pyc" -delete
 # Hacer migraciones y migrar
 python manage.py makemigrations api
 python manage.py migrate
+# Tabla de la caché en base de datos si CACHE_BACKEND es DatabaseCache (con otras cachés no hace nada)
+python manage.py createcachetable
 
 # Crear superusuario
 echo "🔵 Configurando superusuario..."
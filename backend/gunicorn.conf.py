@@ -0,0 +1,23 @@
+"""
+Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo).
+
+Los hooks vuelcan los contadores de likes pendientes (api.like_buffer) al
+terminar un worker, también cuando se aborta por superar el timeout.
+"""
+
+
+def _flush_like_counters(worker):
+    try:
+        from api.like_buffer import like_buffer
+        like_buffer.flush()
+    except Exception as e:
+        worker.log.error(f"No se pudieron volcar los contadores de likes: {str(e)}")
+
+
+def worker_exit(server, worker):
+    _flush_like_counters(worker)
+
+
+def worker_abort(worker):
+    # Worker abortado por superar el timeout
+    _flush_like_counters(worker)
@@ -375,7 +375,7 @@ function CommunityContent() {
         setPinnedPosts(pinnedPostsArray);
         
         // Obtener posts regulares con el tipo de ordenamiento activo
-        const postsData = await communityService.getAllPosts(undefined, 1, activeSortType);
+        const postsData = await communityService.getAllPosts(undefined, null, activeSortType);
         const allPostsArray = postsData.results || (Array.isArray(postsData) ? postsData : []);
         
         // Filtrar los posts regulares para eliminar los que ya están fijados
@@ -418,7 +418,7 @@ function CommunityContent() {
         // No cargar datos nuevamente si es la categoría 'all' - usar los datos iniciales
         if (isLoadingInitial) return; // No hacer nada si todavía estamos cargando datos iniciales
         
-        const postsData = await communityService.getAllPosts(undefined, 1, activeSortType);
+        const postsData = await communityService.getAllPosts(undefined, null, activeSortType);
         const allPostsArray = postsData.results || (Array.isArray(postsData) ? postsData : []);
         
         // Filtrar los posts fijados si no estamos en vista de 'pinned'
@@ -440,7 +440,7 @@ function CommunityContent() {
       
       setIsLoadingPosts(true);
       try {
-        const postsData = await communityService.getAllPosts(activeCategory, 1, activeSortType);
+        const postsData = await communityService.getAllPosts(activeCategory, null, activeSortType);
         const categoryPostsArray = postsData.results || postsData;
         
         // Filtrar los posts fijados si no estamos en vista de 'pinned'
@@ -530,7 +530,7 @@ function CommunityContent() {
             // No activar flag de carga para actualizaciones en segundo plano
             const [pinnedData, postsData] = await Promise.all([
               communityService.getPinnedPosts(),
-              communityService.getAllPosts(activeCategory !== 'all' ? activeCategory : undefined, 1, activeSortType)
+              communityService.getAllPosts(activeCategory !== 'all' ? activeCategory : undefined, null, activeSortType)
             ]);
             
             const pinnedPostsArray = Array.isArray(pinnedData) ? pinnedData : 
@@ -608,7 +608,7 @@ function CommunityContent() {
       // Recargar posts después de crear uno nuevo
       const postsData = await communityService.getAllPosts(
         activeCategory !== 'all' ? activeCategory : undefined, 
-        1, 
+        null, 
         activeSortType
       );
       const newPostsArray = postsData.results || postsData;
@@ -45,33 +45,46 @@ export interface CreateCommentData {
   mentioned_user_id?: string;
 }
 
+// Cursor de la página siguiente a partir del enlace 'next' de una respuesta paginada
+export const getNextCursor = (next?: string | null): string | null => {
+  if (!next) {
+    return null;
+  }
+  return new URL(next).searchParams.get('cursor');
+};
+
 // Servicio para interactuar con la API de comunidad
 export const communityService = {
-  // Posts
-  getAllPosts: async (category?: string, page = 1, sortType = 'default') => {
-    let endpoint = `posts?page=${page}`;
+  // Posts (paginados por cursor: sin cursor se obtiene la primera página)
+  getAllPosts: async (category?: string, cursor?: string | null, sortType = 'default') => {
+    const params: string[] = [];
+    if (cursor) {
+      params.push(`cursor=${encodeURIComponent(cursor)}`);
+    }
 
     // Añadir filtro por categoría si está especificado
     if (category && category !== 'all') {
-      endpoint += `&category=${category}`;
+      params.push(`category=${category}`);
     }
 
     // Añadir parámetro de ordenamiento
     switch (sortType) {
       case 'new':
-        endpoint += '&ordering=-created_at'; // Ordenar por fecha de creación, más recientes primero
+        params.push('ordering=-created_at'); // Ordenar por fecha de creación, más recientes primero
         break;
       case 'top':
-        endpoint += '&ordering=-likes'; // Ordenar por más likes
+        params.push('ordering=-likes'); // Ordenar por más likes
         break;
       case 'pinned':
-        endpoint += '&is_pinned=true'; // Solo mostrar posts fijados
+        params.push('is_pinned=true'); // Solo mostrar posts fijados
         break;
       default: // 'default'
         // No añadir ordenamiento especial, usar el predeterminado del backend
         break;
     }
 
+    const endpoint = params.length > 0 ? `posts?${params.join('&')}` : 'posts';
+
     console.log(`Solicitando posts con endpoint: ${endpoint}`);
     const response = await api.get(endpoint);
     console.log(`Respuesta de posts recibida:`, response);
@@ -315,9 +328,23 @@ export const communityService = {
     return api.post(`posts/${postId}/vote/`, { option_id: optionId });
   },
 
-  // Comentarios
+  // Comentarios: recorre todas las páginas de comentarios raíz siguiendo el cursor
   getPostComments: async (postId: string) => {
-    return api.get(`posts/${postId}/comments`);
+    const comments: any[] = [];
+    let cursor: string | null = null;
+    do {
+      let endpoint = `posts/${postId}/comments?page_size=100`;
+      if (cursor) {
+        endpoint += `&cursor=${encodeURIComponent(cursor)}`;
+      }
+      const response = await api.get(endpoint);
+      if (Array.isArray(response)) {
+        return response;
+      }
+      comments.push(...(response.results || []));
+      cursor = getNextCursor(response.next);
+    } while (cursor);
+    return comments;
   },
 
   createComment: async (data: CreateCommentData) => {